@@ -0,0 +1,90 @@
+"""Recall-vs-latency report for the approximate FAISS index types.
+
+Builds each index type over the same synthetic clustered vectors and measures
+recall@k against the exact flat index together with per-query latency, for a
+range of nprobe (IVF) and efSearch (HNSW) settings.
+
+Usage:
+    python benchmarks/bench_ann.py [--vectors 200000] [--dimension 384] [--queries 500]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.faiss_index import FAISSIndex
+
+
+def make_vectors(num_vectors: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Build unit vectors grouped around random centres, like sentence embeddings of topics."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(num_vectors // 500, 1), dimension))
+    vectors = centres[rng.integers(len(centres), size=num_vectors)]
+    vectors = vectors + 0.6 * rng.standard_normal((num_vectors, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def search_all(index: FAISSIndex, queries: np.ndarray, k: int, **params) -> tuple:
+    """Return the result ids of every query and the mean latency in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([int(text) for text, _ in index.search(query, k, **params)])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall(results: list, truth: list) -> float:
+    """Return the mean fraction of true neighbours found."""
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors + args.queries, args.dimension)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    texts = [str(i) for i in range(args.vectors)]
+
+    flat = FAISSIndex(args.dimension)
+    flat.add(vectors, texts)
+    truth, flat_ms = search_all(flat, queries, args.k)
+
+    configs = [
+        (f"IVF{args.nlist},Flat", "nprobe", [1, 4, 16, 64]),
+        (f"IVF{args.nlist},PQ{args.dimension // 8}", "nprobe", [1, 4, 16, 64]),
+        ("HNSW32", "ef_search", [16, 32, 64, 128]),
+    ]
+
+    print(f"{args.vectors} vectors, dimension {args.dimension}, {args.queries} queries, recall@{args.k}")
+    print("=" * 72)
+    print(f"{'index':<22} {'setting':<16} {'recall':>8} {'ms/query':>10} {'speedup':>9} {'build s':>8}")
+    print(f"{'Flat':<22} {'exact':<16} {1.0:8.3f} {flat_ms:10.3f} {1.0:8.1f}x {'-':>8}")
+    for factory, param, values in configs:
+        start = time.perf_counter()
+        index = FAISSIndex(args.dimension, factory=factory)
+        index.add(vectors, texts)
+        build = time.perf_counter() - start
+        for value in values:
+            results, ms = search_all(index, queries, args.k, **{param: value})
+            print(
+                f"{factory:<22} {f'{param}={value}':<16} {recall(results, truth):8.3f} "
+                f"{ms:10.3f} {flat_ms / ms:8.1f}x {build:8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Micro-benchmark for the BM25 keyword index at large chunk counts.
+
+Indexes synthetic chunks mixing a common vocabulary with rare identifiers, then
+reports build throughput, postings-list lookup latency and full query latency.
+
+Usage:
+    python benchmarks/bench_bm25.py [--chunks 1000000] [--words-per-chunk 60]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.bm25_index import BM25Index
+
+
+def make_chunks(num_chunks: int, words_per_chunk: int, seed: int = 0):
+    """Yield chunks of common words with a requirement id and a part number each."""
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    for i in range(num_chunks):
+        words = rng.choices(vocabulary, k=words_per_chunk)
+        words.append(f"REQ-{i:07d}")
+        words.append(f"P{rng.randrange(100000):05d}-{rng.randrange(100):02d}")
+        yield " ".join(words)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--words-per-chunk", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    index = BM25Index()
+    start = time.perf_counter()
+    batch_ids, batch_texts = [], []
+    for chunk_id, text in enumerate(make_chunks(args.chunks, args.words_per_chunk)):
+        batch_ids.append(chunk_id)
+        batch_texts.append(text)
+        if len(batch_ids) == 10000:
+            index.add(batch_ids, batch_texts)
+            batch_ids, batch_texts = [], []
+    index.add(batch_ids, batch_texts)
+    build = time.perf_counter() - start
+
+    rng = random.Random(1)
+    terms = [f"req-{rng.randrange(args.chunks):07d}" for _ in range(args.queries)]
+    start = time.perf_counter()
+    for term in terms:
+        index._segments(index._terms[term])
+    lookup_us = (time.perf_counter() - start) / len(terms) * 1e6
+
+    def query_latency(queries) -> float:
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, k=10)
+            timings.append(time.perf_counter() - start)
+        return float(np.percentile(timings, 50) * 1000), float(np.percentile(timings, 99) * 1000)
+
+    identifier = query_latency([f"REQ-{rng.randrange(args.chunks):07d}" for _ in range(args.queries)])
+    mixed = query_latency(
+        [f"word{rng.randrange(20000)} word{rng.randrange(20000)} REQ-{rng.randrange(args.chunks):07d}"
+         for _ in range(args.queries // 10)]
+    )
+
+    print(f"{args.chunks} chunks, {index.num_terms} terms, built in {build:.1f} s "
+          f"({args.chunks / build:,.0f} chunks/s)")
+    print("=" * 72)
+    print(f"{'postings lookup (one identifier)':<40} {lookup_us:10.1f} us")
+    print(f"{'query: identifier':<40} p50 {identifier[0]:7.3f} ms  p99 {identifier[1]:7.3f} ms")
+    print(f"{'query: two common words + identifier':<40} p50 {mixed[0]:7.3f} ms  p99 {mixed[1]:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput of the embedding backends on chunk-sized inputs.
+
+Embeds the same synthetic chunks with every backend available in this
+environment, reporting chunks per second and the cosine deviation of each
+backend's embeddings from the fp32 PyTorch reference. Backends whose runtime is
+not installed are reported as skipped.
+
+Usage:
+    python benchmarks/bench_embedding_backends.py [--chunks 512] [--words 180] [--threads 4]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.embedding_model import EMBEDDING_BACKENDS, EmbeddingModel
+
+
+def make_chunks(num_chunks: int, words: int, seed: int = 0) -> list:
+    """Build chunks resembling requirement text of about the chunker's token budget."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "system", "shall", "REQ-0042", "voltage", "the", "component", "safety", "of", "12.5V",
+        "brake", "temperature", "operate", "within", "range", "controller", "signal", "fault",
+    ]
+    return [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(num_chunks)]
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--words", type=int, default=180)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.words)
+    print(f"{args.chunks} chunks of {args.words} words, model {args.model}, threads {args.threads or 'default'}")
+    print("=" * 72)
+    print(f"{'backend':<12} {'load s':>8} {'chunks/s':>10} {'speedup':>9} {'mean cos':>10} {'min cos':>10}")
+
+    reference = None
+    reference_rate = None
+    for backend in EMBEDDING_BACKENDS:
+        start = time.perf_counter()
+        try:
+            model = EmbeddingModel(args.model, backend=backend, threads=args.threads)
+        except ImportError as e:
+            print(f"{backend:<12} skipped: {e}")
+            continue
+        load = time.perf_counter() - start
+
+        model.embed(chunks[:8])  # warm-up
+        start = time.perf_counter()
+        model.embed(chunks)
+        rate = len(chunks) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference, reference_rate = model, rate
+        deviation = model.deviation_from(reference, chunks[:64])
+        print(
+            f"{backend:<12} {load:8.1f} {rate:10.1f} {rate / reference_rate:8.2f}x "
+            f"{deviation['mean_cosine']:10.5f} {deviation['min_cosine']:10.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
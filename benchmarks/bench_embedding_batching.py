@@ -0,0 +1,89 @@
+"""Throughput of length-bucketed and multi-process embedding on mixed-length chunks.
+
+Embeds the same chunks, whose lengths vary from a sentence to a full chunk, with
+the model's fixed-size batches, with length-bucketed adaptive batches, and with
+length-bucketed batches spread over model replica processes. Reports chunks per
+second and checks that every variant returns the embeddings in input order.
+
+Usage:
+    python benchmarks/bench_embedding_batching.py [--chunks 2048] [--processes 2] [--batch-tokens 8192]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.embedding_model import EmbeddingModel
+
+
+def make_chunks(num_chunks: int, min_words: int, max_words: int, seed: int = 0) -> list:
+    """Build requirement-like chunks with word counts spread over [min_words, max_words]."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "system", "shall", "REQ-0042", "voltage", "the", "component", "safety", "of", "12.5V",
+        "brake", "temperature", "operate", "within", "range", "controller", "signal", "fault",
+    ]
+    return [
+        " ".join(rng.choice(vocabulary) for _ in range(rng.randint(min_words, max_words)))
+        for _ in range(num_chunks)
+    ]
+
+
+def timed(encode, chunks: list) -> tuple:
+    """Return (embeddings, chunks per second) of one encode call."""
+    start = time.perf_counter()
+    embeddings = encode(chunks)
+    return embeddings, len(chunks) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--chunks", type=int, default=2048)
+    parser.add_argument("--min-words", type=int, default=8)
+    parser.add_argument("--max-words", type=int, default=180)
+    parser.add_argument("--batch-size", type=int, default=32, help="Fixed batch size of the baseline")
+    parser.add_argument("--batch-tokens", type=int, default=8192)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks, args.min_words, args.max_words)
+    print(f"{args.chunks} chunks of {args.min_words}-{args.max_words} words, model {args.model}")
+    print("=" * 60)
+    print(f"{'variant':<28} {'chunks/s':>10} {'speedup':>9} {'max diff':>10}")
+
+    model = EmbeddingModel(args.model, batch_tokens=args.batch_tokens)
+    model.warm_up()
+    reference, baseline = timed(
+        lambda texts: np.asarray(
+            model.model.encode(texts, batch_size=args.batch_size, show_progress_bar=False), dtype="float32"
+        ),
+        chunks,
+    )
+    print(f"{f'fixed batches of {args.batch_size}':<28} {baseline:10.1f} {1:8.2f}x {0:10.2e}")
+
+    embeddings, rate = timed(model.embed, chunks)
+    diff = float(np.abs(embeddings - reference).max())
+    print(f"{'length-bucketed':<28} {rate:10.1f} {rate / baseline:8.2f}x {diff:10.2e}")
+
+    parallel = EmbeddingModel(
+        args.model, batch_tokens=args.batch_tokens, processes=args.processes, parallel_min_texts=1
+    )
+    parallel.embed(chunks[: args.processes * 4])  # start the replicas
+    embeddings, rate = timed(parallel.embed, chunks)
+    parallel.close()
+    diff = float(np.abs(embeddings - reference).max())
+    label = f"bucketed, {args.processes} processes"
+    print(f"{label:<28} {rate:10.1f} {rate / baseline:8.2f}x {diff:10.2e}")
+
+
+if __name__ == "__main__":
+    main()
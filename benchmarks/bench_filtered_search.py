@@ -0,0 +1,92 @@
+"""Latency of metadata-filtered searches compared with unfiltered ones.
+
+Spreads synthetic clustered vectors over documents tagged with one of several
+product lines, then measures per-query latency without a filter and restricted
+to one product line, together with recall@k of the filtered search against an
+exact search over the matching chunks only.
+
+Usage:
+    python benchmarks/bench_filtered_search.py [--vectors 200000] [--lines 10]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.faiss_index import FAISSIndex
+
+
+def make_vectors(num_vectors: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Build unit vectors grouped around random centres, like sentence embeddings of topics."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(num_vectors // 500, 1), dimension))
+    vectors = centres[rng.integers(len(centres), size=num_vectors)]
+    vectors = vectors + 0.6 * rng.standard_normal((num_vectors, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def recall(results: list, truth: list) -> float:
+    """Return the mean fraction of true neighbours found."""
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+
+def search_ids(index: FAISSIndex, queries: np.ndarray, k: int, **params) -> tuple:
+    """Return the result ids of every query and the mean latency in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([chunk_id for chunk_id, _ in index.search_ids_batch(query[None], k, **params)[0]])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=10)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors + args.queries, args.dimension)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    texts = [str(i) for i in range(args.vectors)]
+    rng = np.random.default_rng(1)
+    owners = rng.integers(args.documents, size=args.vectors)
+    names = [f"doc{owner}.pdf" for owner in owners]
+    where = {"line": "line0"}
+    selected = np.flatnonzero(owners % args.lines == 0)
+
+    exact = FAISSIndex(args.dimension)
+    exact.add(vectors[selected], [str(i) for i in selected])
+    truth = [[int(exact.texts[i]) for i, _ in ranked] for ranked in exact.search_ids_batch(queries, args.k)]
+
+    print(f"{args.vectors} vectors in {args.documents} documents, filter keeps 1 of {args.lines} product lines")
+    print("=" * 72)
+    print(f"{'index':<16} {'unfiltered ms':>14} {'filtered ms':>12} {'ratio':>7} {'filtered recall':>16}")
+    for factory, params in [("Flat", {}), ("IVF1024,Flat", {"nprobe": 32}), ("HNSW32", {"ef_search": 64})]:
+        index = FAISSIndex(args.dimension, factory=factory)
+        for document in range(args.documents):
+            index.set_metadata(f"doc{document}.pdf", {"line": f"line{document % args.lines}"})
+        index.add(vectors, texts, documents=names)
+        # The first filtered search builds the cached selector
+        index.search_ids_batch(queries[:1], args.k, where=where, **params)
+        _, plain_ms = search_ids(index, queries, args.k, **params)
+        results, filtered_ms = search_ids(index, queries, args.k, where=where, **params)
+        print(
+            f"{factory:<16} {plain_ms:14.3f} {filtered_ms:12.3f} {filtered_ms / plain_ms:6.2f}x "
+            f"{recall(results, truth):16.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
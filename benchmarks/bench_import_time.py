@@ -0,0 +1,72 @@
+"""Import-time report for the API module.
+
+Imports a module in a fresh interpreter with -X importtime and prints the total
+import time, the slowest top-level packages, and whether any of the heavy
+packages that should only be loaded on first use were imported. Exits non-zero
+when --max-seconds is exceeded or a heavy package was imported, so it can guard
+against regressions in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py [--module src.api.app] [--top 15] [--max-seconds 2]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Packages the API must not import before they are needed
+HEAVY_PACKAGES = ("torch", "sentence_transformers", "transformers", "faiss", "reportlab", "onnxruntime")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def measure(module: str) -> tuple:
+    """Import module in a subprocess and return ({top-level package: seconds}, total seconds).
+
+    Each package is charged the time spent importing its own modules, excluding
+    the packages they import in turn.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue
+        top = match.group(3).split(".")[0]
+        packages[top] = packages.get(top, 0.0) + int(match.group(1)) / 1e6
+    return packages, sum(packages.values())
+
+
+def main() -> None:
+    """Print the report."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="src.api.app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    packages, total = measure(args.module)
+    print(f"import {args.module}: {total:.3f} s")
+    print("=" * 48)
+    for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<32} {seconds:10.3f} s")
+
+    heavy = [name for name in HEAVY_PACKAGES if name in packages]
+    if heavy:
+        print(f"\nheavy packages imported eagerly: {', '.join(heavy)}")
+    if heavy or (args.max_seconds is not None and total > args.max_seconds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
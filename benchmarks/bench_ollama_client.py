@@ -0,0 +1,132 @@
+"""Per-call overhead of the Ollama client backends.
+
+Times OllamaClient.generate with the HTTP backend over its pooled keep-alive
+session, with a fresh connection per call, and with the CLI backend that starts
+an `ollama run` process per call. By default both paths talk to local stubs
+that answer instantly (an HTTP stub server and an `ollama` shell script put
+first on PATH), so the timings are pure client overhead; the stub script is a
+lower bound on the real CLI's startup. Pass --url and --model to measure
+against a real Ollama server instead, where model load time is included unless
+keep_alive holds the model between calls.
+
+Usage:
+    python benchmarks/bench_ollama_client.py [--calls 50] [--url http://localhost:11434 --model llama3]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.generation.llm_client import OllamaClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answer /api/generate instantly with a fixed response."""
+
+    protocol_version = "HTTP/1.1"
+    # Like Ollama's Go server; otherwise Nagle's algorithm delays keep-alive replies by ~40 ms
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = json.dumps({"model": body["model"], "response": "stub output", "done": True}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server() -> ThreadingHTTPServer:
+    """Start the stub server on a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def install_stub_cli(directory: str) -> None:
+    """Put an `ollama` script that echoes a fixed response first on PATH."""
+    script = Path(directory) / "ollama"
+    script.write_text("#!/bin/sh\ncat > /dev/null\necho stub output\n")
+    script.chmod(0o755)
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ['PATH']}"
+
+
+def time_calls(generate, calls: int) -> list:
+    """Return the latency in milliseconds of each call after one warm-up call."""
+    generate()
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        generate()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--url", default=None, help="Real Ollama server (default: local stubs)")
+    parser.add_argument("--model", default="llama3")
+    parser.add_argument("--keep-alive", default="5m")
+    parser.add_argument("--prompt", default="Reply with one word.")
+    args = parser.parse_args()
+
+    server = None
+    stub_dir = None
+    url = args.url
+    if url is None:
+        server = start_stub_server()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        stub_dir = tempfile.TemporaryDirectory()
+        install_stub_cli(stub_dir.name)
+
+    def pooled():
+        return client.generate(args.prompt)
+
+    def fresh_connection():
+        fresh = OllamaClient(args.model, base_url=url, keep_alive=args.keep_alive, fallback=False)
+        try:
+            return fresh.generate(args.prompt)
+        finally:
+            fresh.close()
+
+    client = OllamaClient(args.model, base_url=url, keep_alive=args.keep_alive, fallback=False)
+    cli = OllamaClient(args.model, backend="cli")
+    variants = [
+        ("http, pooled session", pooled),
+        ("http, new connection", fresh_connection),
+        ("cli, process per call", lambda: cli.generate(args.prompt)),
+    ]
+
+    print(f"{args.calls} calls against {args.url or 'local stubs'}")
+    print("=" * 64)
+    print(f"{'backend':<24} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name, generate in variants:
+        latencies = sorted(time_calls(generate, args.calls))
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{name:<24} {statistics.mean(latencies):10.2f} {statistics.median(latencies):10.2f} {p95:10.2f}")
+
+    client.close()
+    if server is not None:
+        server.shutdown()
+        stub_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
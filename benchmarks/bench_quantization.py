@@ -0,0 +1,97 @@
+"""Memory, latency and recall@k of compressed vector storage options.
+
+Builds a FAISSIndex per storage option over the same synthetic clustered vectors
+and reports the in-memory index size, per-query latency and recall@k against
+the exact float32 flat index. Options with rescoring keep float32 vectors in a
+memory-mapped file on disk (not counted as index memory) and reorder
+rescore * k compressed candidates by exact distance.
+
+Usage:
+    python benchmarks/bench_quantization.py [--vectors 200000] [--dimension 384] [--queries 500]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.faiss_index import FAISSIndex
+
+
+def make_vectors(num_vectors: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Build unit vectors grouped around random centres, like sentence embeddings of topics."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(num_vectors // 500, 1), dimension))
+    vectors = centres[rng.integers(len(centres), size=num_vectors)]
+    vectors = vectors + 0.6 * rng.standard_normal((num_vectors, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def search_all(index: FAISSIndex, queries: np.ndarray, k: int, **params) -> tuple:
+    """Return the result ids of every query and the mean latency in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([chunk_id for chunk_id, _ in index.search_ids_batch(query[None, :], k, **params)[0]])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def recall(results: list, truth: list) -> float:
+    """Return the mean fraction of true neighbours found."""
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)]))
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors + args.queries, args.dimension)
+    vectors, queries = vectors[:args.vectors], vectors[args.vectors:]
+    texts = [""] * args.vectors
+    pq = f"PQ{args.dimension // 8}"
+
+    options = [
+        ("Flat", None, {}),
+        ("SQfp16", None, {}),
+        ("SQ8", None, {}),
+        ("SQ8", 2, {}),
+        (pq, None, {}),
+        (pq, 4, {}),
+        (f"IVF{args.nlist},SQ8", None, {"nprobe": 16}),
+        (f"IVF{args.nlist},{pq}", 4, {"nprobe": 16}),
+    ]
+
+    print(f"{args.vectors} vectors, dimension {args.dimension}, {args.queries} queries, recall@{args.k}")
+    print("=" * 84)
+    print(f"{'storage':<22} {'rescore':>7} {'index MB':>9} {'B/vector':>9} {'ms/query':>9} {'recall':>7} {'build s':>8}")
+    truth = None
+    for factory, rescore, params in options:
+        start = time.perf_counter()
+        index = FAISSIndex(args.dimension, factory=factory, rescore=rescore)
+        index.add(vectors, texts)
+        build = time.perf_counter() - start
+        size = len(faiss.serialize_index(index.index))
+        results, ms = search_all(index, queries, args.k, **params)
+        if truth is None:
+            truth = results
+        print(
+            f"{factory:<22} {rescore or '-':>7} {size / 1e6:9.1f} {size / args.vectors:9.1f} "
+            f"{ms:9.3f} {recall(results, truth):7.3f} {build:8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
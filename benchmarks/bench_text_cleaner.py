@@ -0,0 +1,79 @@
+"""Micro-benchmark for text cleaning over large synthetic text.
+
+Compares the previous three-pass cleaner with the single-pass clean_text and the
+page-streaming clean_pages, reporting throughput and peak memory.
+
+Usage:
+    python benchmarks/bench_text_cleaner.py [--pages 2000] [--words-per-page 500]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.parse.text_cleaner import clean_pages, clean_text
+
+
+def clean_text_three_pass(text: str) -> str:
+    """Previous implementation: one replace and two re.sub passes."""
+    text = text.replace("\r", "\n")
+    text = re.sub(r"\n+", "\n", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    return text.strip()
+
+
+def make_pages(num_pages: int, words_per_page: int, seed: int = 0) -> list:
+    """Build pages resembling extracted PDF text."""
+    rng = random.Random(seed)
+    vocabulary = ["system", "shall", "REQ-0042", "voltage", "the", "component", "safety", "of", "12.5V"]
+    # Mostly single spaces and line breaks, with occasional runs that need collapsing
+    separators = [" "] * 40 + ["\n"] * 4 + ["  ", "\t", " \n", "\r\n", "\n\n"]
+    pages = []
+    for _ in range(num_pages):
+        pages.append("".join(rng.choice(vocabulary) + rng.choice(separators) for _ in range(words_per_page)))
+    return pages
+
+
+def measure(label: str, func, size_mb: float, repeat: int = 3) -> None:
+    """Report the best time of func and, in a separate traced run, its peak memory."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<38} {elapsed:7.3f} s {size_mb / elapsed:8.1f} MB/s  peak {peak / 1e6:8.1f} MB")
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--words-per-page", type=int, default=500)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, args.words_per_page)
+    text = "\n".join(pages)
+    size_mb = len(text) / 1e6
+    assert clean_text(text) == clean_text_three_pass(text)
+    assert "".join(clean_pages(pages)) == clean_text(text)
+
+    print(f"Synthetic text: {args.pages} pages, {size_mb:.1f} MB")
+    print("=" * 84)
+    measure("three-pass clean_text (previous)", lambda: clean_text_three_pass("\n".join(pages)), size_mb)
+    measure("single-pass clean_text", lambda: clean_text("\n".join(pages)), size_mb)
+    measure("clean_pages (streamed, consumed)", lambda: sum(len(p) for p in clean_pages(pages)), size_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,262 @@
 """FastAPI application for DocRAG system."""
 
-from typing import List, Optional
-
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import Response
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-
-from src.embed.embedding_model import EmbeddingModel
-from src.embed.vector_store import FaissVectorStore
-from src.generation.llm_client import OllamaClient
-from src.generation.prompt_builder import build_technical_doc_prompt
-from src.parse.chunker import chunk_text
-from src.parse.pdf_parser import extract_text_from_pdf
-from src.parse.text_cleaner import clean_text
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from src.embed.embedding_model import DEFAULT_BATCH_TOKENS, EmbeddingModel
+from src.generation.llm_client import DEFAULT_OLLAMA_URL, OllamaClient
+from src.generation.prompt_builder import build_technical_doc_prompt, pack_contexts
+from src.generation.response_cache import ResponseCache
+from src.generation.scheduler import GenerationScheduler, QueueFullError, QueueTimeoutError
+from src.ingest.indexer import Indexer
+from src.ingest.jobs import Job, JobManager
+from src.ingest.saver import DebouncedSaver
+from src.retrieval.reranker import CrossEncoderReranker
 from src.retrieval.retriever import Retriever
-from src.utils.pdf_exporter import export_document_to_pdf, export_validation_report_to_pdf
 from src.validation.validator import validate_document
 
+# Heavy dependencies (torch, faiss, reportlab) are imported when first used, so
+# the server starts accepting connections quickly; models load in the background
+if TYPE_CHECKING:
+    from src.embed.sharded_store import ShardedVectorStore
+    from src.embed.vector_store import FaissVectorStore
+
 app = FastAPI(title="DocRAG API", description="Technical Document Generation and Validation System")
 
+# Directory of the persistent embedding cache (disabled when unset)
+EMBEDDING_CACHE_DIR = os.environ.get("DOCRAG_EMBEDDING_CACHE_DIR")
+
+# Embedding inference backend ("torch", "onnx" or "onnx-int8") and its intra-op thread count
+EMBEDDING_BACKEND = os.environ.get("DOCRAG_EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.environ["DOCRAG_EMBEDDING_THREADS"]) if "DOCRAG_EMBEDDING_THREADS" in os.environ else None
+
+# Model replica processes for large embedding jobs, and the padded-token budget of each encoder batch
+EMBEDDING_PROCESSES = int(os.environ.get("DOCRAG_EMBEDDING_PROCESSES", "1"))
+EMBEDDING_BATCH_TOKENS = int(os.environ.get("DOCRAG_EMBEDDING_BATCH_TOKENS", str(DEFAULT_BATCH_TOKENS)))
+
+# Directory the index and document registry are persisted to (in-memory only when unset), and the
+# seconds changes are collected for before they are saved together (0 saves after every change)
+INDEX_DIR = os.environ.get("DOCRAG_INDEX_DIR")
+INDEX_SAVE_INTERVAL = float(os.environ.get("DOCRAG_INDEX_SAVE_INTERVAL", "30"))
+
+# FAISS index type and its default search-time tuning
+INDEX_FACTORY = os.environ.get("DOCRAG_INDEX_FACTORY", "Flat")
+INDEX_NPROBE = int(os.environ["DOCRAG_INDEX_NPROBE"]) if "DOCRAG_INDEX_NPROBE" in os.environ else None
+INDEX_EF_SEARCH = int(os.environ["DOCRAG_INDEX_EF_SEARCH"]) if "DOCRAG_INDEX_EF_SEARCH" in os.environ else None
+INDEX_RESCORE = int(os.environ["DOCRAG_INDEX_RESCORE"]) if "DOCRAG_INDEX_RESCORE" in os.environ else None
+
+# Number of index shards searched in parallel, held in threads or worker processes
+INDEX_SHARDS = int(os.environ.get("DOCRAG_INDEX_SHARDS", "1"))
+INDEX_SHARD_MODE = os.environ.get("DOCRAG_INDEX_SHARD_MODE", "thread")
+
+# Size and time-to-live (seconds) of the query-embedding and retrieval-result caches
+QUERY_CACHE_SIZE = int(os.environ.get("DOCRAG_QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.environ["DOCRAG_QUERY_CACHE_TTL"]) if "DOCRAG_QUERY_CACHE_TTL" in os.environ else None
+
+# Retrieval ranking: "dense" (embedding distance) or "hybrid" (dense fused with BM25)
+RETRIEVAL_MODE = os.environ.get("DOCRAG_RETRIEVAL_MODE", "dense")
+
+# Optional cross-encoder reranking of retrieved chunks (disabled when no model is set)
+RERANK_MODEL = os.environ.get("DOCRAG_RERANK_MODEL")
+RERANK_CANDIDATES = int(os.environ.get("DOCRAG_RERANK_CANDIDATES", "20"))
+RERANK_BUDGET = float(os.environ["DOCRAG_RERANK_BUDGET_MS"]) / 1000 if "DOCRAG_RERANK_BUDGET_MS" in os.environ else None
+
+# Ollama model and how it is reached: "http" (pooled keep-alive connections to OLLAMA_URL,
+# falling back to the CLI when the server is unreachable) or "cli" (one `ollama run` per request)
+OLLAMA_MODEL = os.environ.get("DOCRAG_OLLAMA_MODEL", "llama3")
+OLLAMA_BACKEND = os.environ.get("DOCRAG_OLLAMA_BACKEND", "http")
+OLLAMA_URL = os.environ.get("DOCRAG_OLLAMA_URL", DEFAULT_OLLAMA_URL)
+OLLAMA_KEEP_ALIVE: Optional[Union[str, int]] = os.environ.get("DOCRAG_OLLAMA_KEEP_ALIVE")
+if OLLAMA_KEEP_ALIVE is not None and OLLAMA_KEEP_ALIVE.lstrip("-").isdigit():
+    # Plain numbers are seconds; Ollama only parses strings with a unit, such as "10m"
+    OLLAMA_KEEP_ALIVE = int(OLLAMA_KEEP_ALIVE)
+OLLAMA_OPTIONS = json.loads(os.environ["DOCRAG_OLLAMA_OPTIONS"]) if "DOCRAG_OLLAMA_OPTIONS" in os.environ else None
+OLLAMA_TIMEOUT = int(os.environ.get("DOCRAG_OLLAMA_TIMEOUT", "300"))
+
+# Chunks retrieved as generation context, and the budget they are packed into after merging
+# overlapping chunks, in tokens of the embedding model's tokenizer (which approximates the LLM's);
+# chunks that do not fit are left out, least relevant first
+CONTEXT_CHUNKS = int(os.environ.get("DOCRAG_CONTEXT_CHUNKS", "5"))
+CONTEXT_TOKENS = int(os.environ.get("DOCRAG_CONTEXT_TOKENS", "1500"))
+
+# Admission control in front of the LLM: concurrent generations, queued requests beyond which
+# new ones get 429, and the longest a request may wait in the queue before it gets 503
+LLM_CONCURRENCY = int(os.environ.get("DOCRAG_LLM_CONCURRENCY", "1"))
+LLM_QUEUE_SIZE = int(os.environ.get("DOCRAG_LLM_QUEUE_SIZE", "16"))
+LLM_MAX_QUEUE_WAIT = float(os.environ["DOCRAG_LLM_MAX_QUEUE_WAIT"]) if "DOCRAG_LLM_MAX_QUEUE_WAIT" in os.environ else None
+
+# Cache of generated documents: size (0 disables it), time-to-live in seconds, directory it is
+# persisted to, and the cosine distance within which a similar query over the same chunks is served
+RESPONSE_CACHE_SIZE = int(os.environ.get("DOCRAG_RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.environ["DOCRAG_RESPONSE_CACHE_TTL"]) if "DOCRAG_RESPONSE_CACHE_TTL" in os.environ else None
+RESPONSE_CACHE_DIR = os.environ.get("DOCRAG_RESPONSE_CACHE_DIR")
+RESPONSE_CACHE_DISTANCE = (
+    float(os.environ["DOCRAG_RESPONSE_CACHE_DISTANCE"]) if "DOCRAG_RESPONSE_CACHE_DISTANCE" in os.environ else None
+)
+
 # Global instances
 embed_model: Optional[EmbeddingModel] = None
-vector_store: Optional[FaissVectorStore] = None
+vector_store: Optional[Union["FaissVectorStore", "ShardedVectorStore"]] = None
 retriever: Optional[Retriever] = None
 llm_client: Optional[OllamaClient] = None
+response_cache: Optional[ResponseCache] = None
+llm_scheduler: Optional[GenerationScheduler] = None
+indexer: Optional[Indexer] = None
+index_saver: Optional[DebouncedSaver] = None
+job_manager = JobManager(max_workers=1)
+last_ingest_stats: Optional[Dict[str, Any]] = None
+
+# Background startup progress reported by /ready: "starting", "ready" or "failed"
+startup_state: Dict[str, Any] = {"status": "starting", "error": None, "seconds": None}
+_components_lock = threading.Lock()
 
 
 def initialize_components() -> None:
-    """Initialize global components."""
-    global embed_model, vector_store, retriever, llm_client
+    """Initialize global components; callers wait while another thread is initializing them.
+
+    Succeeding after the background start failed marks the service ready again.
+    """
+    with _components_lock:
+        _initialize_components()
+        if startup_state["status"] == "failed":
+            startup_state.update(status="ready", error=None)
+
+
+def _initialize_components() -> None:
+    """Initialize global components while holding the components lock."""
+    global embed_model, vector_store, retriever, llm_client, llm_scheduler, response_cache, indexer, index_saver
     if embed_model is None:
-        embed_model = EmbeddingModel()
+        embed_model = EmbeddingModel(
+            cache_dir=EMBEDDING_CACHE_DIR,
+            backend=EMBEDDING_BACKEND,
+            threads=EMBEDDING_THREADS,
+            batch_tokens=EMBEDDING_BATCH_TOKENS,
+            processes=EMBEDDING_PROCESSES,
+        )
     if vector_store is None:
-        vector_store = FaissVectorStore(dimension=384)
+        index_settings = {
+            "factory": INDEX_FACTORY,
+            "nprobe": INDEX_NPROBE,
+            "ef_search": INDEX_EF_SEARCH,
+            "rescore": INDEX_RESCORE,
+        }
+        if INDEX_SHARDS > 1:
+            from src.embed.sharded_store import ShardedVectorStore
+
+            vector_store = ShardedVectorStore(
+                embed_model.dimension, shards=INDEX_SHARDS, mode=INDEX_SHARD_MODE, **index_settings
+            )
+        else:
+            from src.embed.vector_store import FaissVectorStore
+
+            vector_store = FaissVectorStore(dimension=embed_model.dimension, **index_settings)
     if retriever is None:
-        retriever = Retriever(embed_model, vector_store)
+        retriever = Retriever(
+            embed_model,
+            vector_store,
+            cache_size=QUERY_CACHE_SIZE,
+            cache_ttl=QUERY_CACHE_TTL,
+            mode=RETRIEVAL_MODE,
+            reranker=CrossEncoderReranker(RERANK_MODEL) if RERANK_MODEL else None,
+            rerank_candidates=RERANK_CANDIDATES,
+            rerank_budget=RERANK_BUDGET,
+        )
     if llm_client is None:
-        llm_client = OllamaClient()
+        llm_client = OllamaClient(
+            OLLAMA_MODEL,
+            backend=OLLAMA_BACKEND,
+            base_url=OLLAMA_URL,
+            keep_alive=OLLAMA_KEEP_ALIVE,
+            options=OLLAMA_OPTIONS,
+        )
+    if llm_scheduler is None:
+        llm_scheduler = GenerationScheduler(LLM_CONCURRENCY, LLM_QUEUE_SIZE, max_wait=LLM_MAX_QUEUE_WAIT)
+    if response_cache is None:
+        path = None
+        if RESPONSE_CACHE_DIR is not None:
+            os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+            path = os.path.join(RESPONSE_CACHE_DIR, "responses.json")
+        response_cache = ResponseCache(
+            RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL, max_distance=RESPONSE_CACHE_DISTANCE, path=path
+        )
+    if indexer is None:
+        indexer = Indexer(embed_model, vector_store)
+        if INDEX_DIR is not None and Indexer.is_saved(INDEX_DIR):
+            indexer.load(INDEX_DIR)
+    if index_saver is None and INDEX_DIR is not None:
+        index_saver = DebouncedSaver(lambda: indexer.save(INDEX_DIR), INDEX_SAVE_INTERVAL)
+
+
+def warm_up() -> None:
+    """Run the models and the index once, so the first request does not pay for lazy initialization."""
+    embed_model.warm_up()
+    if len(vector_store):
+        vector_store.search_batch(np.zeros((1, vector_store.dimension), dtype="float32"), k=1)
+    if retriever.reranker is not None:
+        retriever.reranker.warm_up()
+
+
+def _start_components() -> None:
+    """Initialize and warm up the components, recording the outcome for /ready."""
+    started = time.monotonic()
+    try:
+        initialize_components()
+        warm_up()
+    except Exception as e:
+        startup_state.update(status="failed", error=str(e))
+        return
+    startup_state.update(status="ready", seconds=round(time.monotonic() - started, 3))
 
 
 @app.on_event("startup")
 async def startup_event() -> None:
-    """Initialize components on startup."""
-    initialize_components()
+    """Start loading and warming up components in the background."""
+    threading.Thread(target=_start_components, name="docrag-startup", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    """Save index changes still waiting for the next scheduled save."""
+    if index_saver is not None:
+        index_saver.close()
 
 
 class GenerateRequest(BaseModel):
-    """Request model for document generation."""
+    """Request model for document generation, optionally restricted to some documents.
+
+    Requests waiting for the LLM are served by descending priority, then in arrival order.
+    """
 
     query: str
+    priority: int = 0
+    documents: Optional[List[str]] = None
+    where: Optional[Dict[str, Any]] = None
 
 
 class GenerateResponse(BaseModel):
-    """Response model for document generation."""
+    """Response model for document generation.
+
+    cached is "exact" or "semantic" when the document was served from the cache;
+    context reports how the retrieved chunks were packed into the prompt.
+    """
 
     document: str
     validation: dict
+    cached: Optional[str] = None
+    context: Optional[dict] = None
 
 
 class ValidateRequest(BaseModel):
@@ -75,6 +276,63 @@ class IndexResponse(BaseModel):
 
     message: str
     chunks_count: int
+    status: str = "indexed"
+    chunks_added: int = 0
+    chunks_removed: int = 0
+    metadata_updated: bool = False
+    pipeline: Optional[dict] = None
+    error: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    """Response model for a background indexing job."""
+
+    job_id: str
+    name: Optional[str] = None
+    status: str
+    progress: Dict[str, int]
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    submitted_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+class BatchIndexResponse(BaseModel):
+    """Response model for bulk document indexing."""
+
+    message: str
+    chunks_added: int
+    results: List[IndexResponse]
+
+
+class RetrieveBatchRequest(BaseModel):
+    """Request model for batched retrieval, optionally restricted to some documents."""
+
+    queries: List[str]
+    k: int = 5
+    documents: Optional[List[str]] = None
+    where: Optional[Dict[str, Any]] = None
+
+
+class RetrievedChunk(BaseModel):
+    """A retrieved chunk with its ranking score, whose meaning depends on the retrieval mode.
+
+    Chunks are always listed best first. In dense mode the score is the squared
+    L2 distance to the query (ascending, lower is closer); in hybrid mode it is
+    the fused reciprocal-rank score (descending, higher is better); with a
+    reranker it is the cross-encoder score (descending), unless reranking ran
+    out of its budget and the first-stage scores and order were kept.
+    """
+
+    text: str
+    score: float
+
+
+class RetrieveBatchResponse(BaseModel):
+    """Response model for batched retrieval, one ranked list per query."""
+
+    results: List[List[RetrievedChunk]]
 
 
 class ExportRequest(BaseModel):
@@ -91,63 +349,240 @@ def root() -> dict:
     return {"message": "DocRAG API", "status": "running"}
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    """Report whether models are loaded and warmed up (200), or still starting or failed (503)."""
+    status_code = 200 if startup_state["status"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=dict(startup_state))
+
+
 @app.post("/index", response_model=IndexResponse)
-async def index_document(file: UploadFile = File(...)) -> IndexResponse:
-    """Index a new document (PDF) for retrieval."""
+async def index_document(file: UploadFile = File(...), metadata: Optional[str] = Form(None)) -> IndexResponse:
+    """Index a new document (PDF) for retrieval, with optional JSON metadata for filtered search."""
+    job = await _submit_index_job(file, metadata)
+    try:
+        # Indexing runs on the job worker; awaiting it keeps the event loop free
+        result = await asyncio.wrap_future(job.future)
+        return _index_response(result)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Error indexing document: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error indexing document: {str(e)}")
+
+
+@app.post("/index/jobs", response_model=JobResponse, status_code=202)
+async def submit_index_job(file: UploadFile = File(...), metadata: Optional[str] = Form(None)) -> JobResponse:
+    """Queue a document (PDF) for background indexing and return its job immediately."""
+    job = await _submit_index_job(file, metadata)
+    return JobResponse(**job.to_dict())
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str) -> JobResponse:
+    """Report the progress and result of a background job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job '{job_id}'")
+    return JobResponse(**job.to_dict())
+
+
+async def _submit_index_job(file: UploadFile, metadata: Optional[str] = None) -> Job:
+    """Validate and save an uploaded PDF, then queue it for indexing."""
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
 
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
+    document_metadata = _parse_metadata(metadata)
+
+    # Save uploaded file temporarily; the job removes it when done, so until then it is ours to remove
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        try:
+            tmp_file.write(await file.read())
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+        tmp_path = tmp_file.name
+
     try:
-        # Save uploaded file temporarily
-        import tempfile
-        import os
+        return job_manager.submit(
+            lambda job: _index_file_job(job, tmp_path, file.filename, document_metadata), name=file.filename
+        )
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            content = await file.read()
-            tmp_file.write(content)
-            tmp_path = tmp_file.name
 
-        try:
-            # Parse PDF
-            raw_text = extract_text_from_pdf(tmp_path)
-            cleaned_text = clean_text(raw_text)
-            chunks = chunk_text(cleaned_text, max_tokens=300, overlap=50)
-
-            # Initialize components if needed
-            initialize_components()
-
-            # Generate embeddings
-            embeddings = embed_model.embed(chunks)
-            dimension = embeddings.shape[1]
-
-            # Initialize or update vector store if needed
-            global vector_store, retriever
-            if vector_store is None or vector_store.index.index.ntotal == 0:
-                vector_store = FaissVectorStore(dimension=dimension)
-                retriever = Retriever(embed_model, vector_store)
-
-            # Check dimension compatibility
-            if vector_store.index.dimension != dimension:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Embedding dimension mismatch. Expected {vector_store.index.dimension}, got {dimension}",
-                )
+def _parse_metadata(metadata: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Parse document metadata sent as a JSON object string."""
+    if metadata is None:
+        return None
+    try:
+        parsed = json.loads(metadata)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Metadata must be a JSON object")
+    if not isinstance(parsed, dict):
+        raise HTTPException(status_code=400, detail="Metadata must be a JSON object")
+    return parsed
 
-            # Add embeddings to store
-            vector_store.add(embeddings, chunks)
 
-            return IndexResponse(
-                message=f"Document '{file.filename}' indexed successfully",
-                chunks_count=len(chunks),
+def _index_file_job(job: Job, path: str, name: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Index one saved PDF on the job worker."""
+    try:
+        # Initialize components if needed
+        initialize_components()
+
+        # Stream pages through extraction, chunking, embedding and storage,
+        # skipping the document or its chunks when their content is unchanged
+        result = indexer.index_file(path, name=name, progress=job.advance, metadata=metadata)
+
+        global last_ingest_stats
+        if result["pipeline"] is not None:
+            last_ingest_stats = result["pipeline"]
+        _persist([result])
+        return result
+    finally:
+        os.unlink(path)
+
+
+@app.post("/index/batch", response_model=BatchIndexResponse)
+async def index_documents(
+    files: List[UploadFile] = File(...), metadata: Optional[str] = Form(None)
+) -> BatchIndexResponse:
+    """Index many documents (PDFs) in one request with pooled embedding batches.
+
+    metadata is an optional JSON object mapping file names to their metadata objects.
+    """
+    names = [file.filename for file in files]
+    if not files or not all(names):
+        raise HTTPException(status_code=400, detail="No file provided")
+
+    if not all(name.endswith(".pdf") for name in names):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=400, detail="Duplicate file names in batch")
+
+    by_name = _parse_metadata(metadata) or {}
+    unknown = sorted(set(by_name) - set(names))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Metadata given for files not in the batch: {unknown}")
+    if not all(isinstance(entry, dict) for entry in by_name.values()):
+        raise HTTPException(status_code=400, detail="Metadata of each file must be a JSON object")
+    document_metadata = [by_name.get(name) for name in names]
+
+    try:
+        # The job removes the saved files when done, so until it is submitted they are ours to remove
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i, file in enumerate(files):
+                path = os.path.join(tmp_dir, f"{i}.pdf")
+                with open(path, "wb") as tmp_file:
+                    tmp_file.write(await file.read())
+                paths.append(path)
+
+            job = job_manager.submit(
+                lambda job: _index_batch_job(job, tmp_dir, paths, names, document_metadata), name="batch"
             )
-        finally:
-            os.unlink(tmp_path)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        results = await asyncio.wrap_future(job.future)
+
+        chunks_added = sum(result["chunks_added"] for result in results)
+        failed = sum(result["status"] == "failed" for result in results)
+        return BatchIndexResponse(
+            message=f"Indexed {len(results) - failed} of {len(results)} documents",
+            chunks_added=chunks_added,
+            results=[_index_response(result) for result in results],
+        )
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error indexing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error indexing documents: {str(e)}")
+
+
+def _index_batch_job(
+    job: Job,
+    tmp_dir: str,
+    paths: List[str],
+    names: List[str],
+    metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """Index several saved PDFs on the job worker."""
+    try:
+        initialize_components()
+        results = indexer.index_files(paths, names=names, progress=job.advance, metadata=metadata)
+        _persist(results)
+        return results
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _persist(results: List[Dict[str, Any]]) -> None:
+    """Schedule saving the index if any document or its metadata was indexed, updated or removed."""
+    changed = any(
+        result["status"] in ("indexed", "updated", "removed") or result.get("metadata_updated") for result in results
+    )
+    if index_saver is not None and changed:
+        index_saver.mark_dirty()
+
+
+@app.delete("/documents/{name}", response_model=IndexResponse)
+def delete_document(name: str) -> IndexResponse:
+    """Remove an indexed document and all its chunks."""
+    initialize_components()
+
+    result = indexer.remove_document(name)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document '{name}'")
+    _persist([result])
+    return _index_response(result)
+
+
+def _index_response(result: Dict[str, Any]) -> IndexResponse:
+    """Build the response for one indexed document."""
+    name = result["document"]
+    if result["status"] == "unchanged" and result.get("metadata_updated"):
+        message = f"Document '{name}' is unchanged, skipped re-indexing and updated its metadata"
+    elif result["status"] == "unchanged":
+        message = f"Document '{name}' is unchanged, skipped re-indexing"
+    elif result["status"] == "failed":
+        message = f"Document '{name}' could not be indexed"
+    elif result["status"] == "removed":
+        message = f"Document '{name}' removed"
+    else:
+        message = f"Document '{name}' {result['status']} successfully"
+
+    return IndexResponse(
+        message=message,
+        chunks_count=result["chunks_count"],
+        status=result["status"],
+        chunks_added=result["chunks_added"],
+        chunks_removed=result["chunks_removed"],
+        metadata_updated=result.get("metadata_updated", False),
+        pipeline=result["pipeline"],
+        error=result.get("error"),
+    )
+
+
+@app.get("/metrics")
+def metrics() -> dict:
+    """Report runtime statistics for sizing and monitoring."""
+    cache = getattr(embed_model, "cache", None)
+    return {
+        "ingest": last_ingest_stats,
+        "embedding_cache": cache.stats() if cache is not None else None,
+        "retrieval_cache": retriever.cache_stats() if retriever is not None else None,
+        "rerank": retriever.rerank_stats() if retriever is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "llm_scheduler": llm_scheduler.stats() if llm_scheduler is not None else None,
+        "jobs": job_manager.stats(),
+        "index_saves": index_saver.stats() if index_saver is not None else None,
+    }
 
 
 @app.post("/validate", response_model=ValidateResponse)
@@ -157,59 +592,191 @@ def validate_text(request: ValidateRequest) -> ValidateResponse:
     return ValidateResponse(validation=report)
 
 
-@app.post("/generate", response_model=GenerateResponse)
-def generate_doc(request: GenerateRequest) -> GenerateResponse:
-    """Generate and validate a technical document."""
+@app.post("/retrieve/batch", response_model=RetrieveBatchResponse)
+def retrieve_batch(request: RetrieveBatchRequest) -> RetrieveBatchResponse:
+    """Retrieve the top-k chunks for many queries in one embedding call and one index search."""
+    if request.k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+
     initialize_components()
 
-    if retriever is None or vector_store is None:
-        raise HTTPException(
-            status_code=400,
-            detail="No documents indexed. Please index a document first using /index",
+    try:
+        results = retriever.retrieve_batch(
+            request.queries, k=request.k, documents=request.documents, where=request.where
         )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving chunks: {str(e)}")
+
+    return RetrieveBatchResponse(
+        results=[[RetrievedChunk(text=text, score=score) for text, score in ranked] for ranked in results]
+    )
+
+
+@app.post("/generate", response_model=GenerateResponse)
+async def generate_doc(request: GenerateRequest) -> GenerateResponse:
+    """Generate and validate a technical document.
+
+    Retrieval and generation run on worker threads, while a request waiting for
+    the LLM queue waits in the event loop and holds no thread.
+    """
+    await run_in_threadpool(_require_documents)
+
+    try:
+        # Reject at once when the LLM queue is full, before spending time on retrieval
+        llm_scheduler.check_capacity()
+
+        # Retrieve and pack the context, and serve a document generated earlier from it
+        prepared = await run_in_threadpool(_prepare_generation, request)
+        if prepared["cached"] is not None:
+            cached = prepared["cached"]
+            return GenerateResponse(
+                document=cached["document"],
+                validation=cached["validation"],
+                cached=cached["match"],
+                context=prepared["packing"],
+            )
 
-    if vector_store.index.index.ntotal == 0:
+        # Generate document with LLM once admitted, within what is left of the timeout
+        with await llm_scheduler.acquire_async(request.priority, timeout=OLLAMA_TIMEOUT) as slot:
+            doc = await run_in_threadpool(llm_client.generate, prepared["prompt"], timeout=slot.remaining)
+
+        # Validate document
+        report = await run_in_threadpool(_validate_and_cache, request, prepared, doc)
+        return GenerateResponse(document=doc, validation=report, context=prepared["packing"])
+
+    except Exception as e:
+        raise _generation_error(e)
+
+
+@app.post("/generate/stream")
+async def generate_doc_stream(request: GenerateRequest) -> StreamingResponse:
+    """Generate a technical document, streaming it as server-sent events."""
+    await run_in_threadpool(_require_documents)
+
+    slot = None
+    try:
+        llm_scheduler.check_capacity()
+        prepared = await run_in_threadpool(_prepare_generation, request)
+        cached = prepared["cached"]
+        if cached is None:
+            slot = await llm_scheduler.acquire_async(request.priority, timeout=OLLAMA_TIMEOUT)
+    except Exception as e:
+        raise _generation_error(e)
+
+    def events() -> Iterator[str]:
+        """Yield a context event, one token event per generated piece, then done or error."""
+        yield _sse_event("context", prepared["packing"])
+        if cached is not None:
+            yield _sse_event("token", {"text": cached["document"]})
+            yield _sse_event(
+                "done", {"document": cached["document"], "validation": cached["validation"], "cached": cached["match"]}
+            )
+            return
+        pieces = []
+        try:
+            try:
+                for piece in llm_client.generate_stream(prepared["prompt"], timeout=slot.remaining):
+                    pieces.append(piece)
+                    yield _sse_event("token", {"text": piece})
+            finally:
+                slot.release()
+            doc = "".join(pieces)
+            report = _validate_and_cache(request, prepared, doc)
+        except Exception as e:
+            error = _generation_error(e)
+            yield _sse_event("error", {"status": error.status_code, "detail": error.detail})
+            return
+        yield _sse_event("done", {"document": doc, "validation": report, "cached": None})
+
+    # Disable proxy buffering so tokens reach the client as they are produced
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    # Also release the slot when the client disconnects before the stream starts
+    background = BackgroundTask(slot.release) if slot is not None else None
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers, background=background)
+
+
+def _require_documents() -> None:
+    """Initialize components and require at least one indexed chunk to generate from."""
+    initialize_components()
+
+    if retriever is None or vector_store is None or len(vector_store) == 0:
         raise HTTPException(
             status_code=400,
             detail="No documents indexed. Please index a document first using /index",
         )
 
-    try:
-        # Retrieve relevant contexts
-        contexts: List[str] = retriever.retrieve(request.query, k=5)
 
-        # Build prompt
-        prompt = build_technical_doc_prompt(request.query, contexts)
+def _prepare_generation(request: GenerateRequest) -> Dict[str, Any]:
+    """Retrieve and pack the context of a request, build its prompt and look it up in the response cache."""
+    contexts: List[str] = retriever.retrieve(
+        request.query, k=CONTEXT_CHUNKS, documents=request.documents, where=request.where
+    )
 
-        # Generate document with LLM
-        doc = llm_client.generate(prompt)
+    # Merge overlapping chunks and fit them into the context budget
+    passages, packing = pack_contexts(contexts, CONTEXT_TOKENS, count_tokens=embed_model.count_tokens)
 
-        # Validate document
-        report = validate_document(doc)
+    model = _generation_model()
+    embedding = _cache_embedding(request.query)
+    return {
+        "passages": passages,
+        "packing": packing,
+        "prompt": build_technical_doc_prompt(request.query, passages),
+        "model": model,
+        "embedding": embedding,
+        "cached": response_cache.get(model, request.query, passages, embedding),
+    }
 
-        return GenerateResponse(document=doc, validation=report)
 
-    except FileNotFoundError as e:
-        raise HTTPException(
+def _validate_and_cache(request: GenerateRequest, prepared: Dict[str, Any], doc: str) -> dict:
+    """Validate a generated document and store it in the response cache."""
+    report = validate_document(doc)
+    response_cache.put(prepared["model"], request.query, prepared["passages"], doc, report, prepared["embedding"])
+    return report
+
+
+def _generation_model() -> str:
+    """Identify the model and options generating documents, for the response cache."""
+    return f"{llm_client.model_name} {json.dumps(llm_client.options, sort_keys=True)}"
+
+
+def _cache_embedding(query: str) -> Optional[np.ndarray]:
+    """Return the query embedding when the response cache matches similar queries."""
+    if response_cache.max_distance is None:
+        return None
+    return retriever.embed_queries([query])[0]
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _generation_error(e: Exception) -> HTTPException:
+    """Map an error raised while generating a document to an HTTP error."""
+    if isinstance(e, QueueFullError):
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, QueueTimeoutError):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, FileNotFoundError):
+        return HTTPException(
             status_code=503,
             detail=f"Ollama not found: {str(e)}. Please install Ollama from https://ollama.ai/ and ensure it's in your PATH.",
         )
-    except TimeoutError as e:
-        raise HTTPException(
+    if isinstance(e, ConnectionError):
+        return HTTPException(status_code=503, detail=f"Ollama unavailable: {str(e)}")
+    if isinstance(e, TimeoutError):
+        return HTTPException(
             status_code=504,
             detail=f"Generation timed out: {str(e)}. The model might be too slow or the prompt too long. Try a shorter query.",
         )
-    except Exception as e:
-        error_msg = str(e)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generating document: {error_msg}",
-        )
+    return HTTPException(status_code=500, detail=f"Error generating document: {str(e)}")
 
 
 @app.post("/export")
 def export_to_pdf(request: ExportRequest) -> Response:
     """Export a document or validation report to PDF."""
+    from src.utils.pdf_exporter import export_document_to_pdf, export_validation_report_to_pdf
+
     try:
         if request.export_type == "validation_report":
             # Parse validation report from text (assuming JSON format)
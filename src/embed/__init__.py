@@ -1,7 +1,22 @@
 """Embedding module for text vectorization and FAISS indexing."""
 
-from .embedding_model import EmbeddingModel
-from .faiss_index import FAISSIndex
+import importlib
+from typing import Any
 
-__all__ = ["EmbeddingModel", "FAISSIndex"]
+# Classes are imported on first access, so importing the package does not load
+# torch or faiss
+_EXPORTS = {
+    "BM25Index": ".bm25_index",
+    "EmbeddingCache": ".embedding_cache",
+    "EmbeddingModel": ".embedding_model",
+    "FAISSIndex": ".faiss_index",
+}
 
+__all__ = ["BM25Index", "EmbeddingCache", "EmbeddingModel", "FAISSIndex"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import an exported class when it is first accessed."""
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
@@ -0,0 +1,277 @@
+"""BM25 inverted index over chunk tokens."""
+
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Words, numbers and identifiers such as REQ-0042, ISO_26262 or 12.5V
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SEPARATOR = re.compile(r"[-_./]")
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+TERMS_FILE = "terms.json"
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms; compound identifiers also yield their parts."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if _SEPARATOR.search(token):
+            tokens.extend(part for part in _SEPARATOR.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """Incremental BM25 index mapping terms to postings of (chunk id, term frequency).
+
+    Postings are kept in compact typed arrays: a read-only CSR block (memory-mapped
+    after loading) plus per-term arrays for chunks added since. Removed chunks are
+    masked at query time and dropped from the postings when the index is saved.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, common_cutoff: float = 0.5):
+        """Initialize an empty index with BM25 parameters k1 and b.
+
+        Terms found in more than common_cutoff of the chunks are treated as common
+        terms at query time (see search).
+        """
+        self.k1 = k1
+        self.b = b
+        self.common_cutoff = common_cutoff
+        self._terms: Dict[str, int] = {}
+        self._base_offsets = np.zeros(1, dtype="int64")
+        self._base_ids = np.zeros(0, dtype="int64")
+        self._base_tfs = np.zeros(0, dtype="int32")
+        self._tail_ids: Dict[int, array] = {}
+        self._tail_tfs: Dict[int, array] = {}
+        self._lengths = array("i")
+        self._deleted = bytearray()
+        self._live = 0
+        self._docs = 0
+        self._total_length = 0
+        # Growing a typed array while numpy views of it exist fails, so searches
+        # and updates are serialized
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of indexed chunks."""
+        return self._live
+
+    @property
+    def num_terms(self) -> int:
+        """Return the number of distinct terms."""
+        return len(self._terms)
+
+    def add(self, ids: List[int], texts: List[str]) -> None:
+        """Index the terms of texts under their chunk ids."""
+        with self._lock:
+            for chunk_id, text in zip(ids, texts):
+                if chunk_id < len(self._lengths):
+                    raise ValueError("Chunk ids must be added in increasing order")
+                grow = chunk_id + 1 - len(self._lengths)
+                self._lengths.extend([0] * grow)
+                self._deleted.extend(b"\x01" * grow)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    term_id = self._terms.setdefault(term, len(self._terms))
+                    postings = self._tail_ids.get(term_id)
+                    if postings is None:
+                        postings = self._tail_ids[term_id] = array("q")
+                        self._tail_tfs[term_id] = array("i")
+                    postings.append(chunk_id)
+                    self._tail_tfs[term_id].append(tf)
+                length = sum(counts.values())
+                self._lengths[chunk_id] = length
+                self._deleted[chunk_id] = 0
+                self._live += 1
+                self._docs += 1
+                self._total_length += length
+
+    def remove(self, ids: List[int]) -> None:
+        """Stop returning the given chunks."""
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id < len(self._deleted) and not self._deleted[chunk_id]:
+                    self._deleted[chunk_id] = 1
+                    self._live -= 1
+                    self._total_length -= self._lengths[chunk_id]
+
+    def search(self, query: str, k: int = 10, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Return up to k (chunk id, BM25 score) pairs, best first.
+
+        If allowed is given, it is a boolean mask over chunk ids and only chunks
+        where it is true are returned.
+
+        Uses MaxScore pruning: query terms are scanned from the most to the least
+        selective, and once no unseen chunk can reach the current top k, the
+        remaining terms only score the candidates found so far, by binary search in
+        their postings. Common terms (such as "shall", or the "req" part of every
+        requirement id) likewise only score candidates found through rarer query
+        terms, unless the query has no rarer terms.
+        """
+        if k <= 0:
+            return []
+        with self._lock:
+            if self._live == 0:
+                return []
+            candidates, scores = self._score(query, k, allowed)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def save(self, directory: str) -> None:
+        """Write the index into directory, dropping postings of removed chunks."""
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            deleted = np.frombuffer(self._deleted, dtype="uint8").copy()
+            terms = list(self._terms)
+            offsets = np.zeros(len(terms) + 1, dtype="int64")
+            ids_parts, tfs_parts = [], []
+            for term_id in range(len(terms)):
+                segments = self._segments(term_id)
+                ids = np.concatenate([seg_ids for seg_ids, _ in segments])
+                tfs = np.concatenate([seg_tfs for _, seg_tfs in segments])
+                alive = deleted[ids] == 0
+                ids_parts.append(ids[alive])
+                tfs_parts.append(tfs[alive])
+                offsets[term_id + 1] = offsets[term_id] + int(alive.sum())
+            lengths = np.frombuffer(self._lengths, dtype="int32").copy()
+            meta = {
+                "version": FORMAT_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "common_cutoff": self.common_cutoff,
+                "live": self._live,
+                "total_length": self._total_length,
+            }
+
+        np.save(os.path.join(directory, "offsets.npy"), offsets)
+        np.save(os.path.join(directory, "ids.npy"), np.concatenate(ids_parts) if ids_parts else self._base_ids)
+        np.save(os.path.join(directory, "tfs.npy"), np.concatenate(tfs_parts) if tfs_parts else self._base_tfs)
+        np.save(os.path.join(directory, "lengths.npy"), lengths)
+        np.save(os.path.join(directory, "deleted.npy"), deleted)
+        with open(os.path.join(directory, TERMS_FILE), "w", encoding="utf-8") as f:
+            json.dump(terms, f)
+        # The metadata is written last, so its presence marks a complete save
+        with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        """Open an index saved in directory, memory-mapping its postings."""
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index version {meta.get('version')!r}")
+        index = cls(k1=meta["k1"], b=meta["b"], common_cutoff=meta["common_cutoff"])
+        with open(os.path.join(directory, TERMS_FILE), "r", encoding="utf-8") as f:
+            index._terms = {term: term_id for term_id, term in enumerate(json.load(f))}
+        index._base_offsets = np.load(os.path.join(directory, "offsets.npy"))
+        index._base_ids = np.load(os.path.join(directory, "ids.npy"), mmap_mode="r")
+        index._base_tfs = np.load(os.path.join(directory, "tfs.npy"), mmap_mode="r")
+        index._lengths = array("i", np.load(os.path.join(directory, "lengths.npy")).astype("int32").tobytes())
+        index._deleted = bytearray(np.load(os.path.join(directory, "deleted.npy")).tobytes())
+        index._live = meta["live"]
+        index._docs = meta["live"]
+        index._total_length = meta["total_length"]
+        return index
+
+    @staticmethod
+    def is_saved(directory: str) -> bool:
+        """Return whether directory holds a complete saved index."""
+        return os.path.exists(os.path.join(directory, META_FILE))
+
+    def _score(self, query: str, k: int, allowed: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the candidate chunk ids of a query and their scores; the caller holds the lock.
+
+        The views of the typed arrays scoring uses end with this call, so they are
+        gone before the lock is released and a later add can grow the arrays.
+        """
+        lengths = np.frombuffer(self._lengths, dtype="int32")
+        deleted = np.frombuffer(self._deleted, dtype="uint8")
+        norm = self._total_length / self._live
+
+        terms = []
+        for term, query_tf in Counter(tokenize(query)).items():
+            term_id = self._terms.get(term)
+            if term_id is None:
+                continue
+            segments = self._segments(term_id)
+            df = sum(len(ids) for ids, _ in segments)
+            idf = math.log(1 + (self._docs - df + 0.5) / (df + 0.5))
+            terms.append((query_tf * idf, df, segments))
+        # A term adds at most weight * (k1 + 1) to a chunk's score
+        terms.sort(key=lambda item: item[0], reverse=True)
+        remaining = np.cumsum([weight * (self.k1 + 1) for weight, _, _ in reversed(terms)])[::-1].tolist() + [0.0]
+
+        candidates = np.zeros(0, dtype="int64")
+        scores = np.zeros(0, dtype="float64")
+        scanned = 0
+        for weight, df, segments in terms:
+            if len(candidates) and df > self.common_cutoff * self._docs:
+                break
+            ids = np.concatenate([seg_ids for seg_ids, _ in segments])
+            tfs = np.concatenate([seg_tfs for _, seg_tfs in segments])
+            alive = deleted[ids] == 0
+            if allowed is not None:
+                alive &= _lookup(allowed, ids)
+            ids, tfs = ids[alive], tfs[alive]
+            candidates, inverse = np.unique(np.concatenate([candidates, ids]), return_inverse=True)
+            scores = np.bincount(
+                inverse, weights=np.concatenate([scores, weight * self._saturate(tfs, lengths[ids], norm)])
+            )
+            scanned += 1
+            if len(scores) >= k and np.partition(scores, len(scores) - k)[len(scores) - k] >= remaining[scanned]:
+                break
+
+        for weight, _, segments in terms[scanned:]:
+            tfs = np.zeros(len(candidates), dtype="int32")
+            for seg_ids, seg_tfs in segments:
+                if len(seg_ids) == 0:
+                    continue
+                positions = np.minimum(np.searchsorted(seg_ids, candidates), len(seg_ids) - 1)
+                found = seg_ids[positions] == candidates
+                tfs[found] = seg_tfs[positions[found]]
+            hit = tfs > 0
+            scores[hit] += weight * self._saturate(tfs[hit], lengths[candidates[hit]], norm)
+        return candidates, scores
+
+    def _segments(self, term_id: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Return the postings of a term as (chunk ids, term frequencies) segments sorted by id.
+
+        The returned arrays may be views of the typed arrays and must not outlive the lock.
+        """
+        segments = []
+        if term_id + 1 < len(self._base_offsets):
+            start, stop = self._base_offsets[term_id], self._base_offsets[term_id + 1]
+            segments.append((self._base_ids[start:stop], self._base_tfs[start:stop]))
+        tail = self._tail_ids.get(term_id)
+        if tail is not None:
+            segments.append((np.frombuffer(tail, dtype="int64"), np.frombuffer(self._tail_tfs[term_id], dtype="int32")))
+        return segments
+
+    def _saturate(self, tfs: np.ndarray, lengths: np.ndarray, average_length: float) -> np.ndarray:
+        """Return the BM25 term-frequency component for chunks of the given lengths."""
+        tfs = tfs.astype("float64")
+        return tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / average_length))
+
+
+def _lookup(mask: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Return mask[ids], treating ids beyond the end of mask as false."""
+    inside = ids < len(mask)
+    values = np.zeros(len(ids), dtype=bool)
+    values[inside] = mask[ids[inside]]
+    return values
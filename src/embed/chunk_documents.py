@@ -0,0 +1,149 @@
+"""Document ownership and metadata of stored chunks."""
+
+import json
+import os
+from array import array
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+NO_DOCUMENT = -1
+REMOVED = -2
+
+OWNERS_FILE = "chunk_documents.npy"
+DOCUMENTS_FILE = "documents.json"
+
+# Filter on document metadata: every key must match, a list value matches any of its items
+Where = Dict[str, Any]
+
+
+class ChunkDocuments:
+    """Map chunk ids to the documents they belong to, and documents to their metadata.
+
+    Every chunk id has one int32 entry holding its document id, NO_DOCUMENT, or
+    REMOVED once the chunk is deleted, so selecting the chunks of a set of
+    documents is a single vectorized comparison.
+    """
+
+    def __init__(self):
+        """Initialize an empty table."""
+        self.document_ids: Dict[str, int] = {}
+        self.metadata: Dict[int, Dict[str, Any]] = {}
+        self._owners = array("i")
+        self._removed = 0
+
+    def __len__(self) -> int:
+        """Return the number of chunk ids."""
+        return len(self._owners)
+
+    @property
+    def removed(self) -> int:
+        """Return the number of removed chunk ids."""
+        return self._removed
+
+    def register(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> int:
+        """Return the id of a document, creating it if needed, and update its metadata."""
+        document_id = self.document_ids.get(name)
+        if document_id is None:
+            document_id = self.document_ids[name] = max(self.document_ids.values(), default=-1) + 1
+            self.metadata[document_id] = {}
+        if metadata is not None:
+            self.metadata[document_id] = dict(metadata)
+        return document_id
+
+    def append(self, documents: Optional[List[Optional[str]]], count: int) -> None:
+        """Record the documents of count new chunks (None for chunks without a document)."""
+        if documents is None:
+            self._owners.extend([NO_DOCUMENT] * count)
+            return
+        if len(documents) != count:
+            raise ValueError(f"Got {len(documents)} document names for {count} chunks")
+        self._owners.extend(NO_DOCUMENT if name is None else self.register(name) for name in documents)
+
+    def mark_removed(self, ids: List[int]) -> int:
+        """Mark chunks as removed and return how many were not removed before."""
+        removed = 0
+        for idx in ids:
+            if self._owners[idx] != REMOVED:
+                self._owners[idx] = REMOVED
+                removed += 1
+        self._removed += removed
+        return removed
+
+    def chunks_of(self, name: str) -> List[int]:
+        """Return the ids of the live chunks of a document."""
+        document_id = self.document_ids.get(name)
+        if document_id is None:
+            return []
+        return np.flatnonzero(self.owners() == document_id).tolist()
+
+    def metadata_of(self, name: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of a document's metadata, or None if the document is unknown."""
+        document_id = self.document_ids.get(name)
+        if document_id is None:
+            return None
+        return dict(self.metadata[document_id])
+
+    def forget(self, name: str) -> None:
+        """Drop a document whose chunks have all been removed."""
+        document_id = self.document_ids.pop(name, None)
+        self.metadata.pop(document_id, None)
+
+    def matching(self, documents: Optional[List[str]] = None, where: Optional[Where] = None) -> List[int]:
+        """Return the ids of documents named in documents and whose metadata matches where."""
+        if documents is None:
+            candidates = list(self.document_ids.values())
+        else:
+            candidates = [self.document_ids[name] for name in documents if name in self.document_ids]
+        if not where:
+            return candidates
+        return [document_id for document_id in candidates if _matches(self.metadata[document_id], where)]
+
+    def live_mask(self, document_ids: Optional[List[int]] = None) -> np.ndarray:
+        """Return a boolean mask over chunk ids of live chunks, optionally of the given documents only."""
+        owners = self.owners()
+        if document_ids is None:
+            return owners != REMOVED
+        return np.isin(owners, np.asarray(document_ids, dtype="int32"))
+
+    def owners(self) -> np.ndarray:
+        """Return a copy of the document id of every chunk id."""
+        return np.array(self._owners, dtype="int32")
+
+    def save(self, directory: str) -> None:
+        """Write the table into directory."""
+        np.save(os.path.join(directory, OWNERS_FILE), self.owners())
+        documents = {
+            name: {"id": document_id, "metadata": self.metadata[document_id]}
+            for name, document_id in self.document_ids.items()
+        }
+        with open(os.path.join(directory, DOCUMENTS_FILE), "w", encoding="utf-8") as f:
+            json.dump(documents, f)
+
+    @classmethod
+    def load(cls, directory: str, count: int) -> "ChunkDocuments":
+        """Read a table saved in directory; indexes saved without one get count chunks without documents."""
+        table = cls()
+        owners_path = os.path.join(directory, OWNERS_FILE)
+        if not os.path.exists(owners_path):
+            table._owners.extend([NO_DOCUMENT] * count)
+            return table
+        table._owners = array("i", np.load(owners_path).astype("int32").tobytes())
+        table._removed = int(np.count_nonzero(table.owners() == REMOVED))
+        with open(os.path.join(directory, DOCUMENTS_FILE), "r", encoding="utf-8") as f:
+            for name, document in json.load(f).items():
+                table.document_ids[name] = document["id"]
+                table.metadata[document["id"]] = document["metadata"]
+        return table
+
+
+def _matches(metadata: Dict[str, Any], where: Where) -> bool:
+    """Return whether metadata satisfies every condition of where."""
+    for key, expected in where.items():
+        value = metadata.get(key)
+        if isinstance(expected, list):
+            if value not in expected:
+                return False
+        elif value != expected:
+            return False
+    return True
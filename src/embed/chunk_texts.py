@@ -0,0 +1,128 @@
+"""Chunk text storage backed by a memory-mapped blob."""
+
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BLOB_FILE = "texts.bin"
+OFFSETS_FILE = "texts_offsets.bin"
+REMOVED_FILE = "texts_removed.npy"
+
+
+class ChunkTexts:
+    """List-like store of chunk texts indexed by chunk id.
+
+    Texts loaded from disk stay in a single UTF-8 blob that is memory-mapped, with
+    an offsets array marking where each text starts, and are only decoded when
+    accessed. Texts added after loading are kept in memory until the next save.
+    Removed chunks read as None.
+
+    Saving only appends the texts added since loading to the blob and offsets
+    files, after linking them into the target directory (or copying them where
+    links are not supported), so its cost grows with the new texts rather than
+    with the whole store.
+    """
+
+    def __init__(self, texts: Optional[Iterable[Optional[str]]] = None):
+        """Initialize the store, optionally with in-memory texts."""
+        self._blob: memoryview = memoryview(b"")
+        self._offsets = np.zeros(1, dtype="int64")
+        self._removed: Dict[int, None] = {}
+        self._appended: List[Optional[str]] = list(texts) if texts is not None else []
+        self._directory: Optional[str] = None
+
+    @property
+    def _stored(self) -> int:
+        """Return the number of texts held in the blob."""
+        return len(self._offsets) - 1
+
+    def __len__(self) -> int:
+        """Return the number of chunk ids handed out so far."""
+        return self._stored + len(self._appended)
+
+    def __getitem__(self, idx: int) -> Optional[str]:
+        """Return the text of a chunk, or None if it was removed."""
+        idx = int(idx)
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Chunk id {idx} out of range")
+        if idx >= self._stored:
+            return self._appended[idx - self._stored]
+        if idx in self._removed:
+            return None
+        return str(self._blob[self._offsets[idx]:self._offsets[idx + 1]], "utf-8")
+
+    def __setitem__(self, idx: int, text: Optional[str]) -> None:
+        """Replace the text of a chunk; only removal (None) is supported for stored texts."""
+        idx = int(idx)
+        if idx >= self._stored:
+            self._appended[idx - self._stored] = text
+        elif text is None:
+            self._removed[idx] = None
+        else:
+            raise ValueError("Stored chunk texts are read-only")
+
+    def extend(self, texts: Iterable[Optional[str]]) -> None:
+        """Append texts under the next chunk ids."""
+        self._appended.extend(texts)
+
+    def save(self, directory: str) -> None:
+        """Write the blob, offsets and removed ids into directory, appending to the blob loaded before."""
+        blob_path = os.path.join(directory, BLOB_FILE)
+        offsets_path = os.path.join(directory, OFFSETS_FILE)
+        appending = self._directory is not None
+        if appending:
+            link_file(os.path.join(self._directory, BLOB_FILE), blob_path)
+            link_file(os.path.join(self._directory, OFFSETS_FILE), offsets_path)
+        start = self._stored
+        position = int(self._offsets[start])
+        removed = list(self._removed)
+        ends = np.zeros(len(self._appended), dtype="int64")
+        mode = "r+b" if appending else "wb"
+        with open(blob_path, mode) as blob, open(offsets_path, mode) as offsets:
+            if appending:
+                # Drop whatever an interrupted save appended after the loaded texts
+                blob.truncate(position)
+                blob.seek(position)
+                offsets.truncate(ends.itemsize * (start + 1))
+                offsets.seek(ends.itemsize * (start + 1))
+            else:
+                offsets.write(np.zeros(1, dtype="int64").tobytes())
+            for i, text in enumerate(self._appended):
+                if text is None:
+                    removed.append(start + i)
+                else:
+                    data = text.encode("utf-8")
+                    blob.write(data)
+                    position += len(data)
+                ends[i] = position
+            offsets.write(ends.tobytes())
+        np.save(os.path.join(directory, REMOVED_FILE), np.array(sorted(removed), dtype="int64"))
+
+    @classmethod
+    def load(cls, directory: str, count: Optional[int] = None) -> "ChunkTexts":
+        """Open the first count (by default all) texts saved in directory without reading the blob into memory."""
+        texts = cls()
+        offsets = np.memmap(os.path.join(directory, OFFSETS_FILE), dtype="int64", mode="r")
+        texts._offsets = offsets[:count + 1] if count is not None else offsets
+        size = int(texts._offsets[-1])
+        if size > 0:
+            blob = np.memmap(os.path.join(directory, BLOB_FILE), dtype="uint8", mode="r", shape=(size,))
+            texts._blob = memoryview(blob)
+        removed = np.load(os.path.join(directory, REMOVED_FILE))
+        texts._removed = dict.fromkeys(removed[removed < len(texts._offsets) - 1].tolist())
+        texts._directory = directory
+        return texts
+
+
+def link_file(source: str, target: str) -> None:
+    """Make target the same file as source: a hard link, or a copy where links are not supported."""
+    if os.path.exists(target):
+        if os.path.samefile(source, target):
+            return
+        os.unlink(target)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
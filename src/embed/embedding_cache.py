@@ -0,0 +1,201 @@
+"""Persistent, memory-mapped cache of text embeddings."""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+KEY_SIZE = 16
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by model name and text hash.
+
+    Vectors live in a memory-mapped float32 array with one slot per cached text.
+    Alongside it, every slot stores the hash of its text and a last-used counter,
+    so the key index is rebuilt from disk on open and a slot is only ever served
+    for the text it was written for. Recently used vectors are also kept in an
+    in-memory LRU, and the least recently used slot is reused once the cache holds
+    max_entries vectors.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        model_name: str,
+        dimension: int,
+        max_entries: int = 1_000_000,
+        memory_entries: int = 10_000,
+    ):
+        """Open or create the cache for a model under directory."""
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.directory = os.path.join(directory, model_name.replace("/", "__"))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free: List[int] = []
+
+        self._check_meta()
+        self._capacity = 0
+        self._open(max(self._existing_capacity(), min(max_entries, 1024)))
+        self._load_slots()
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        """Return the cache key of a text."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    def get_many(self, keys: List[bytes]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors for keys, with None for misses."""
+        results: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._touch(key, self._slots.get(key))
+                    self.hits += 1
+                    self.memory_hits += 1
+                    results.append(vector)
+                    continue
+                slot = self._slots.get(key)
+                if slot is None or self._keys[slot].tobytes() != key:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                vector = np.array(self._vectors[slot])
+                self._touch(key, slot)
+                self._remember(key, vector)
+                self.hits += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Store vectors under keys, evicting least recently used entries when full."""
+        vectors = np.asarray(vectors, dtype="float32")
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.get(key)
+                if slot is None:
+                    slot = self._allocate()
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype="uint8")
+                self._touch(key, slot)
+                self._remember(key, np.array(vector))
+
+    def flush(self) -> None:
+        """Flush memory-mapped arrays to disk."""
+        with self._lock:
+            for array in (self._vectors, self._keys, self._last_used):
+                array.flush()
+
+    def stats(self) -> Dict[str, object]:
+        """Return hit/miss counters and occupancy."""
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "entries": len(self._slots),
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
+
+    def __len__(self) -> int:
+        """Return the number of cached vectors."""
+        return len(self._slots)
+
+    def _touch(self, key: bytes, slot: Optional[int]) -> None:
+        """Mark a slot as most recently used."""
+        if slot is None:
+            return
+        self._clock += 1
+        self._last_used[slot] = self._clock
+        self._slots[key] = slot
+        self._slots.move_to_end(key)
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        """Insert a vector into the in-memory LRU."""
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _allocate(self) -> int:
+        """Return a free slot, growing the files or evicting the LRU entry."""
+        if self._free:
+            return self._free.pop()
+        if len(self._slots) >= self.max_entries:
+            key, slot = self._slots.popitem(last=False)
+            self._memory.pop(key, None)
+            return slot
+        if len(self._slots) >= self._capacity:
+            self._open(min(self._capacity * 2, self.max_entries))
+        return len(self._slots)
+
+    def _path(self, name: str) -> str:
+        """Return the path of a cache file."""
+        return os.path.join(self.directory, name)
+
+    def _check_meta(self) -> None:
+        """Write or validate the cache metadata."""
+        path = self._path("meta.json")
+        meta = {"model_name": self.model_name, "dimension": self.dimension}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing != meta:
+                raise ValueError(f"Embedding cache at {self.directory} was created for {existing}, not {meta}")
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+    def _existing_capacity(self) -> int:
+        """Return the number of slots already allocated on disk."""
+        path = self._path("last_used.i64")
+        return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+    def _open(self, capacity: int) -> None:
+        """Map the cache files with room for capacity slots."""
+        files = (
+            ("vectors.f32", "float32", (self.dimension,)),
+            ("keys.u8", "uint8", (KEY_SIZE,)),
+            ("last_used.i64", "int64", ()),
+        )
+        arrays = []
+        for name, dtype, shape in files:
+            path = self._path(name)
+            size = capacity * int(np.prod(shape, dtype="int64")) * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            arrays.append(np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,) + shape))
+        self._vectors, self._keys, self._last_used = arrays
+        self._capacity = capacity
+
+    def _load_slots(self) -> None:
+        """Rebuild the key index and LRU order from the slot files."""
+        last_used = np.asarray(self._last_used)
+        used = np.flatnonzero(last_used)
+        for slot in used[np.argsort(last_used[used], kind="stable")]:
+            self._slots[self._keys[slot].tobytes()] = int(slot)
+        self._clock = int(last_used.max()) if len(used) else 0
+        # Slots below the high-water mark that are unused can be handed out again
+        high_water = int(used.max()) + 1 if len(used) else 0
+        self._free = [int(slot) for slot in range(high_water) if last_used[slot] == 0][::-1]
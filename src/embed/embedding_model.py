@@ -1,19 +1,290 @@
 """Embedding model for converting text to vectors."""
 
-from typing import List
+import copy
+import importlib.util
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from src.embed.embedding_cache import EmbeddingCache
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# "torch" runs the reference fp32 PyTorch model; "onnx" runs it in ONNX Runtime and
+# "onnx-int8" runs an ONNX export with dynamically int8-quantized weights
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# Instruction set the int8 weights are quantized for: "avx2", "avx512", "avx512_vnni" or "arm64"
+INT8_QUANTIZATION = "avx2"
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser("~"), ".cache", "docrag", "onnx")
+
+# sentence-transformers release that added the ONNX backend and int8 export, and the
+# packages the ONNX backends run on (module name, package name)
+ONNX_MIN_SENTENCE_TRANSFORMERS = (3, 2)
+ONNX_PACKAGES = (("onnxruntime", "onnxruntime"), ("optimum", "optimum"))
+
+# Padded tokens (batch size x longest text) per encoder batch, and the batch size cap
+DEFAULT_BATCH_TOKENS = 8192
+DEFAULT_MAX_BATCH_SIZE = 256
+
+# Smallest job worth shipping to the replica processes
+DEFAULT_PARALLEL_MIN_TEXTS = 256
+
+# Model replica of a worker process, loaded by _init_replica
+_replica: Optional["SentenceTransformer"] = None
 
 
 class EmbeddingModel:
-    """Wrapper for sentence-transformers embedding model."""
+    """Wrapper for sentence-transformers embedding model.
+
+    sentence-transformers (and torch) are imported when the first model is
+    created, not when this module is imported. The backend selects how the
+    model runs on CPU (see EMBEDDING_BACKENDS). The
+    ONNX backends need onnxruntime and optimum; the int8 model is exported and
+    quantized once into onnx_dir. threads limits the intra-op threads of either
+    runtime. Embeddings from different backends differ slightly, so each backend
+    has its own entries in the persistent cache.
+
+    Texts are sorted by token length and encoded in batches of similar length
+    whose padded size stays within batch_tokens, so short texts go in large
+    batches and long texts in small ones. With processes > 1, jobs of at least
+    parallel_min_texts texts are spread over that many spawned processes, each
+    holding its own model replica; results always come back in input order.
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
-        """Initialize the embedding model."""
-        self.model = SentenceTransformer(model_name)
+    count_tokens uses its own copy of the tokenizer: calling a fast tokenizer
+    resets its truncation settings, which would race with encode running on
+    another thread.
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        cache_dir: Optional[str] = None,
+        cache_max_entries: int = 1_000_000,
+        backend: str = "torch",
+        threads: Optional[int] = None,
+        onnx_dir: Optional[str] = None,
+        batch_tokens: int = DEFAULT_BATCH_TOKENS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        processes: int = 1,
+        parallel_min_texts: int = DEFAULT_PARALLEL_MIN_TEXTS,
+    ):
+        """Initialize the embedding model, optionally with a persistent cache under cache_dir."""
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads
+        self.onnx_dir = onnx_dir or os.path.join(DEFAULT_ONNX_DIR, model_name.replace("/", "--"))
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.processes = processes
+        self.parallel_min_texts = parallel_min_texts
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.model = _load_model(model_name, backend, threads, self.onnx_dir)
+        self._counting_tokenizer = copy.deepcopy(self.model.tokenizer)
+        self._counting_lock = threading.Lock()
+        self.cache: Optional[EmbeddingCache] = None
+        if cache_dir is not None:
+            cache_name = model_name if backend == "torch" else f"{model_name}#{backend}"
+            self.cache = EmbeddingCache(cache_dir, cache_name, self.dimension, max_entries=cache_max_entries)
+
+    @property
+    def dimension(self) -> int:
+        """Return the dimension of the produced embeddings."""
+        return self.model.get_sentence_embedding_dimension()
+
+    @property
+    def max_tokens(self) -> int:
+        """Return how many content tokens the model reads before truncating."""
+        return self.model.max_seq_length - self.model.tokenizer.num_special_tokens_to_add()
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count the tokenizer tokens of each text in one batch, excluding special tokens."""
+        with self._counting_lock:
+            encoded = self._counting_tokenizer(
+                texts,
+                add_special_tokens=False,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+            )
+        return [len(ids) for ids in encoded["input_ids"]]
 
     def embed(self, texts: List[str]) -> np.ndarray:
         """Compute embeddings for a list of texts."""
-        return np.array(self.model.encode(texts, show_progress_bar=False))
+        if self.cache is None:
+            return self._encode(texts)
+        return embed_with_cache(self.cache, texts, self._encode)
+
+    def warm_up(self) -> None:
+        """Run the model once on a short and a full-length input, bypassing the cache."""
+        self._encode(["warm-up", " ".join(["warm-up"] * self.max_tokens)])
+
+    def deviation_from(self, reference: "EmbeddingModel", texts: List[str]) -> Dict[str, float]:
+        """Compare this model's embeddings of texts with those of a reference model, bypassing caches."""
+        return cosine_deviation(self._encode(texts), reference._encode(texts))
+
+    def close(self) -> None:
+        """Stop the replica processes, if any were started."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Run the model on texts in length-bucketed batches, on the replicas for large jobs."""
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        if not texts:
+            return vectors
+        # count_tokens has its own tokenizer, so this cannot disturb encode calls on other threads
+        lengths = [min(count, self.max_tokens) for count in self.count_tokens(texts)]
+        batches = plan_batches(lengths, self.batch_tokens, self.max_batch_size)
+        if self.processes > 1 and len(texts) >= self.parallel_min_texts:
+            executor = self._replicas()
+            futures = [executor.submit(_encode_on_replica, [texts[i] for i in batch]) for batch in batches]
+            encoded = (future.result() for future in futures)
+        else:
+            encoded = (_encode_batch(self.model, [texts[i] for i in batch]) for batch in batches)
+        for batch, batch_vectors in zip(batches, encoded):
+            vectors[batch] = batch_vectors
+        return vectors
+
+    def _replicas(self) -> ProcessPoolExecutor:
+        """Start the replica processes on first use, splitting the cores between them."""
+        with self._executor_lock:
+            if self._executor is None:
+                threads = self.threads or max(1, (os.cpu_count() or 1) // self.processes)
+                self._executor = ProcessPoolExecutor(
+                    self.processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_replica,
+                    initargs=(self.model_name, self.backend, threads, self.onnx_dir),
+                )
+            return self._executor
+
+
+def plan_batches(lengths: List[int], batch_tokens: int, max_batch_size: int) -> List[List[int]]:
+    """Group text indices into batches of similar length.
+
+    Indices are taken shortest first, and a batch is closed when adding the next
+    text would push its padded size (batch size x longest text) over batch_tokens
+    or its size over max_batch_size. Every batch holds at least one text.
+    """
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for i in sorted(range(len(lengths)), key=lengths.__getitem__):
+        if batch and ((len(batch) + 1) * max(lengths[i], 1) > batch_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _encode_batch(model: "SentenceTransformer", texts: List[str]) -> np.ndarray:
+    """Encode texts as a single model batch."""
+    return np.asarray(model.encode(texts, batch_size=len(texts), show_progress_bar=False), dtype="float32")
+
+
+def _init_replica(model_name: str, backend: str, threads: Optional[int], onnx_dir: str) -> None:
+    """Load the model replica of a worker process."""
+    global _replica
+    _replica = _load_model(model_name, backend, threads, onnx_dir)
+
+
+def _encode_on_replica(texts: List[str]) -> np.ndarray:
+    """Encode a batch with the worker process's replica."""
+    return _encode_batch(_replica, texts)
+
+
+def cosine_deviation(embeddings: np.ndarray, reference: np.ndarray) -> Dict[str, float]:
+    """Return the cosine similarity between each embedding and its reference, as mean, min and max deviation."""
+    if embeddings.shape != reference.shape:
+        raise ValueError(f"Embedding shape {embeddings.shape} does not match reference shape {reference.shape}")
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cosines = np.einsum("ij,ij->i", embeddings, reference)
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "max_deviation": float(1 - cosines.min()),
+    }
+
+
+def _load_model(model_name: str, backend: str, threads: Optional[int], onnx_dir: str) -> "SentenceTransformer":
+    """Load a sentence-transformers model running on the given backend."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+        return SentenceTransformer(model_name)
+
+    _check_onnx_requirements(backend)
+    import onnxruntime
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    model_kwargs = {"provider": "CPUExecutionProvider", "session_options": options}
+    if backend == "onnx":
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+
+    file_name = os.path.join("onnx", f"model_qint8_{INT8_QUANTIZATION}.onnx")
+    if not os.path.exists(os.path.join(onnx_dir, file_name)):
+        # Export the fp32 model to ONNX once, then quantize its weights to int8
+        exported = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+        exported.save_pretrained(onnx_dir)
+        export_dynamic_quantized_onnx_model(exported, INT8_QUANTIZATION, onnx_dir)
+    return SentenceTransformer(onnx_dir, backend="onnx", model_kwargs={**model_kwargs, "file_name": file_name})
+
+
+def _check_onnx_requirements(backend: str) -> None:
+    """Raise ImportError naming what an ONNX backend needs but is not installed."""
+    import sentence_transformers
+
+    installed = sentence_transformers.__version__
+    if tuple(int(part) for part in re.findall(r"\d+", installed)[:2]) < ONNX_MIN_SENTENCE_TRANSFORMERS:
+        required = ".".join(str(part) for part in ONNX_MIN_SENTENCE_TRANSFORMERS)
+        raise ImportError(
+            f"The '{backend}' embedding backend needs sentence-transformers>={required} "
+            f"(installed: {installed}): pip install 'sentence-transformers[onnx]>={required}'"
+        )
+    missing = [package for module, package in ONNX_PACKAGES if importlib.util.find_spec(module) is None]
+    if missing:
+        raise ImportError(
+            f"The '{backend}' embedding backend needs {' and '.join(missing)}: "
+            "pip install 'sentence-transformers[onnx]'"
+        )
+
+
+def embed_with_cache(cache: EmbeddingCache, texts: List[str], encode) -> np.ndarray:
+    """Embed texts, calling encode only for texts missing from the cache."""
+    keys = [cache.key(text) for text in texts]
+    vectors = cache.get_many(keys)
+
+    missing = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            missing.setdefault(keys[i], texts[i])
+    if missing:
+        encoded = np.asarray(encode(list(missing.values())), dtype="float32")
+        cache.put_many(list(missing.keys()), encoded)
+        by_key = dict(zip(missing.keys(), encoded))
+        vectors = [by_key[keys[i]] if vector is None else vector for i, vector in enumerate(vectors)]
 
+    if not vectors:
+        return np.zeros((0, cache.dimension), dtype="float32")
+    return np.stack(vectors)
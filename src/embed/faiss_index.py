@@ -1,43 +1,454 @@
 """FAISS index management for vector storage and retrieval."""
 
-from typing import List
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 import faiss
 
+from src.embed.chunk_documents import ChunkDocuments, Where
+from src.embed.chunk_texts import ChunkTexts
+from src.embed.raw_vectors import VECTORS_FILE, RawVectors
+
+# On-disk index format, bumped whenever the directory layout changes
+FORMAT_NAME = "docrag-index"
+FORMAT_VERSION = 2
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+STAGING_FILE = "staging.faiss"
+
+
+def _extract_ivf(index: faiss.Index) -> Optional[faiss.IndexIVF]:
+    """Return the IVF index inside index, or None if it is not IVF-based."""
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def _build_index(dimension: int, factory: str) -> faiss.Index:
+    """Create an index from a factory string that accepts caller-assigned ids.
+
+    IVF indexes store ids in their inverted lists natively; every other index type
+    is wrapped in IndexIDMap.
+    """
+    index = faiss.index_factory(dimension, factory)
+    if _extract_ivf(index) is None:
+        index = faiss.IndexIDMap(index)
+    return index
+
+
+def _default_train_size(index: faiss.Index, factory: str) -> int:
+    """Return how many vectors an untrained index should be trained on."""
+    sizes = [1000]
+    ivf = _extract_ivf(index)
+    if ivf is not None:
+        sizes.append(39 * ivf.nlist)
+    if "PQ" in factory.upper():
+        sizes.append(39 * 256)
+    return max(sizes)
+
+
+def export_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (vectors, ids) of everything stored in an index built by _build_index."""
+    if isinstance(index, faiss.IndexIDMap):
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+        if len(ids) == 0:
+            return np.zeros((0, index.d), dtype="float32"), ids
+        return index.index.reconstruct_n(0, index.index.ntotal), ids
+
+    ivf = faiss.extract_index_ivf(index)
+    invlists = ivf.invlists
+    ids = [
+        faiss.rev_swig_ptr(invlists.get_ids(list_no), invlists.list_size(list_no)).copy()
+        for list_no in range(ivf.nlist)
+        if invlists.list_size(list_no) > 0
+    ]
+    ids = np.concatenate(ids).astype("int64") if ids else np.zeros(0, dtype="int64")
+    if len(ids) == 0:
+        return np.zeros((0, index.d), dtype="float32"), ids
+    # A hashtable direct map allows reconstruction by arbitrary id
+    ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+    try:
+        vectors = index.reconstruct_batch(ids)
+    finally:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+    return vectors, ids
+
 
 class FAISSIndex:
-    """FAISS index wrapper for storing and searching embeddings."""
+    """FAISS index wrapper for storing and searching embeddings.
+
+    The index type is chosen with a FAISS factory string: "Flat" (exact, the
+    default), "IVF1024,Flat", "IVF1024,PQ32", "HNSW32", ... Compressed storage is
+    chosen the same way: "SQfp16" (2 bytes per dimension), "SQ8" (1 byte per
+    dimension) or "PQ48" (48 bytes per vector). Indexes that need training keep
+    added vectors in an exact staging index until train_size vectors have arrived,
+    then train on them and take them over.
+
+    With rescore set, a float32 copy of every vector is kept in a memory-mapped
+    file on disk, and each search fetches rescore * k candidates from the
+    compressed index and reorders them by their exact distances.
+
+    Vectors are stored under sequential ids that are never reused, so removing
+    chunks does not shift the ids of the remaining ones. Chunks can belong to a
+    named document with metadata; searches restricted to some documents or
+    metadata values pass a FAISS ID selector to the index, so non-matching chunks
+    are skipped during the search instead of filtered out afterwards. Index
+    types that cannot remove vectors (HNSW) hide removed ones the same way.
+    """
 
-    def __init__(self, dimension: int):
-        """Initialize FAISS index with given dimension."""
+    def __init__(
+        self,
+        dimension: int,
+        factory: str = "Flat",
+        train_size: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        rescore: Optional[int] = None,
+    ):
+        """Initialize FAISS index with given dimension and index type."""
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
-        self.texts = []
+        self.factory = factory
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.rescore = rescore
+        self.raw: Optional[RawVectors] = RawVectors(dimension) if rescore else None
+        self.index = _build_index(dimension, factory)
+        self.train_size = train_size or _default_train_size(self.index, factory)
+        self._staging: Optional[faiss.Index] = None
+        if not self.index.is_trained:
+            self._staging = faiss.IndexIDMap(faiss.IndexFlatL2(dimension))
+        self.texts = ChunkTexts()
+        self.documents = ChunkDocuments()
+        self._tombstones = 0
+        self._selectors: Dict[Any, Tuple[faiss.IDSelector, np.ndarray]] = {}
 
-    def add(self, embeddings: np.ndarray, texts: List[str]) -> None:
-        """Add embeddings and associated texts to the index."""
+    @property
+    def ntotal(self) -> int:
+        """Return the number of stored vectors, including staged ones."""
+        staged = self._staging.ntotal if self._staging is not None else 0
+        return self.index.ntotal + staged - self._tombstones
+
+    @property
+    def is_trained(self) -> bool:
+        """Return whether the index has been trained."""
+        return self._staging is None
+
+    def add(
+        self,
+        embeddings: np.ndarray,
+        texts: List[str],
+        documents: Optional[List[Optional[str]]] = None,
+    ) -> List[int]:
+        """Add embeddings and associated texts to the index and return their ids.
+
+        documents optionally names the document of each chunk.
+        """
+        if embeddings.ndim != 2 or len(embeddings) != len(texts):
+            raise ValueError(f"Got embeddings of shape {embeddings.shape} for {len(texts)} chunks")
         if embeddings.shape[1] != self.dimension:
             raise ValueError(
                 f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dimension}"
             )
-        self.index.add(embeddings.astype("float32"))
+        ids = np.arange(len(self.texts), len(self.texts) + len(texts), dtype="int64")
+        self.documents.append(documents, len(texts))
+        vectors = embeddings.astype("float32")
+        self._add_with_ids(vectors, ids)
+        if self.raw is not None:
+            self.raw.append(vectors)
         self.texts.extend(texts)
+        self._selectors.clear()
+        return ids.tolist()
+
+    def set_metadata(self, document: str, metadata: Dict[str, Any]) -> None:
+        """Replace the metadata of a document, creating the document if needed."""
+        self.documents.register(document, metadata)
+        self._selectors.clear()
 
-    def search(self, query_embedding: np.ndarray, k: int = 5) -> tuple:
-        """Search for k nearest neighbors."""
+    def train(self, sample: np.ndarray) -> None:
+        """Train the index on a sample of vectors and move staged vectors into it."""
+        if self._staging is None:
+            return
+        self.index.train(np.ascontiguousarray(sample, dtype="float32"))
+        vectors, ids = export_vectors(self._staging)
+        self._staging = None
+        if len(ids):
+            self.index.add_with_ids(vectors, ids)
+
+    def remove(self, ids: List[int]) -> int:
+        """Remove vectors by id and return how many were removed."""
+        if not ids:
+            return 0
+        selector = np.asarray(ids, dtype="int64")
+        tombstoned = False
+        if self._staging is not None:
+            self._staging.remove_ids(selector)
+        else:
+            try:
+                self.index.remove_ids(selector)
+            except RuntimeError:
+                # HNSW cannot remove vectors: they stay in the index, skipped by
+                # every search, until the next rebuild
+                tombstoned = True
+        removed = self.documents.mark_removed(ids)
+        if tombstoned:
+            self._tombstones += removed
+        for idx in ids:
+            self.texts[idx] = None
+        self._selectors.clear()
+        return removed
+
+    def remove_document(self, document: str) -> int:
+        """Remove every chunk of a document and the document itself, returning the number of chunks removed."""
+        removed = self.remove(self.documents.chunks_of(document))
+        self.documents.forget(document)
+        self._selectors.clear()
+        return removed
+
+    def chunk_mask(self, documents: Optional[List[str]] = None, where: Optional[Where] = None) -> np.ndarray:
+        """Return a boolean mask over chunk ids of live chunks in the given documents matching where."""
+        if documents is None and not where:
+            return self.documents.live_mask()
+        return self.documents.live_mask(self.documents.matching(documents, where))
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> tuple:
+        """Search for k nearest neighbors.
+
+        nprobe (IVF) and ef_search (HNSW) override the index defaults for this query.
+        documents and where restrict the search to chunks of the named documents
+        and of documents whose metadata matches.
+        """
         query_embedding = query_embedding.astype("float32")
         if query_embedding.ndim == 1:
             query_embedding = query_embedding.reshape(1, -1)
-        distances, indices = self.index.search(query_embedding, k)
-        results = [(self.texts[idx], float(dist)) for idx, dist in zip(indices[0], distances[0])]
-        return results
+        return self.search_batch(
+            query_embedding[:1], k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+        )[0]
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[tuple]]:
+        """Search k nearest neighbors of many queries in one call, one result list per query."""
+        hits = self.search_ids_batch(
+            query_embeddings, k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+        )
+        return [[(self.texts[idx], dist) for idx, dist in ranked] for ranked in hits]
+
+    def search_ids_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Search k nearest neighbors of many queries and return (chunk id, distance) pairs."""
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype="float32")
+        fetch = k * self.rescore if self.raw is not None else k
+        # Hold the bitmap the selector points into until the search is done, even
+        # if another search clears the selector cache meanwhile
+        selector, bits = self._selector(documents, where)
+        if self._staging is not None:
+            params = faiss.SearchParameters(sel=selector) if selector is not None else None
+            distances, indices = self._staging.search(query_embeddings, fetch, params=params)
+        else:
+            params = self._search_params(nprobe, ef_search, selector)
+            distances, indices = self.index.search(query_embeddings, fetch, params=params)
+        if self.raw is not None:
+            return [self._rescore(query, row_ids, k) for query, row_ids in zip(query_embeddings, indices)]
+        # FAISS pads with -1 when fewer than k vectors are stored
+        return [
+            [(int(idx), float(dist)) for idx, dist in zip(row_ids, row_distances) if idx >= 0]
+            for row_ids, row_distances in zip(indices, distances)
+        ]
+
+    def rebuild(self, factory: str, train_size: Optional[int] = None) -> None:
+        """Migrate all stored vectors into a new index type, keeping their ids and texts.
+
+        Without rescore vectors are reconstructed from the current index, so
+        migrating away from a compressed index (PQ, SQ) carries its quantization
+        error over; with rescore the exact vectors on disk are used.
+        """
+        vectors, ids = export_vectors(self._staging if self._staging is not None else self.index)
+        if self._tombstones:
+            live = self.documents.live_mask()[ids]
+            vectors, ids = vectors[live], ids[live]
+            self._tombstones = 0
+        if self.raw is not None and len(ids):
+            # Exact vectors avoid carrying over the old index's quantization error
+            vectors = self.raw.get(ids)
+        self.factory = factory
+        self.index = _build_index(self.dimension, factory)
+        self.train_size = train_size or _default_train_size(self.index, factory)
+        self._staging = None
+        if not self.index.is_trained:
+            self._staging = faiss.IndexIDMap(faiss.IndexFlatL2(self.dimension))
+        if len(ids):
+            self._add_with_ids(vectors, ids)
+        self._selectors.clear()
 
     def save(self, path: str) -> None:
-        """Save index to disk."""
-        faiss.write_index(self.index, path)
+        """Save the index, chunk texts and settings into the directory path.
+
+        The directory is written next to path and swapped in when complete, so a
+        crash during saving leaves the previous version intact. Chunk texts saved
+        before are linked rather than rewritten, and the texts are mapped from
+        path afterwards.
+        """
+        tmp_path = path.rstrip(os.sep) + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        faiss.write_index(self.index, os.path.join(tmp_path, INDEX_FILE))
+        if self._staging is not None:
+            faiss.write_index(self._staging, os.path.join(tmp_path, STAGING_FILE))
+        self.texts.save(tmp_path)
+        self.documents.save(tmp_path)
+        if self.raw is not None:
+            self.raw.save(os.path.join(tmp_path, VECTORS_FILE))
+        manifest = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "dimension": self.dimension,
+            "factory": self.factory,
+            "train_size": self.train_size,
+            "nprobe": self.nprobe,
+            "ef_search": self.ef_search,
+            "rescore": self.rescore,
+            "chunk_ids": len(self.texts),
+            "ntotal": self.ntotal,
+            "tombstones": self._tombstones,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_path = path.rstrip(os.sep) + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        self.texts = ChunkTexts.load(path, len(self.texts))
+        if self.raw is not None:
+            self.raw.reopen(os.path.join(path, VECTORS_FILE))
+        shutil.rmtree(old_path, ignore_errors=True)
 
     def load(self, path: str) -> None:
-        """Load index from disk."""
-        self.index = faiss.read_index(path)
+        """Load an index saved with save(); chunk texts are memory-mapped, not read."""
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT_NAME or manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported index format {manifest.get('format')!r} version {manifest.get('version')!r}"
+            )
+        if manifest["dimension"] != self.dimension:
+            raise ValueError(
+                f"Saved index dimension {manifest['dimension']} does not match index dimension {self.dimension}"
+            )
+        self.factory = manifest["factory"]
+        self.train_size = manifest["train_size"]
+        self.nprobe = manifest["nprobe"]
+        self.ef_search = manifest["ef_search"]
+        self.index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        self._staging = None
+        staging_path = os.path.join(path, STAGING_FILE)
+        if os.path.exists(staging_path):
+            self._staging = faiss.read_index(staging_path)
+        self.texts = ChunkTexts.load(path, manifest["chunk_ids"])
+        self.documents = ChunkDocuments.load(path, len(self.texts))
+        self._tombstones = manifest.get("tombstones", 0)
+        self._selectors.clear()
+        self.rescore = manifest.get("rescore") if os.path.exists(os.path.join(path, VECTORS_FILE)) else None
+        self.raw = None
+        if self.rescore:
+            self.raw = RawVectors(self.dimension, os.path.join(path, VECTORS_FILE), count=len(self.texts))
+
+    def _add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        """Add vectors to the index, or stage them until there are enough to train on."""
+        if self._staging is None:
+            self.index.add_with_ids(vectors, ids)
+            return
+        self._staging.add_with_ids(vectors, ids)
+        if self._staging.ntotal >= self.train_size:
+            staged, _ = export_vectors(self._staging)
+            rng = np.random.default_rng(0)
+            sample = staged[rng.choice(len(staged), size=self.train_size, replace=False)]
+            self.train(sample)
+
+    def _rescore(self, query: np.ndarray, candidate_ids: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Reorder candidates by exact squared L2 distance to the query and keep the best k."""
+        candidate_ids = candidate_ids[candidate_ids >= 0]
+        if len(candidate_ids) == 0:
+            return []
+        differences = self.raw.get(candidate_ids) - query
+        distances = np.einsum("ij,ij->i", differences, differences)
+        order = np.argsort(distances, kind="stable")[:k]
+        return [(int(candidate_ids[i]), float(distances[i])) for i in order]
+
+    def _selector(
+        self, documents: Optional[List[str]], where: Optional[Where]
+    ) -> Tuple[Optional[faiss.IDSelector], Optional[np.ndarray]]:
+        """Return an ID selector admitting the live chunks matching the filter, and the bitmap it points into.
+
+        Both are None if all chunks match. Selectors are bitmaps over chunk ids,
+        cached per filter until the index changes; callers must keep the bitmap
+        referenced for as long as they use the selector.
+        """
+        if documents is None and not where:
+            if not self._tombstones:
+                return None, None
+            key = None
+        else:
+            key = (tuple(documents) if documents is not None else None, json.dumps(where, sort_keys=True))
+        cached = self._selectors.get(key)
+        if cached is None:
+            bits = np.packbits(self.chunk_mask(documents, where), bitorder="little")
+            if len(bits) == 0:
+                bits = np.zeros(1, dtype="uint8")
+            # The selector points into bits, which must stay alive alongside it
+            cached = (faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits)), bits)
+            if len(self._selectors) >= 64:
+                self._selectors.clear()
+            self._selectors[key] = cached
+        return cached
 
+    def _search_params(
+        self,
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        selector: Optional[faiss.IDSelector] = None,
+    ) -> Optional[faiss.SearchParameters]:
+        """Build per-query search parameters for the index type."""
+        nprobe = nprobe or self.nprobe
+        ef_search = ef_search or self.ef_search
+        ivf = _extract_ivf(self.index)
+        if ivf is not None and (nprobe or selector is not None):
+            params = faiss.SearchParametersIVF(nprobe=nprobe or ivf.nprobe)
+        elif ivf is None and isinstance(faiss.downcast_index(self.index.index), faiss.IndexHNSW):
+            if not ef_search and selector is None:
+                return None
+            hnsw = faiss.downcast_index(self.index.index).hnsw
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or hnsw.efSearch)
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
+        if selector is not None:
+            params.sel = selector
+        return params
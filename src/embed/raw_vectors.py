@@ -0,0 +1,77 @@
+"""Full-precision vectors kept on disk for exact rescoring."""
+
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+from src.embed.chunk_texts import link_file
+
+VECTORS_FILE = "vectors.f32"
+
+
+class RawVectors:
+    """Append-only float32 vectors indexed by chunk id in a memory-mapped file.
+
+    Vectors live on disk and are paged in by the OS only when read, so they do not
+    count against the process's resident memory the way an in-memory index does.
+    Until the first save the file is an anonymous temporary file; afterwards it is
+    the saved file, and vectors added later are written past the saved ones, so a
+    save only links that file into the new location.
+    """
+
+    def __init__(self, dimension: int, path: Optional[str] = None, count: int = 0):
+        """Open the vectors file at path holding count vectors, or a new temporary file."""
+        self.dimension = dimension
+        self._row_bytes = dimension * 4
+        self._count = count
+        self._path = path
+        self._file = open(path, "r+b") if path is not None else tempfile.TemporaryFile()
+        self._capacity = 0
+        self._map: Optional[np.memmap] = None
+        self._remap(os.fstat(self._file.fileno()).st_size // self._row_bytes)
+
+    def __len__(self) -> int:
+        """Return the number of stored vectors."""
+        return self._count
+
+    def append(self, vectors: np.ndarray) -> None:
+        """Store vectors under the next chunk ids."""
+        needed = self._count + len(vectors)
+        if needed > self._capacity:
+            capacity = max(needed, 2 * self._capacity, 1024)
+            self._file.truncate(capacity * self._row_bytes)
+            self._remap(capacity)
+        self._map[self._count:needed] = vectors
+        self._count = needed
+
+    def get(self, ids: np.ndarray) -> np.ndarray:
+        """Return the vectors of the given chunk ids."""
+        return np.asarray(self._map[np.asarray(ids, dtype="int64")])
+
+    def save(self, path: str, block_rows: int = 65536) -> None:
+        """Write the stored vectors to path: link the file saved before, or copy the temporary file."""
+        if self._path is not None:
+            if self._map is not None:
+                self._map.flush()
+            link_file(self._path, path)
+            return
+        with open(path, "wb") as f:
+            for start in range(0, self._count, block_rows):
+                f.write(np.ascontiguousarray(self._map[start:min(start + block_rows, self._count)]).tobytes())
+
+    def reopen(self, path: str) -> None:
+        """Switch to the vectors file at path, which must hold the same vectors."""
+        self._map = None
+        self._file.close()
+        self._path = path
+        self._file = open(path, "r+b")
+        self._remap(os.fstat(self._file.fileno()).st_size // self._row_bytes)
+
+    def _remap(self, capacity: int) -> None:
+        """Map the first capacity rows of the file."""
+        self._capacity = capacity
+        self._map = None
+        if capacity:
+            self._map = np.memmap(self._file, dtype="float32", mode="r+", shape=(capacity, self.dimension))
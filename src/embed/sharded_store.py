@@ -0,0 +1,418 @@
+"""Vector store split across FAISS index shards searched in parallel."""
+
+import heapq
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.embed.bm25_index import BM25Index
+from src.embed.chunk_documents import Where
+from src.embed.faiss_index import FAISSIndex
+from src.embed.rwlock import ReadWriteLock
+from src.embed.vector_store import KEYWORDS_DIR
+
+SHARD_MODES = ("thread", "process")
+SHARDS_FILE = "shards.json"
+
+
+def _search_hits(index: FAISSIndex, queries: np.ndarray, k: int, **params) -> List[List[Tuple[float, int, str]]]:
+    """Search a shard and return (distance, local id, text) triples, closest first."""
+    hits = index.search_ids_batch(queries, k, **params)
+    return [[(dist, idx, index.texts[idx]) for idx, dist in ranked] for ranked in hits]
+
+
+def _text(index: FAISSIndex, chunk_id: int) -> Optional[str]:
+    """Return the text of a shard chunk."""
+    return index.texts[chunk_id]
+
+
+def _metadata(index: FAISSIndex, document: str) -> Optional[Dict[str, Any]]:
+    """Return the metadata a shard holds for a document."""
+    return index.documents.metadata_of(document)
+
+
+def _chunk_ids(index: FAISSIndex) -> int:
+    """Return how many chunk ids a shard has assigned."""
+    return len(index.texts)
+
+
+def _live_texts(index: FAISSIndex) -> List[Tuple[int, str]]:
+    """Return the (local id, text) pairs of a shard's live chunks."""
+    texts = [(idx, index.texts[idx]) for idx in range(len(index.texts))]
+    return [(idx, text) for idx, text in texts if text is not None]
+
+
+_OPERATIONS: Dict[str, Callable[..., Any]] = {
+    "search_hits": _search_hits,
+    "text": _text,
+    "chunk_ids": _chunk_ids,
+    "live_texts": _live_texts,
+    "metadata": _metadata,
+}
+
+
+def _run(index: FAISSIndex, operation: str, args: tuple, kwargs: dict) -> Any:
+    """Apply an operation to a shard: one of the helpers above, or an index method or attribute."""
+    if operation in _OPERATIONS:
+        return _OPERATIONS[operation](index, *args, **kwargs)
+    attribute = getattr(index, operation)
+    return attribute(*args, **kwargs) if callable(attribute) else attribute
+
+
+def _serve(connection, index_args: Dict[str, Any]) -> None:
+    """Hold a shard in a worker process and answer operations until told to stop."""
+    index = FAISSIndex(**index_args)
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        operation, args, kwargs = message
+        try:
+            connection.send((True, _run(index, operation, args, kwargs)))
+        except Exception as e:
+            connection.send((False, e))
+    connection.close()
+
+
+class _LocalShard:
+    """Shard held in this process; FAISS releases the GIL while searching."""
+
+    def __init__(self, index_args: Dict[str, Any]):
+        """Create the shard index."""
+        self.index = FAISSIndex(**index_args)
+
+    def call(self, operation: str, *args, **kwargs) -> Any:
+        """Apply an operation to the shard."""
+        return _run(self.index, operation, args, kwargs)
+
+    def close(self) -> None:
+        """Release the shard (nothing to do in-process)."""
+
+
+class _ProcessShard:
+    """Shard held in a worker process and called over a pipe."""
+
+    def __init__(self, index_args: Dict[str, Any], context):
+        """Start the worker process."""
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child, index_args), daemon=True)
+        self._process.start()
+        child.close()
+        self._lock = threading.Lock()
+
+    def call(self, operation: str, *args, **kwargs) -> Any:
+        """Apply an operation to the shard in its worker process."""
+        with self._lock:
+            self._connection.send((operation, args, kwargs))
+            ok, result = self._connection.recv()
+        if not ok:
+            raise result
+        return result
+
+    def close(self) -> None:
+        """Stop the worker process."""
+        with self._lock:
+            if self._process.is_alive():
+                self._connection.send(None)
+        self._process.join(timeout=5)
+        self._connection.close()
+
+
+class ShardedVectorStore:
+    """Vector store spreading chunks over several FAISS index shards.
+
+    Chunk ids are global and assigned round-robin: chunk id i lives in shard
+    i % shards under local id i // shards, so every shard keeps sequential
+    local ids. Searches query all shards in parallel and merge their sorted
+    top-k lists with a heap.
+
+    In "thread" mode the shards live in this process and are searched from a
+    thread pool; in "process" mode each shard lives in its own worker process,
+    which also spreads memory and index updates over processes. The BM25 keyword
+    index is kept whole in this process, so term statistics stay global.
+
+    Implements the FaissVectorStore interface, including its reader-writer
+    locking, so it can be used by Retriever and Indexer in its place.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        shards: int = 4,
+        mode: str = "thread",
+        factory: str = "Flat",
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        keyword_index: bool = True,
+        rescore: Optional[int] = None,
+    ):
+        """Create the shards, each an index of the given FAISS type."""
+        if mode not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode '{mode}', expected one of {SHARD_MODES}")
+        if shards < 1:
+            raise ValueError("A sharded store needs at least one shard")
+        self.dimension = dimension
+        self.mode = mode
+        index_args = {
+            "dimension": dimension,
+            "factory": factory,
+            "nprobe": nprobe,
+            "ef_search": ef_search,
+            "rescore": rescore,
+        }
+        if mode == "process":
+            # Forking a process that has already run OpenMP code can deadlock
+            context = multiprocessing.get_context("spawn")
+            self.shards = [_ProcessShard(index_args, context) for _ in range(shards)]
+        else:
+            self.shards = [_LocalShard(index_args) for _ in range(shards)]
+        self.keywords: Optional[BM25Index] = BM25Index() if keyword_index else None
+        self.version = 0
+        self._next_id = 0
+        self._lock = ReadWriteLock()
+        self._executor = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="docrag-shard")
+
+    def __len__(self) -> int:
+        """Return the number of stored chunks."""
+        with self._lock.read():
+            return sum(self._broadcast("ntotal"))
+
+    def add(
+        self, embeddings: np.ndarray, texts: List[str], documents: Optional[List[Optional[str]]] = None
+    ) -> List[int]:
+        """Add embeddings and texts, optionally with the document name of each chunk, and return their ids.
+
+        The input is checked before any shard is written, since a failure on one
+        shard after others appended would break the mapping of ids to shards.
+        """
+        if embeddings.ndim != 2 or len(embeddings) != len(texts):
+            raise ValueError(f"Got embeddings of shape {embeddings.shape} for {len(texts)} chunks")
+        if embeddings.shape[1] != self.dimension:
+            raise ValueError(
+                f"Embedding dimension {embeddings.shape[1]} does not match index dimension {self.dimension}"
+            )
+        if documents is not None and len(documents) != len(texts):
+            raise ValueError(f"Got {len(documents)} document names for {len(texts)} chunks")
+        num_shards = len(self.shards)
+        with self._lock.write():
+            ids = list(range(self._next_id, self._next_id + len(texts)))
+            calls = []
+            for shard in range(num_shards):
+                # Position of the first new chunk that belongs to this shard
+                first = (shard - self._next_id) % num_shards
+                if first < len(texts):
+                    shard_documents = documents[first::num_shards] if documents is not None else None
+                    calls.append((shard, "add", (embeddings[first::num_shards], texts[first::num_shards]),
+                                  {"documents": shard_documents}))
+            self._fan_out(calls)
+            self._next_id += len(texts)
+            if self.keywords is not None:
+                self.keywords.add(ids, texts)
+            if ids:
+                self.version += 1
+        return ids
+
+    def remove(self, ids: List[int]) -> int:
+        """Remove chunks by id and return how many were removed."""
+        num_shards = len(self.shards)
+        local: Dict[int, List[int]] = {}
+        for chunk_id in ids:
+            local.setdefault(chunk_id % num_shards, []).append(chunk_id // num_shards)
+        calls = [(shard, "remove", (shard_ids,), {}) for shard, shard_ids in local.items()]
+        with self._lock.write():
+            removed = sum(self._fan_out(calls))
+            if self.keywords is not None:
+                self.keywords.remove(ids)
+            if removed:
+                self.version += 1
+        return removed
+
+    def remove_document(self, document: str) -> int:
+        """Remove every chunk of a document and return how many were removed."""
+        with self._lock.write():
+            ids = np.flatnonzero(self._chunk_mask([document], None)).tolist()
+            removed = sum(self._broadcast("remove_document", document))
+            if self.keywords is not None:
+                self.keywords.remove(ids)
+            self.version += 1
+        return removed
+
+    def set_metadata(self, document: str, metadata: Dict[str, Any]) -> None:
+        """Replace the metadata of a document."""
+        with self._lock.write():
+            self._broadcast("set_metadata", document, metadata)
+            self.version += 1
+
+    def metadata(self, document: str) -> Optional[Dict[str, Any]]:
+        """Return the metadata of a document, or None if the store does not know it."""
+        # A document is only known to the shards holding its chunks unless its metadata was set
+        # explicitly, which sets it on every shard alike, so shards that know it agree
+        with self._lock.read():
+            answers = self._broadcast("metadata", document)
+        return next((metadata for metadata in answers if metadata is not None), None)
+
+    def chunk_mask(self, documents: Optional[List[str]] = None, where: Optional[Where] = None) -> np.ndarray:
+        """Return a boolean mask over global chunk ids of live chunks matching the filter."""
+        with self._lock.read():
+            return self._chunk_mask(documents, where)
+
+    def text(self, chunk_id: int) -> Optional[str]:
+        """Return the text of a chunk, or None if it was removed."""
+        num_shards = len(self.shards)
+        with self._lock.read():
+            return self.shards[chunk_id % num_shards].call("text", chunk_id // num_shards)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[tuple]:
+        """Search for k nearest neighbors."""
+        query_embedding = np.asarray(query_embedding, dtype="float32").reshape(1, -1)
+        return self.search_batch(
+            query_embedding, k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+        )[0]
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[tuple]]:
+        """Search k nearest neighbors of many queries in one call."""
+        merged = self._search(
+            query_embeddings, k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+        )
+        return [[(text, dist) for dist, _, text in ranked] for ranked in merged]
+
+    def search_ids_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Search k nearest neighbors of many queries, returning (chunk id, distance) pairs."""
+        merged = self._search(query_embeddings, k, documents=documents, where=where)
+        return [[(chunk_id, dist) for dist, chunk_id, _ in ranked] for ranked in merged]
+
+    def keyword_search(
+        self, query: str, k: int = 5, documents: Optional[List[str]] = None, where: Optional[Where] = None
+    ) -> List[Tuple[int, float]]:
+        """Return the k best BM25 matches of a query as (chunk id, score) pairs."""
+        if self.keywords is None:
+            raise ValueError("This vector store has no keyword index")
+        with self._lock.read():
+            allowed = self._chunk_mask(documents, where) if documents is not None or where else None
+            return self.keywords.search(query, k, allowed=allowed)
+
+    def rebuild(self, factory: str) -> None:
+        """Migrate every shard into a new FAISS index type."""
+        with self._lock.write():
+            self._broadcast("rebuild", factory)
+            self.version += 1
+
+    def save(self, path: str) -> None:
+        """Save every shard and the keyword index into a directory."""
+        os.makedirs(path, exist_ok=True)
+        with self._lock.read():
+            self._fan_out([(shard, "save", (_shard_path(path, shard),), {}) for shard in range(len(self.shards))])
+            if self.keywords is not None:
+                self.keywords.save(os.path.join(path, KEYWORDS_DIR))
+        # The shard list is written last, so its presence marks a complete save
+        with open(os.path.join(path, SHARDS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"shards": len(self.shards)}, f)
+
+    def load(self, path: str) -> None:
+        """Load every shard and the keyword index from a directory."""
+        shards_path = os.path.join(path, SHARDS_FILE)
+        if not os.path.exists(shards_path):
+            raise ValueError(f"'{path}' does not hold a sharded store")
+        with open(shards_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)["shards"]
+        if saved != len(self.shards):
+            raise ValueError(f"Saved store has {saved} shards, this store has {len(self.shards)}")
+        with self._lock.write():
+            self._fan_out([(shard, "load", (_shard_path(path, shard),), {}) for shard in range(len(self.shards))])
+            self._next_id = sum(self._broadcast("chunk_ids"))
+            if self.keywords is not None:
+                keywords_path = os.path.join(path, KEYWORDS_DIR)
+                if BM25Index.is_saved(keywords_path):
+                    self.keywords = BM25Index.load(keywords_path)
+                else:
+                    self.keywords = self._rebuild_keywords()
+            self.version += 1
+
+    def close(self) -> None:
+        """Stop the shard worker threads and processes."""
+        for shard in self.shards:
+            shard.close()
+        self._executor.shutdown(wait=False)
+
+    def _search(self, query_embeddings: np.ndarray, k: int, **params) -> List[List[Tuple[float, int, str]]]:
+        """Search all shards and merge their results into (distance, global id, text) triples."""
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype="float32")
+        num_shards = len(self.shards)
+        with self._lock.read():
+            per_shard = self._broadcast("search_hits", query_embeddings, k, **params)
+        merged = []
+        for query in range(len(query_embeddings)):
+            ranked = [
+                [(dist, idx * num_shards + shard, text) for dist, idx, text in hits[query]]
+                for shard, hits in enumerate(per_shard)
+            ]
+            # Each shard's list is sorted by distance, so a heap merge yields the global order
+            merged.append(list(itertools.islice(heapq.merge(*ranked, key=lambda hit: hit[0]), k)))
+        return merged
+
+    def _chunk_mask(self, documents: Optional[List[str]], where: Optional[Where]) -> np.ndarray:
+        """Build the chunk mask; the caller holds the lock."""
+        mask = np.zeros(self._next_id, dtype=bool)
+        for shard, shard_mask in enumerate(self._broadcast("chunk_mask", documents, where)):
+            mask[shard::len(self.shards)] = shard_mask
+        return mask
+
+    def _broadcast(self, operation: str, *args, **kwargs) -> List[Any]:
+        """Apply an operation to every shard in parallel and return the results in shard order."""
+        return self._fan_out([(shard, operation, args, kwargs) for shard in range(len(self.shards))])
+
+    def _fan_out(self, calls: List[Tuple[int, str, tuple, dict]]) -> List[Any]:
+        """Run (shard, operation, args, kwargs) calls in parallel and return their results in order."""
+        if len(calls) == 1:
+            shard, operation, args, kwargs = calls[0]
+            return [self.shards[shard].call(operation, *args, **kwargs)]
+        futures = [
+            self._executor.submit(self.shards[shard].call, operation, *args, **kwargs)
+            for shard, operation, args, kwargs in calls
+        ]
+        return [future.result() for future in futures]
+
+    def _rebuild_keywords(self) -> BM25Index:
+        """Build the keyword index from the stored chunk texts."""
+        num_shards = len(self.shards)
+        chunks = sorted(
+            (idx * num_shards + shard, text)
+            for shard, texts in enumerate(self._broadcast("live_texts"))
+            for idx, text in texts
+        )
+        keywords = BM25Index()
+        keywords.add([chunk_id for chunk_id, _ in chunks], [text for _, text in chunks])
+        return keywords
+
+
+def _shard_path(path: str, shard: int) -> str:
+    """Return the directory a shard is saved in."""
+    return os.path.join(path, f"shard-{shard}")
@@ -1,32 +1,193 @@
 """Vector store interface for FAISS."""
 
-from typing import List
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
+from src.embed.bm25_index import BM25Index
+from src.embed.chunk_documents import Where
 from src.embed.faiss_index import FAISSIndex
+from src.embed.rwlock import ReadWriteLock
+
+KEYWORDS_DIR = "bm25"
 
 
 class FaissVectorStore:
-    """Vector store wrapper around FAISS index."""
+    """Vector store wrapper around FAISS index.
+
+    Unless keyword_index is False, chunk texts are also indexed in a BM25 inverted
+    index as they are added, for exact-term matches such as part numbers.
+
+    Searches can be restricted to chunks of named documents (documents) and of
+    documents whose metadata matches a filter (where, such as
+    {"product_line": "brakes"} or {"product_line": ["brakes", "steering"]}).
+
+    version is increased by every change to the stored chunks or document
+    metadata (add, remove, rebuild, load), so callers can tell whether results
+    they cached are stale.
+
+    The store may be changed by an indexing thread while other threads search
+    it: changes hold a reader-writer lock exclusively, searches hold it shared.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        factory: str = "Flat",
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        keyword_index: bool = True,
+        rescore: Optional[int] = None,
+    ):
+        """Initialize vector store with given dimension and FAISS index type."""
+        self.dimension = dimension
+        self.index = FAISSIndex(dimension, factory=factory, nprobe=nprobe, ef_search=ef_search, rescore=rescore)
+        self.keywords: Optional[BM25Index] = BM25Index() if keyword_index else None
+        self.version = 0
+        self._lock = ReadWriteLock()
+
+    def __len__(self) -> int:
+        """Return the number of stored chunks."""
+        return self.index.ntotal
+
+    def add(
+        self, embeddings: np.ndarray, texts: List[str], documents: Optional[List[Optional[str]]] = None
+    ) -> List[int]:
+        """Add embeddings and texts, optionally with the document name of each chunk, and return their ids."""
+        with self._lock.write():
+            ids = self.index.add(embeddings, texts, documents=documents)
+            if self.keywords is not None:
+                self.keywords.add(ids, texts)
+            if ids:
+                self.version += 1
+        return ids
 
-    def __init__(self, dimension: int):
-        """Initialize vector store with given dimension."""
-        self.index = FAISSIndex(dimension)
+    def remove(self, ids: List[int]) -> int:
+        """Remove chunks by id and return how many were removed."""
+        with self._lock.write():
+            removed = self.index.remove(ids)
+            if self.keywords is not None:
+                self.keywords.remove(ids)
+            if removed:
+                self.version += 1
+        return removed
 
-    def add(self, embeddings: np.ndarray, texts: List[str]) -> None:
-        """Add embeddings and texts to the store."""
-        self.index.add(embeddings, texts)
+    def remove_document(self, document: str) -> int:
+        """Remove every chunk of a document and return how many were removed."""
+        with self._lock.write():
+            ids = self.index.documents.chunks_of(document)
+            removed = self.index.remove_document(document)
+            if self.keywords is not None:
+                self.keywords.remove(ids)
+            self.version += 1
+        return removed
 
-    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[tuple]:
+    def set_metadata(self, document: str, metadata: Dict[str, Any]) -> None:
+        """Replace the metadata of a document."""
+        with self._lock.write():
+            self.index.set_metadata(document, metadata)
+            self.version += 1
+
+    def metadata(self, document: str) -> Optional[Dict[str, Any]]:
+        """Return the metadata of a document, or None if the store does not know it."""
+        with self._lock.read():
+            return self.index.documents.metadata_of(document)
+
+    def chunk_mask(self, documents: Optional[List[str]] = None, where: Optional[Where] = None) -> np.ndarray:
+        """Return a boolean mask over chunk ids of live chunks matching the filter."""
+        with self._lock.read():
+            return self.index.chunk_mask(documents, where)
+
+    def text(self, chunk_id: int) -> Optional[str]:
+        """Return the text of a chunk, or None if it was removed."""
+        with self._lock.read():
+            return self.index.texts[chunk_id]
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[tuple]:
         """Search for k nearest neighbors."""
-        return self.index.search(query_embedding, k)
+        with self._lock.read():
+            return self.index.search(
+                query_embedding, k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+            )
+
+    def search_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[tuple]]:
+        """Search k nearest neighbors of many queries in one call."""
+        with self._lock.read():
+            return self.index.search_batch(
+                query_embeddings, k, nprobe=nprobe, ef_search=ef_search, documents=documents, where=where
+            )
+
+    def search_ids_batch(
+        self,
+        query_embeddings: np.ndarray,
+        k: int = 5,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """Search k nearest neighbors of many queries, returning (chunk id, distance) pairs."""
+        with self._lock.read():
+            return self.index.search_ids_batch(query_embeddings, k, documents=documents, where=where)
+
+    def keyword_search(
+        self, query: str, k: int = 5, documents: Optional[List[str]] = None, where: Optional[Where] = None
+    ) -> List[Tuple[int, float]]:
+        """Return the k best BM25 matches of a query as (chunk id, score) pairs."""
+        if self.keywords is None:
+            raise ValueError("This vector store has no keyword index")
+        with self._lock.read():
+            allowed = self.index.chunk_mask(documents, where) if documents is not None or where else None
+            return self.keywords.search(query, k, allowed=allowed)
+
+    def rebuild(self, factory: str) -> None:
+        """Migrate the stored chunks into a new FAISS index type."""
+        with self._lock.write():
+            self.index.rebuild(factory)
+            self.version += 1
 
     def save(self, path: str) -> None:
-        """Save index to disk."""
-        self.index.save(path)
+        """Save the index, chunk texts and keyword index into a directory."""
+        with self._lock.read():
+            self.index.save(path)
+            if self.keywords is not None:
+                self.keywords.save(os.path.join(path, KEYWORDS_DIR))
 
     def load(self, path: str) -> None:
-        """Load index from disk."""
-        self.index.load(path)
+        """Load the index, chunk texts and keyword index from a directory."""
+        with self._lock.write():
+            self.index.load(path)
+            if self.keywords is not None:
+                keywords_path = os.path.join(path, KEYWORDS_DIR)
+                if BM25Index.is_saved(keywords_path):
+                    self.keywords = BM25Index.load(keywords_path)
+                else:
+                    self.keywords = self._rebuild_keywords()
+            self.version += 1
 
+    def _rebuild_keywords(self) -> BM25Index:
+        """Build the keyword index from the stored chunk texts."""
+        ids, texts = [], []
+        for idx in range(len(self.index.texts)):
+            text = self.index.texts[idx]
+            if text is not None:
+                ids.append(idx)
+                texts.append(text)
+        keywords = BM25Index()
+        keywords.add(ids, texts)
+        return keywords
@@ -1,7 +1,17 @@
 """Document generation module using LLM."""
 
 from .llm_client import OllamaClient
-from .prompt_builder import build_technical_doc_prompt
+from .prompt_builder import build_technical_doc_prompt, pack_contexts
+from .response_cache import ResponseCache
+from .scheduler import GenerationScheduler, QueueFullError, QueueTimeoutError
 
-__all__ = ["OllamaClient", "build_technical_doc_prompt"]
+__all__ = [
+    "GenerationScheduler",
+    "OllamaClient",
+    "QueueFullError",
+    "QueueTimeoutError",
+    "ResponseCache",
+    "build_technical_doc_prompt",
+    "pack_contexts",
+]
 
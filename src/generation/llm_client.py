@@ -1,17 +1,158 @@
 """LLM client for local model inference using Ollama."""
 
+import codecs
+import contextlib
+import json
 import subprocess
-from typing import List
+import threading
+from typing import Any, Dict, Iterator, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+
+# "http" calls the Ollama server's REST API over pooled keep-alive connections;
+# "cli" starts an `ollama run` process per request
+OLLAMA_BACKENDS = ("http", "cli")
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
 
 
 class OllamaClient:
-    """Client for interacting with Ollama local LLM."""
+    """Client for interacting with Ollama local LLM.
+
+    The HTTP backend keeps one requests session whose connection pool is reused
+    across calls, and passes keep_alive (how long Ollama keeps the model loaded
+    after a request, e.g. "5m" or -1 for ever) and model options such as
+    num_ctx or temperature with every request. When the server cannot be
+    reached and fallback is set, the request is retried through the CLI.
+    generate_stream yields the text as the model produces it.
+    """
 
-    def __init__(self, model_name: str = "llama3"):
+    def __init__(
+        self,
+        model_name: str = "llama3",
+        backend: str = "http",
+        base_url: str = DEFAULT_OLLAMA_URL,
+        keep_alive: Optional[Union[str, int]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        connect_timeout: float = 5.0,
+        pool_size: int = 4,
+        fallback: bool = True,
+    ):
         """Initialize Ollama client with model name."""
+        if backend not in OLLAMA_BACKENDS:
+            raise ValueError(f"Unknown Ollama backend '{backend}', expected one of {OLLAMA_BACKENDS}")
         self.model_name = model_name
+        self.backend = backend
+        self.base_url = base_url.rstrip("/")
+        self.keep_alive = keep_alive
+        self.options = options or {}
+        self.connect_timeout = connect_timeout
+        self.fallback = fallback
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
 
     def generate(self, prompt: str, timeout: int = 300) -> str:
+        """Generate text for prompt with the configured backend."""
+        if self.backend == "cli":
+            return self._generate_cli(prompt, timeout)
+        try:
+            return self._generate_http(prompt, timeout)
+        except ConnectionError:
+            if not self.fallback:
+                raise
+            return self._generate_cli(prompt, timeout)
+
+    def generate_stream(self, prompt: str, timeout: int = 300) -> Iterator[str]:
+        """Generate text for prompt, yielding it piece by piece as it is produced.
+
+        timeout bounds the wait for each piece over HTTP and the whole run with the CLI.
+        Like generate, raises RuntimeError if the model produces no text.
+        """
+        produced = False
+        for piece in self._stream(prompt, timeout):
+            produced = produced or bool(piece.strip())
+            yield piece
+        if not produced:
+            raise RuntimeError("Ollama returned empty output.")
+
+    def _stream(self, prompt: str, timeout: int) -> Iterator[str]:
+        """Yield generated text from the configured backend."""
+        if self.backend == "cli":
+            yield from self._stream_cli(prompt, timeout)
+            return
+        try:
+            response = self._post(prompt, timeout, stream=True)
+        except ConnectionError:
+            if not self.fallback:
+                raise
+            yield from self._stream_cli(prompt, timeout)
+            return
+        with response:
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    message = json.loads(line)
+                    if "error" in message:
+                        raise RuntimeError(f"Ollama error: {message['error']}")
+                    if message.get("response"):
+                        yield message["response"]
+                    if message.get("done"):
+                        return
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                # requests reports a read timeout in the middle of a stream as a connection error
+                if e.args and isinstance(e.args[0], ReadTimeoutError):
+                    raise TimeoutError(f"Ollama generation timed out after {timeout} seconds")
+                raise ConnectionError(f"Lost connection to Ollama at {self.base_url}: {e}")
+
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        self.session.close()
+
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        """Build the body of an /api/generate request."""
+        payload: Dict[str, Any] = {"model": self.model_name, "prompt": prompt, "stream": stream}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.options:
+            payload["options"] = self.options
+        return payload
+
+    def _post(self, prompt: str, timeout: int, stream: bool) -> requests.Response:
+        """Post prompt to the Ollama HTTP API and return the successful response."""
+        url = f"{self.base_url}/api/generate"
+        try:
+            response = self.session.post(
+                url,
+                json=self._payload(prompt, stream=stream),
+                timeout=(self.connect_timeout, timeout),
+                stream=stream,
+            )
+        except requests.ConnectionError as e:
+            # Also covers connect timeouts: the server is unreachable rather than slow
+            raise ConnectionError(f"Cannot reach Ollama at {self.base_url}: {e}")
+        except requests.Timeout:
+            raise TimeoutError(f"Ollama generation timed out after {timeout} seconds")
+        if response.status_code != 200:
+            try:
+                error_msg = response.json().get("error", response.text)
+            except ValueError:
+                error_msg = response.text
+            raise RuntimeError(f"Ollama error ({response.status_code}): {error_msg}")
+        return response
+
+    def _generate_http(self, prompt: str, timeout: int) -> str:
+        """Call the Ollama HTTP API and return the generated text."""
+        output = self._post(prompt, timeout, stream=False).json().get("response", "")
+        if not output.strip():
+            raise RuntimeError("Ollama returned empty output.")
+        return output
+
+    def _generate_cli(self, prompt: str, timeout: int) -> str:
         """Call Ollama CLI and return the generated text."""
         try:
             result = subprocess.run(
@@ -37,3 +178,46 @@ class OllamaClient:
             error_msg = e.stderr.decode("utf-8") if e.stderr else str(e)
             raise RuntimeError(f"Ollama error: {error_msg}")
 
+    def _stream_cli(self, prompt: str, timeout: int) -> Iterator[str]:
+        """Run Ollama CLI and yield its output as it is written."""
+        try:
+            process = subprocess.Popen(
+                ["ollama", "run", self.model_name],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                "Ollama not found. Please install Ollama from https://ollama.ai/ and ensure it's in your PATH."
+            )
+        timed_out = threading.Event()
+
+        def expire() -> None:
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            # An early exit (e.g. unknown model) closes the pipe; stderr and the exit status say why
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.write(prompt.encode("utf-8"))
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.close()
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            for data in iter(lambda: process.stdout.read1(4096), b""):
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            stderr = process.stderr.read().decode("utf-8")
+            process.wait()
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if timed_out.is_set():
+            raise TimeoutError(f"Ollama generation timed out after {timeout} seconds")
+        if process.returncode != 0:
+            raise RuntimeError(f"Ollama error: {stderr or process.returncode}")
@@ -1,6 +1,11 @@
 """Prompt building utilities for structured document generation."""
 
-from typing import List
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.parse.chunker import TokenCounter, chunk_spans
+
+_WORD = re.compile(r"\S+")
 
 
 def build_technical_doc_prompt(query: str, contexts: List[str]) -> str:
@@ -17,3 +22,105 @@ def build_technical_doc_prompt(query: str, contexts: List[str]) -> str:
     )
     return prompt
 
+
+def pack_contexts(
+    contexts: List[str],
+    max_tokens: Optional[int] = None,
+    count_tokens: Optional[TokenCounter] = None,
+    min_overlap: int = 100,
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Pack retrieved chunks, most relevant first, into passages that fit a token budget.
+
+    Chunks that overlap (the end of one is the start of the other, by at least
+    min_overlap characters), or that are contained in another, are merged into
+    one passage, so text shared by neighbouring chunks appears only once. The
+    chunker's overlaps span tens of words, while a shorter match is more likely
+    repeated phrasing than the same place in a document.
+    Chunks are taken in relevance order and skipped when their new text would
+    push the total over max_tokens; if not even the most relevant chunk fits it
+    is cut to the budget. Passages are ordered by their most relevant chunk.
+    Sizes are measured with count_tokens, by default one token per whitespace
+    word. Also returns statistics, including the tokens saved against joining
+    the chunks as they are.
+    """
+    passages: List[str] = []
+    used = 0
+    dropped = 0
+    for text in contexts:
+        candidate = _absorb(passages, text, min_overlap)
+        tokens = sum(_count_tokens(candidate, count_tokens))
+        if max_tokens is not None and tokens > max_tokens:
+            if passages:
+                dropped += 1
+                continue
+            start, end = chunk_spans(text, max_tokens, 0, count_tokens)[0]
+            candidate = [text[start:end]]
+            tokens = _count_tokens(candidate, count_tokens)[0]
+        passages, used = candidate, tokens
+
+    context_tokens = sum(_count_tokens(contexts, count_tokens)) if contexts else 0
+    stats = {
+        "chunks": len(contexts),
+        "passages": len(passages),
+        "chunks_dropped": dropped,
+        "context_tokens": context_tokens,
+        "packed_tokens": used,
+        "tokens_saved": context_tokens - used,
+    }
+    return passages, stats
+
+
+def _absorb(passages: List[str], text: str, min_overlap: int) -> List[str]:
+    """Return passages with text added, merged with every passage it overlaps."""
+    passages = list(passages)
+    merged = text
+    position = len(passages)
+    i = 0
+    while i < len(passages):
+        combined = _merge(passages[i], merged, min_overlap)
+        if combined is None:
+            i += 1
+            continue
+        # A grown passage may now overlap passages already checked
+        merged = combined
+        position = min(position, i)
+        del passages[i]
+        i = 0
+    passages.insert(position, merged)
+    return passages
+
+
+def _merge(first: str, second: str, min_overlap: int) -> Optional[str]:
+    """Return the union of two overlapping or nested texts, or None if they are disjoint."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap(first, second, min_overlap)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap(second, first, min_overlap)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+
+def _overlap(head: str, tail: str, min_overlap: int) -> int:
+    """Return the length of the longest end of head that starts tail, if at least min_overlap characters."""
+    probe = tail[:min_overlap]
+    if len(probe) < min_overlap:
+        return 0
+    start = head.find(probe)
+    while start != -1:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(probe, start + 1)
+    return 0
+
+
+def _count_tokens(texts: List[str], count_tokens: Optional[TokenCounter]) -> List[int]:
+    """Count tokens of texts, one per whitespace word by default."""
+    if count_tokens is None:
+        return [len(_WORD.findall(text)) for text in texts]
+    return count_tokens(texts)
+
@@ -0,0 +1,169 @@
+"""Cache of generated documents keyed by model, query and retrieved context."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+def _digest(*parts: Any) -> str:
+    """Return the SHA-256 hex digest of JSON-encoded parts."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache of generated documents with an optional semantic tier.
+
+    Entries are keyed by a hash of the model, the query and the retrieved chunks,
+    so a document is reused only for the prompt it was generated from and stops
+    being served as soon as retrieval returns different chunks. With
+    max_distance set, a request that misses is served the document of an
+    earlier query over the same chunks whose embedding is within that cosine
+    distance. Entries older than ttl_seconds expire. With a path, the cache is
+    loaded from that JSON file and saved back after every insertion.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = None,
+        max_distance: Optional[float] = None,
+        path: Optional[str] = None,
+    ):
+        """Initialize the cache, loading saved entries from path if it exists."""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.path = path
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def get(
+        self, model: str, query: str, contexts: List[str], embedding: Optional[np.ndarray] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached {"document", "validation", "match"} for a request, or None on a miss.
+
+        match is "exact", or "semantic" when the document was generated for a
+        similar query; the semantic tier needs the query's embedding.
+        """
+        context = _digest(model, contexts)
+        key = _digest(context, query)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            match = "exact"
+            if entry is None and self.max_distance is not None and embedding is not None:
+                key, entry = self._nearest(context, embedding)
+                match = "semantic"
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if match == "exact":
+                self.hits += 1
+            else:
+                self.semantic_hits += 1
+            return {"document": entry["document"], "validation": entry["validation"], "match": match}
+
+    def put(
+        self,
+        model: str,
+        query: str,
+        contexts: List[str],
+        document: str,
+        validation: Dict[str, Any],
+        embedding: Optional[np.ndarray] = None,
+    ) -> None:
+        """Store a generated document, evicting the least recently used entries beyond max_entries."""
+        if self.max_entries <= 0:
+            return
+        context = _digest(model, contexts)
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype="float32")
+            vector = (vector / np.linalg.norm(vector)).tolist()
+        with self._lock:
+            key = _digest(context, query)
+            self._entries[key] = {
+                "context": context,
+                "query": query,
+                "embedding": vector,
+                "document": document,
+                "validation": validation,
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path is not None:
+                self._save(self.path)
+
+    def _nearest(self, context: str, embedding: np.ndarray) -> tuple:
+        """Return the (key, entry) over context whose query is closest to embedding within max_distance."""
+        query = np.asarray(embedding, dtype="float32")
+        query = query / np.linalg.norm(query)
+        best_key, best_entry, best_distance = None, None, self.max_distance
+        for key, entry in self._entries.items():
+            if entry["context"] != context or entry["embedding"] is None:
+                continue
+            distance = 1.0 - float(np.dot(query, entry["embedding"]))
+            if distance <= best_distance:
+                best_key, best_entry, best_distance = key, entry, distance
+        return best_key, best_entry
+
+    def _expire(self) -> None:
+        """Drop entries older than ttl_seconds."""
+        if self.ttl_seconds is None:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        for key in [key for key, entry in self._entries.items() if entry["created"] < cutoff]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop all entries, keeping the hit and miss counters."""
+        with self._lock:
+            self._entries.clear()
+            if self.path is not None:
+                self._save(self.path)
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit and miss counters."""
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+    def _save(self, path: str) -> None:
+        """Save the entries, least recently used first, to a JSON file, replacing it atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([[key, entry] for key, entry in self._entries.items()], f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """Load entries saved to a JSON file, dropping those that expired in the meantime."""
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        with self._lock:
+            kept = entries[-self.max_entries:] if self.max_entries > 0 else []
+            self._entries = OrderedDict((key, entry) for key, entry in kept)
+            self._expire()
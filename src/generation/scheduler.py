@@ -0,0 +1,261 @@
+"""Admission control for LLM generation requests."""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when a request arrives while the wait queue is full."""
+
+    def __init__(self, message: str, retry_after: int):
+        """Initialize the error with the suggested retry delay in seconds."""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(Exception):
+    """Raised when a request's deadline passes while it is still queued."""
+
+
+class GenerationSlot:
+    """A running slot of the scheduler, released once however often release is called."""
+
+    def __init__(self, scheduler: "GenerationScheduler", remaining: Optional[float]):
+        """Initialize the slot with the time left of the request's deadline."""
+        self.scheduler = scheduler
+        self.remaining = remaining
+        self._started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self) -> None:
+        """Return the slot to the scheduler."""
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.scheduler._release(time.monotonic() - self._started)
+
+    def __enter__(self) -> "GenerationSlot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class _Waiter:
+    """A queued request, handed its slot by the scheduler when one frees up."""
+
+    def __init__(self, start: float, timeout: Optional[float], wake: Callable[[], None]):
+        """Initialize the waiter; wake is called, with the scheduler's condition held, once it has a slot."""
+        self.start = start
+        self.timeout = timeout
+        self.wake = wake
+        self.slot: Optional[GenerationSlot] = None
+        self.expired = False
+
+
+class GenerationScheduler:
+    """Bounded-concurrency scheduler with a bounded priority queue in front of the LLM.
+
+    At most max_concurrent requests generate at once. Others wait in a queue of
+    at most max_queue requests, served by descending priority and then arrival
+    order; requests arriving when the queue is full are rejected at once. A
+    request's timeout covers its time in the queue, so the slot reports how much
+    of it is left for generation, and a request whose timeout (or max_wait)
+    passes while queued is dropped. Queue depth and recent wait and service
+    times are reported by stats.
+
+    acquire blocks the calling thread while queued; acquire_async waits in the
+    event loop, so queued requests of an async server hold no worker thread.
+    """
+
+    def __init__(
+        self, max_concurrent: int = 1, max_queue: int = 16, max_wait: Optional[float] = None, window: int = 1000
+    ):
+        """Initialize the scheduler; window is how many recent requests the time statistics cover."""
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._active = 0
+        self._waiting: List[Tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._waits: Deque[float] = deque(maxlen=window)
+        self._services: Deque[float] = deque(maxlen=window)
+        self._condition = threading.Condition()
+
+    def acquire(self, priority: int = 0, timeout: Optional[float] = None) -> GenerationSlot:
+        """Wait for a slot, raising QueueFullError or QueueTimeoutError when the request is not admitted."""
+        start = time.monotonic()
+        deadline = self._deadline(start, timeout)
+        with self._condition:
+            slot = self._admit_or_reject(start, timeout)
+            if slot is not None:
+                return slot
+            waiter = self._enqueue(priority, start, timeout, self._condition.notify_all)
+            while waiter.slot is None and not waiter.expired:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._drop(waiter)
+                    break
+                self._condition.wait(remaining)
+            if waiter.slot is None:
+                raise QueueTimeoutError(f"Request waited {time.monotonic() - start:.1f} s in the generation queue")
+            return waiter.slot
+
+    async def acquire_async(self, priority: int = 0, timeout: Optional[float] = None) -> GenerationSlot:
+        """Wait for a slot without blocking a thread; otherwise the same as acquire."""
+        start = time.monotonic()
+        deadline = self._deadline(start, timeout)
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+        with self._condition:
+            slot = self._admit_or_reject(start, timeout)
+            if slot is not None:
+                return slot
+            waiter = self._enqueue(priority, start, timeout, lambda: loop.call_soon_threadsafe(_resolve, granted))
+        try:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            await asyncio.wait_for(asyncio.shield(granted), remaining)
+        except asyncio.TimeoutError:
+            with self._condition:
+                if waiter.slot is None and not waiter.expired:
+                    self._drop(waiter)
+        except asyncio.CancelledError:
+            with self._condition:
+                if waiter.slot is None:
+                    self._drop(waiter, timed_out=False)
+            if waiter.slot is not None:
+                waiter.slot.release()
+            raise
+        if waiter.slot is None:
+            raise QueueTimeoutError(f"Request waited {time.monotonic() - start:.1f} s in the generation queue")
+        return waiter.slot
+
+    def check_capacity(self) -> None:
+        """Raise QueueFullError if a request arriving now would be rejected.
+
+        Lets callers refuse a request before doing work, such as retrieval,
+        that is wasted when the request cannot be queued.
+        """
+        with self._condition:
+            if self._active >= self.max_concurrent and len(self._waiting) >= self.max_queue:
+                self._reject()
+
+    def _deadline(self, start: float, timeout: Optional[float]) -> Optional[float]:
+        """Return when a request arriving at start stops waiting: its timeout or max_wait, whichever is sooner."""
+        limits = [limit for limit in (timeout, self.max_wait) if limit is not None]
+        return start + min(limits) if limits else None
+
+    def _admit_or_reject(self, start: float, timeout: Optional[float]) -> Optional[GenerationSlot]:
+        """Admit a request at once if a slot is free, reject it if the queue is full, else return None."""
+        if timeout is not None and timeout <= 0:
+            self.timed_out += 1
+            raise QueueTimeoutError("Request has no time left to generate")
+        if self._active < self.max_concurrent and not self._waiting:
+            return self._admit(start, timeout)
+        if len(self._waiting) >= self.max_queue:
+            self._reject()
+        return None
+
+    def _reject(self) -> None:
+        """Count and raise the rejection of a request; the caller holds the condition."""
+        self.rejected += 1
+        raise QueueFullError(
+            f"Generation queue is full ({len(self._waiting)} waiting, {self._active} running)",
+            self._retry_after(),
+        )
+
+    def _enqueue(self, priority: int, start: float, timeout: Optional[float], wake: Callable[[], None]) -> _Waiter:
+        """Queue a request; the caller holds the condition."""
+        waiter = _Waiter(start, timeout, wake)
+        heapq.heappush(self._waiting, (-priority, next(self._sequence), waiter))
+        return waiter
+
+    def _drop(self, waiter: _Waiter, timed_out: bool = True) -> None:
+        """Remove a request that stopped waiting from the queue; the caller holds the condition."""
+        self._waiting = [entry for entry in self._waiting if entry[2] is not waiter]
+        heapq.heapify(self._waiting)
+        if timed_out:
+            self.timed_out += 1
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the requests at the head of the queue; the caller holds the condition.
+
+        A request whose deadline has passed is woken without a slot, so it is
+        never started with no time left to generate.
+        """
+        while self._waiting and self._active < self.max_concurrent:
+            waiter = heapq.heappop(self._waiting)[2]
+            deadline = self._deadline(waiter.start, waiter.timeout)
+            if deadline is not None and time.monotonic() >= deadline:
+                waiter.expired = True
+                self.timed_out += 1
+            else:
+                waiter.slot = self._admit(waiter.start, waiter.timeout)
+            waiter.wake()
+
+    def _admit(self, start: float, timeout: Optional[float]) -> GenerationSlot:
+        """Start a request that waited since start; the caller holds the condition."""
+        waited = time.monotonic() - start
+        self._active += 1
+        self.admitted += 1
+        self._waits.append(waited)
+        return GenerationSlot(self, None if timeout is None else timeout - waited)
+
+    def _release(self, service_seconds: float) -> None:
+        """Free a slot and hand it to the next queued request."""
+        with self._condition:
+            self._active -= 1
+            self._services.append(service_seconds)
+            self._dispatch()
+
+    def _retry_after(self) -> int:
+        """Estimate in whole seconds when a rejected request could be admitted."""
+        if not self._services:
+            return 1
+        mean_service = sum(self._services) / len(self._services)
+        return max(1, math.ceil(mean_service * (len(self._waiting) + 1) / self.max_concurrent))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, admission counters and recent wait and service times."""
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "running": self._active,
+                "queued": len(self._waiting),
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "wait_seconds": _summary(self._waits),
+                "service_seconds": _summary(self._services),
+            }
+
+
+def _summary(values: Deque[float]) -> Dict[str, float]:
+    """Return the mean, median, 95th percentile and maximum of values."""
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def _resolve(future: "asyncio.Future") -> None:
+    """Mark a waiter's future done, unless it was cancelled meanwhile."""
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,14 @@
+"""Document ingest module."""
+
+from .indexer import Indexer
+from .pipeline import IngestPipeline, StageStats
+from .registry import DocumentRegistry, fingerprint_file, fingerprint_text
+
+__all__ = [
+    "Indexer",
+    "IngestPipeline",
+    "StageStats",
+    "DocumentRegistry",
+    "fingerprint_file",
+    "fingerprint_text",
+]
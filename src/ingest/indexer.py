@@ -0,0 +1,368 @@
+"""Incremental, content-addressed document indexing."""
+
+import json
+import os
+import shutil
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from src.ingest.pipeline import IngestPipeline, ProgressCallback
+from src.ingest.registry import DocumentRegistry, fingerprint_file, fingerprint_text
+from src.parse.chunker import chunk_stream
+from src.parse.pdf_parser import iter_pdf_pages_parallel
+from src.parse.text_cleaner import clean_pages
+
+if TYPE_CHECKING:
+    from src.embed.embedding_model import EmbeddingModel
+    from src.embed.vector_store import FaissVectorStore
+
+# Layout of a saved indexer directory: CURRENT names the generation directory
+# holding the committed store and registry
+CURRENT_FILE = "CURRENT"
+GENERATION_PREFIX = "generation-"
+STORE_DIR = "store"
+REGISTRY_FILE = "registry.json"
+
+
+class Indexer:
+    """Index documents into a vector store, re-embedding only changed chunks.
+
+    Documents are identified by name and fingerprinted by content hash. A document
+    whose hash is unchanged is skipped entirely; for a changed document only chunks
+    with a new content hash are embedded, and chunks that disappeared are removed
+    from the store. Chunks are stored under their document's name, so a document
+    can be removed as a whole and searches can be restricted to documents by name
+    or metadata. Indexing calls are serialized, so one indexer may be shared by
+    several worker threads.
+    """
+
+    def __init__(
+        self,
+        embed_model: "EmbeddingModel",
+        store: "FaissVectorStore",
+        registry: Optional[DocumentRegistry] = None,
+        max_tokens: int = 300,
+        overlap: int = 50,
+        batch_size: int = 64,
+        parse_workers: Optional[int] = None,
+    ):
+        """Initialize the indexer with an embedding model and vector store.
+
+        Chunk sizes are measured with the model's tokenizer and capped at the number
+        of tokens the model reads, so chunks are never truncated when embedded.
+        """
+        self.embed_model = embed_model
+        self.store = store
+        self.registry = registry if registry is not None else DocumentRegistry()
+        self.max_tokens = min(max_tokens, embed_model.max_tokens)
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.parse_workers = parse_workers
+        self._lock = threading.Lock()
+
+    def index_file(
+        self,
+        path: str,
+        name: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Index a PDF file under a document name and return a summary."""
+        name = name or os.path.basename(path)
+        sha256 = fingerprint_file(path)
+        pages = iter_pdf_pages_parallel(path, workers=self.parse_workers)
+        return self.index_pages(name, pages, sha256, progress=progress, metadata=metadata)
+
+    def index_pages(
+        self,
+        name: str,
+        pages: Iterable[str],
+        sha256: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Index a document given as page texts and return a summary.
+
+        metadata, if given, replaces the document's metadata used by filtered
+        searches, even when its content is unchanged; metadata_updated in the
+        summary tells whether it changed.
+        """
+        with self._lock:
+            # Metadata is only applied once the content is indexed, so a failure changes nothing
+            result = self._index_pages(name, pages, sha256, progress)
+            result["metadata_updated"] = self._update_metadata(name, metadata)
+            return result
+
+    def remove_document(self, name: str) -> Optional[Dict[str, Any]]:
+        """Remove a document and all its chunks; return a summary, or None if it is not indexed."""
+        with self._lock:
+            record = self.registry.remove(name)
+            if record is None:
+                return None
+            # Chunks stored before documents were tracked are only known to the registry
+            removed = self.store.remove(list(record["chunks"].values()))
+            removed += self.store.remove_document(name)
+            return {
+                "document": name,
+                "status": "removed",
+                "chunks_count": 0,
+                "chunks_added": 0,
+                "chunks_removed": removed,
+                "metadata_updated": False,
+                "pipeline": None,
+            }
+
+    def _update_metadata(self, name: str, metadata: Optional[Dict[str, Any]]) -> bool:
+        """Replace a document's metadata and return whether it changed."""
+        if metadata is None or self.store.metadata(name) == metadata:
+            return False
+        self.store.set_metadata(name, metadata)
+        return True
+
+    def _index_pages(
+        self, name: str, pages: Iterable[str], sha256: Optional[str], progress: Optional[ProgressCallback]
+    ) -> Dict[str, Any]:
+        """Index a document while holding the indexing lock."""
+        if sha256 is None:
+            pages = list(pages)
+            sha256 = fingerprint_text("\n".join(pages))
+
+        record = self.registry.get(name)
+        if record is not None and record["sha256"] == sha256:
+            close = getattr(pages, "close", None)
+            if close is not None:
+                close()
+            return _unchanged_result(name, record)
+
+        previous: Dict[str, int] = record["chunks"] if record is not None else {}
+        chunks: Dict[str, int] = {}
+        pending = set()
+        added: List[int] = []
+
+        def is_new(chunk: str) -> bool:
+            key = fingerprint_text(chunk)
+            if key in chunks or key in pending:
+                return False
+            if key in previous:
+                chunks[key] = previous[key]
+                return False
+            pending.add(key)
+            return True
+
+        def add(embeddings: np.ndarray, texts: List[str]) -> None:
+            ids = self.store.add(embeddings, texts, documents=[name] * len(texts))
+            added.extend(ids)
+            for text, idx in zip(texts, ids):
+                chunks[fingerprint_text(text)] = idx
+
+        pipeline = IngestPipeline(
+            self.embed_model,
+            add,
+            max_tokens=self.max_tokens,
+            overlap=self.overlap,
+            batch_size=self.batch_size,
+            chunk_filter=is_new,
+            count_tokens=self.embed_model.count_tokens,
+            progress=progress,
+        )
+        try:
+            stats = pipeline.run(pages)
+            stale = [idx for key, idx in previous.items() if key not in chunks]
+            self.store.remove(stale)
+            self.registry.set(name, sha256, chunks)
+        except BaseException:
+            # Roll back partially added chunks so the store matches the registry
+            self.store.remove(added)
+            raise
+        return {
+            "document": name,
+            "status": "updated" if record is not None else "indexed",
+            "chunks_count": len(chunks),
+            "chunks_added": len(added),
+            "chunks_removed": len(stale),
+            "pipeline": stats,
+        }
+
+    def index_files(
+        self,
+        paths: List[str],
+        names: Optional[List[str]] = None,
+        batch_size: int = 512,
+        progress: Optional[ProgressCallback] = None,
+        metadata: Optional[List[Optional[Dict[str, Any]]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Index many PDF files at once and return one summary per file.
+
+        New chunks of all files are pooled into large embedding batches (texts shared
+        by several files are embedded once) and committed to the store in a single
+        write. A file that fails to parse is reported as failed without affecting
+        the others. metadata optionally gives each file's document metadata.
+        """
+        names = names or [os.path.basename(path) for path in paths]
+        if len(set(names)) != len(names):
+            raise ValueError("Document names in a batch must be unique")
+        if metadata is not None and len(metadata) != len(paths):
+            raise ValueError(f"Got {len(metadata)} metadata entries for {len(paths)} files")
+        with self._lock:
+            metadata = metadata or [None] * len(names)
+            results = self._index_files(paths, names, batch_size, progress or (lambda counter, amount: None))
+            for result, name, entry in zip(results, names, metadata):
+                result["metadata_updated"] = result["status"] != "failed" and self._update_metadata(name, entry)
+            return results
+
+    def _index_files(
+        self, paths: List[str], names: List[str], batch_size: int, progress: ProgressCallback
+    ) -> List[Dict[str, Any]]:
+        """Index many files while holding the indexing lock."""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(paths)
+        documents = []  # (position, name, sha256, record, reused chunks, new chunk keys)
+        texts: List[str] = []  # unique new chunk texts, in embedding order
+        positions: Dict[str, int] = {}  # chunk key -> position in texts
+        vectors: List[np.ndarray] = []
+        embedded = 0
+
+        for i, (path, name) in enumerate(zip(paths, names)):
+            try:
+                sha256 = fingerprint_file(path)
+                record = self.registry.get(name)
+                if record is not None and record["sha256"] == sha256:
+                    results[i] = _unchanged_result(name, record)
+                    continue
+                previous: Dict[str, int] = record["chunks"] if record is not None else {}
+                reused: Dict[str, int] = {}
+                new: Dict[str, None] = {}
+                for chunk in self._chunks(self._counted(path, progress)):
+                    key = fingerprint_text(chunk)
+                    if key in reused or key in new:
+                        continue
+                    if key in previous:
+                        reused[key] = previous[key]
+                        continue
+                    new[key] = None
+                    if key not in positions:
+                        positions[key] = len(texts)
+                        texts.append(chunk)
+                    if len(texts) - embedded >= batch_size:
+                        vectors.append(self.embed_model.embed(texts[embedded:embedded + batch_size]))
+                        embedded += batch_size
+                        progress("chunks_embedded", batch_size)
+                documents.append((i, name, sha256, record, reused, list(new)))
+            except Exception as e:
+                results[i] = {
+                    "document": name,
+                    "status": "failed",
+                    "error": str(e),
+                    "chunks_count": 0,
+                    "chunks_added": 0,
+                    "chunks_removed": 0,
+                    "pipeline": None,
+                }
+
+        if embedded < len(texts):
+            vectors.append(self.embed_model.embed(texts[embedded:]))
+            progress("chunks_embedded", len(texts) - embedded)
+
+        # Commit every new chunk of every file in one write
+        rows = [positions[key] for *_, new in documents for key in new]
+        owners = [name for _, name, *_, new in documents for _ in new]
+        ids: List[int] = []
+        if rows:
+            ids = self.store.add(np.concatenate(vectors)[rows], [texts[row] for row in rows], documents=owners)
+
+        offset = 0
+        stale: List[int] = []
+        for i, name, sha256, record, reused, new in documents:
+            chunks = dict(reused)
+            chunks.update(zip(new, ids[offset:offset + len(new)]))
+            offset += len(new)
+            previous = record["chunks"] if record is not None else {}
+            removed = [idx for key, idx in previous.items() if key not in chunks]
+            stale.extend(removed)
+            self.registry.set(name, sha256, chunks)
+            results[i] = {
+                "document": name,
+                "status": "updated" if record is not None else "indexed",
+                "chunks_count": len(chunks),
+                "chunks_added": len(new),
+                "chunks_removed": len(removed),
+                "pipeline": None,
+            }
+        self.store.remove(stale)
+        return results
+
+    def save(self, directory: str) -> None:
+        """Save the vector store and the document registry into directory.
+
+        Each save writes a new generation directory and commits it by replacing
+        CURRENT, so the store and registry change together and a crash leaves
+        the previous save intact. Chunk texts of the previous generation are
+        linked and appended to rather than rewritten.
+        """
+        with self._lock:
+            os.makedirs(directory, exist_ok=True)
+            # Never reuse the directory of a failed save: the store may still map files from it
+            generations = [_generation(name) for name in os.listdir(directory) if name.startswith(GENERATION_PREFIX)]
+            generation = max(generations + [_current_generation(directory) or 0]) + 1
+            target = os.path.join(directory, f"{GENERATION_PREFIX}{generation}")
+            os.makedirs(target)
+            self.store.save(os.path.join(target, STORE_DIR))
+            self.registry.save(os.path.join(target, REGISTRY_FILE))
+
+            tmp_path = os.path.join(directory, CURRENT_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"generation": generation}, f)
+            os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+
+            for name in os.listdir(directory):
+                if name.startswith(GENERATION_PREFIX) and name != os.path.basename(target):
+                    shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def load(self, directory: str) -> None:
+        """Load the vector store and the document registry last committed to directory."""
+        with self._lock:
+            target = os.path.join(directory, f"{GENERATION_PREFIX}{_current_generation(directory)}")
+            self.store.load(os.path.join(target, STORE_DIR))
+            self.registry.load(os.path.join(target, REGISTRY_FILE))
+
+    @staticmethod
+    def is_saved(directory: str) -> bool:
+        """Return whether directory holds a committed saved index."""
+        return _current_generation(directory) is not None
+
+    def _counted(self, path: str, progress: ProgressCallback) -> Iterator[str]:
+        """Yield the pages of a PDF file, reporting each parsed page."""
+        for page in iter_pdf_pages_parallel(path, workers=self.parse_workers):
+            progress("pages_parsed", 1)
+            yield page
+
+    def _chunks(self, pages: Iterable[str]) -> Iterator[str]:
+        """Clean and chunk a stream of pages."""
+        return chunk_stream(clean_pages(pages), self.max_tokens, self.overlap, self.embed_model.count_tokens)
+
+
+def _current_generation(directory: str) -> Optional[int]:
+    """Return the generation committed to a saved indexer directory, or None if there is none."""
+    path = os.path.join(directory, CURRENT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["generation"]
+
+
+def _generation(name: str) -> int:
+    """Return the generation number of a generation directory name."""
+    return int(name[len(GENERATION_PREFIX):])
+
+
+def _unchanged_result(name: str, record: dict) -> Dict[str, Any]:
+    """Return the summary of a document skipped because its content is unchanged."""
+    return {
+        "document": name,
+        "status": "unchanged",
+        "chunks_count": len(record["chunks"]),
+        "chunks_added": 0,
+        "chunks_removed": 0,
+        "pipeline": None,
+    }
@@ -0,0 +1,111 @@
+"""Background job queue for long-running indexing work."""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+    """A unit of background work with progress counters and a final result."""
+
+    def __init__(self, name: Optional[str] = None):
+        """Initialize a queued job."""
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.status = "queued"
+        self.progress: Dict[str, int] = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def advance(self, counter: str, amount: int = 1) -> None:
+        """Increase a progress counter."""
+        with self._lock:
+            self.progress[counter] = self.progress.get(counter, 0) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the job state as a JSON-serializable dict."""
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": progress,
+            "result": self.result,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Run jobs on a worker pool and keep their state for status queries.
+
+    Finished jobs are kept for lookup until more than max_finished jobs have
+    completed, after which the oldest are forgotten.
+    """
+
+    def __init__(self, max_workers: int = 1, max_finished: int = 1000):
+        """Initialize the worker pool."""
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docrag-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable[[Job], Any], name: Optional[str] = None) -> Job:
+        """Queue func(job) for execution and return the job immediately."""
+        job = Job(name)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job by id, or None if it is unknown."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of jobs per status."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts: Dict[str, int] = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pool."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> Any:
+        """Execute a job and record its outcome."""
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = func(job)
+            job.status = "succeeded"
+            return job.result
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            raise
+        finally:
+            job.finished_at = time.time()
+            self._forget_old()
+
+    def _forget_old(self) -> None:
+        """Drop the oldest finished jobs beyond max_finished."""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+            for job_id in finished[: max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job_id]
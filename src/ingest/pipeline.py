@@ -0,0 +1,241 @@
+"""Staged ingest pipeline with bounded queues between stages."""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from src.embed.embedding_model import EmbeddingModel
+from src.parse.chunker import TokenCounter, chunk_stream
+from src.parse.text_cleaner import clean_pages
+
+_DONE = object()
+
+ProgressCallback = Callable[[str, int], None]
+
+
+class _Cancelled(Exception):
+    """Raised inside a stage when another stage has failed."""
+
+
+class StageStats:
+    """Throughput and queue statistics for one pipeline stage."""
+
+    def __init__(self, name: str, inbox: Optional[queue.Queue] = None):
+        """Initialize counters for a stage reading from inbox."""
+        self.name = name
+        self.inbox = inbox
+        self.items_in = 0
+        self.items_out = 0
+        self.wait_seconds = 0.0
+        self.wall_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the stage statistics as a JSON-serializable dict."""
+        busy = max(self.wall_seconds - self.wait_seconds, 0.0)
+        return {
+            "name": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_seconds": round(busy, 4),
+            "wait_seconds": round(self.wait_seconds, 4),
+            "items_per_second": round(self.items_out / busy, 2) if busy > 0 else None,
+            "utilization": round(busy / self.wall_seconds, 3) if self.wall_seconds > 0 else None,
+            "queue_depth": self.inbox.qsize() if self.inbox is not None else None,
+            "max_queue_depth": self.max_queue_depth if self.inbox is not None else None,
+            "queue_capacity": self.inbox.maxsize if self.inbox is not None else None,
+        }
+
+
+class IngestPipeline:
+    """Pipelined page extraction, chunking, embedding and storage.
+
+    Each stage runs in its own thread and hands work to the next through a bounded
+    queue, so embedding of early pages overlaps with extraction of later ones and
+    at most a few queues' worth of intermediate data is held in memory.
+    """
+
+    def __init__(
+        self,
+        embed_model: EmbeddingModel,
+        sink: Callable[[np.ndarray, List[str]], None],
+        max_tokens: int = 300,
+        overlap: int = 50,
+        batch_size: int = 64,
+        queue_size: int = 8,
+        chunk_filter: Optional[Callable[[str], bool]] = None,
+        count_tokens: Optional[TokenCounter] = None,
+        progress: Optional[ProgressCallback] = None,
+    ):
+        """Initialize the pipeline with an embedding model and a store sink.
+
+        chunk_filter, if given, is called on every chunk and only chunks for which
+        it returns True are embedded and stored. count_tokens measures chunk sizes
+        in tokenizer units instead of whitespace words. progress, if given, is called
+        as progress("pages_parsed", n) and progress("chunks_embedded", n).
+        """
+        self.embed_model = embed_model
+        self.sink = sink
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.chunk_filter = chunk_filter
+        self.count_tokens = count_tokens
+        self.progress = progress
+        self.stages: List[StageStats] = []
+        self._stop = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def run(self, pages: Iterable[str]) -> Dict[str, Any]:
+        """Ingest an iterable of page texts and return pipeline statistics."""
+        self._stop = threading.Event()
+        self._errors = []
+        self._chunks_total = 0
+        page_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        chunk_queue: queue.Queue = queue.Queue(maxsize=max(self.queue_size, 2 * self.batch_size))
+        batch_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        self.stages = [
+            StageStats("extract"),
+            StageStats("chunk", page_queue),
+            StageStats("embed", chunk_queue),
+            StageStats("store", batch_queue),
+        ]
+        extract, chunk, embed, store = self.stages
+
+        start = time.perf_counter()
+        threads = [
+            threading.Thread(target=self._run_stage, args=(extract, chunk, lambda _: self._extract(pages))),
+            threading.Thread(target=self._run_stage, args=(chunk, embed, self._chunk)),
+            threading.Thread(target=self._run_stage, args=(embed, store, self._embed)),
+            threading.Thread(target=self._run_stage, args=(store, None, self._store)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return {
+            "pages": extract.items_out,
+            "chunks": self._chunks_total,
+            "chunks_embedded": chunk.items_out,
+            "elapsed_seconds": round(time.perf_counter() - start, 4),
+            "stages": [stats.to_dict() for stats in self.stages],
+        }
+
+    def _extract(self, pages: Iterable[str]) -> Iterator[str]:
+        """Pull pages from the source, reporting progress."""
+        pages = iter(pages)
+        try:
+            for page in pages:
+                self._report("pages_parsed", 1)
+                yield page
+        finally:
+            close = getattr(pages, "close", None)
+            if close is not None:
+                close()
+
+    def _report(self, counter: str, amount: int) -> None:
+        """Forward a progress update to the callback, if any."""
+        if self.progress is not None:
+            self.progress(counter, amount)
+
+    def _chunk(self, pages: Iterator[str]) -> Iterator[str]:
+        """Clean pages and cut them into overlapping chunks."""
+        chunks = chunk_stream(clean_pages(pages), self.max_tokens, self.overlap, self.count_tokens)
+        for chunk in chunks:
+            self._chunks_total += 1
+            if self.chunk_filter is None or self.chunk_filter(chunk):
+                yield chunk
+
+    def _embed(self, chunks: Iterator[str]) -> Iterator[tuple]:
+        """Group chunks into batches and embed each batch."""
+        batch: List[str] = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                yield self._embed_batch(batch)
+                batch = []
+        if batch:
+            yield self._embed_batch(batch)
+
+    def _embed_batch(self, batch: List[str]) -> tuple:
+        """Embed one batch, reporting progress."""
+        embeddings = self.embed_model.embed(batch)
+        self._report("chunks_embedded", len(batch))
+        return embeddings, batch
+
+    def _store(self, batches: Iterator[tuple]) -> Iterator[int]:
+        """Hand embedded batches to the sink."""
+        for embeddings, texts in batches:
+            self.sink(embeddings, texts)
+            yield len(texts)
+
+    def _run_stage(
+        self,
+        stats: StageStats,
+        downstream: Optional[StageStats],
+        work: Callable[[Optional[Iterator[Any]]], Iterator[Any]],
+    ) -> None:
+        """Drive one stage until its input is exhausted or another stage fails."""
+        start = time.perf_counter()
+        items = None
+        try:
+            inputs = self._consume(stats) if stats.inbox is not None else None
+            items = work(inputs)
+            for item in items:
+                stats.items_out += 1
+                if stats.inbox is None:
+                    stats.items_in += 1
+                if downstream is not None:
+                    self._put(downstream, item, stats)
+            if downstream is not None:
+                self._put(downstream, _DONE, stats)
+        except _Cancelled:
+            pass
+        except BaseException as exc:
+            self._errors.append(exc)
+            self._stop.set()
+        finally:
+            # Release resources held by a partially consumed source (e.g. a process pool)
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            stats.wall_seconds = time.perf_counter() - start
+
+    def _consume(self, stats: StageStats) -> Iterator[Any]:
+        """Yield items from a stage's inbox until the upstream stage signals completion."""
+        inbox = stats.inbox
+        while True:
+            waited = time.perf_counter()
+            while True:
+                try:
+                    item = inbox.get(timeout=0.1)
+                    break
+                except queue.Empty:
+                    if self._stop.is_set():
+                        raise _Cancelled()
+            stats.wait_seconds += time.perf_counter() - waited
+            if item is _DONE:
+                return
+            stats.items_in += 1
+            yield item
+
+    def _put(self, downstream: StageStats, item: Any, stats: StageStats) -> None:
+        """Put an item on the downstream stage's bounded inbox, blocking while it is full."""
+        outbox = downstream.inbox
+        waited = time.perf_counter()
+        while True:
+            try:
+                outbox.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Cancelled()
+        stats.wait_seconds += time.perf_counter() - waited
+        downstream.max_queue_depth = max(downstream.max_queue_depth, outbox.qsize())
@@ -0,0 +1,61 @@
+"""Content fingerprints of indexed documents and their chunks."""
+
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+
+def fingerprint_file(path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint_text(text: str) -> str:
+    """Return the SHA-256 hex digest of a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DocumentRegistry:
+    """Registry mapping document names to their content hash and chunk ids.
+
+    Each document record stores the hash of the source file and, for every chunk,
+    the chunk's content hash together with the id it was stored under in the
+    vector store.
+    """
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self.documents: Dict[str, dict] = {}
+
+    def get(self, name: str) -> Optional[dict]:
+        """Return the record of a document, or None if it was never indexed."""
+        return self.documents.get(name)
+
+    def set(self, name: str, sha256: str, chunks: Dict[str, int]) -> None:
+        """Record a document's content hash and its chunk hash to id mapping."""
+        self.documents[name] = {"sha256": sha256, "chunks": dict(chunks)}
+
+    def remove(self, name: str) -> Optional[dict]:
+        """Forget a document and return its previous record."""
+        return self.documents.pop(name, None)
+
+    def __len__(self) -> int:
+        """Return the number of registered documents."""
+        return len(self.documents)
+
+    def save(self, path: str) -> None:
+        """Save the registry to a JSON file, replacing it atomically."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.documents, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> None:
+        """Load the registry from a JSON file."""
+        with open(path, "r", encoding="utf-8") as f:
+            self.documents = json.load(f)
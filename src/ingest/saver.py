@@ -0,0 +1,86 @@
+"""Debounced saving of an index that changes in bursts."""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+class DebouncedSaver:
+    """Run a save at most once per interval after changes are reported.
+
+    mark_dirty schedules a save interval seconds later on a background thread
+    unless one is already pending, so a burst of indexing jobs is written once
+    instead of once per job, and requests never wait for a save. Changes made
+    after the last completed save are lost if the process crashes before the
+    next one; flush (or close, at shutdown) saves pending changes at once. With
+    an interval of 0 every change is saved before mark_dirty returns.
+    """
+
+    def __init__(self, save: Callable[[], None], interval: float = 30.0):
+        """Initialize the saver with the function writing the index and the delay in seconds."""
+        self.save = save
+        self.interval = interval
+        self.saves = 0
+        self.last_saved: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._dirty = False
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def mark_dirty(self) -> None:
+        """Report a change to be saved."""
+        with self._lock:
+            self._dirty = True
+            if self.interval > 0 and self._timer is None:
+                self._timer = threading.Timer(self.interval, self._scheduled)
+                self._timer.daemon = True
+                self._timer.start()
+        if self.interval <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Save pending changes now; a failed save leaves them pending and raises."""
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            try:
+                self.save()
+            except BaseException as e:
+                with self._lock:
+                    self._dirty = True
+                    self.last_error = str(e)
+                raise
+            with self._lock:
+                self.saves += 1
+                self.last_saved = time.time()
+                self.last_error = None
+
+    def close(self) -> None:
+        """Cancel the pending timer and save pending changes."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return whether changes are pending, the number of saves and the last save time and error."""
+        with self._lock:
+            return {
+                "pending": self._dirty,
+                "saves": self.saves,
+                "last_saved": self.last_saved,
+                "last_error": self.last_error,
+            }
+
+    def _scheduled(self) -> None:
+        """Save on the timer thread; errors are kept for stats and retried with the next change."""
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass
@@ -1,8 +1,17 @@
 """Document parsing module."""
 
-from .pdf_parser import extract_text_from_pdf
-from .text_cleaner import clean_text
-from .chunker import chunk_text
-
-__all__ = ["extract_text_from_pdf", "clean_text", "chunk_text"]
+from .pdf_parser import extract_text_from_pdf, iter_pdf_pages, iter_pdf_pages_parallel
+from .text_cleaner import clean_pages, clean_text, iter_clean_text
+from .chunker import chunk_spans, chunk_stream, chunk_text
 
+__all__ = [
+    "extract_text_from_pdf",
+    "iter_pdf_pages",
+    "iter_pdf_pages_parallel",
+    "clean_text",
+    "clean_pages",
+    "iter_clean_text",
+    "chunk_text",
+    "chunk_spans",
+    "chunk_stream",
+]
@@ -1,19 +1,164 @@
 """Text chunking module for splitting documents into manageable pieces."""
 
-from typing import List
+import re
+from collections import deque
+from typing import Callable, Deque, Iterable, Iterator, List, Optional, Tuple
 
+Span = Tuple[int, int]
+TokenCounter = Callable[[List[str]], List[int]]
 
-def chunk_text(text: str, max_tokens: int = 300, overlap: int = 50) -> List[str]:
+_WORD = re.compile(r"\S+")
+
+
+class _SpanWindow:
+    """Sliding window over word spans that emits chunk spans.
+
+    A chunk holds as many consecutive words as fit in max_tokens; the next chunk
+    starts with the trailing words of the previous one that fit in overlap tokens.
+    A single word longer than max_tokens becomes a chunk on its own.
+    """
+
+    def __init__(self, max_tokens: int, overlap: int):
+        """Initialize an empty window."""
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.words: Deque[Tuple[int, int, int]] = deque()
+        self.total = 0
+
+    @property
+    def start(self) -> Optional[int]:
+        """Return the start offset of the current window, if any."""
+        return self.words[0][0] if self.words else None
+
+    def push(self, start: int, end: int, tokens: int) -> Optional[Span]:
+        """Add a word and return the span of a completed chunk, if any."""
+        span = None
+        if self.words and self.total + tokens > self.max_tokens:
+            span = (self.words[0][0], self.words[-1][1])
+            keep, kept = 0, 0
+            for word in reversed(self.words):
+                if kept + word[2] > self.overlap or keep + 1 >= len(self.words):
+                    break
+                kept += word[2]
+                keep += 1
+            while len(self.words) > keep:
+                self.total -= self.words.popleft()[2]
+            while self.words and self.total + tokens > self.max_tokens:
+                self.total -= self.words.popleft()[2]
+        self.words.append((start, end, tokens))
+        self.total += tokens
+        return span
+
+    def finish(self) -> Optional[Span]:
+        """Return the span of the last, partially filled chunk, if any."""
+        if not self.words:
+            return None
+        return (self.words[0][0], self.words[-1][1])
+
+
+def _count(words: List[str], count_tokens: Optional[TokenCounter]) -> List[int]:
+    """Count tokens of words, treating each whitespace word as one token by default."""
+    if count_tokens is None:
+        return [1] * len(words)
+    return count_tokens(words)
+
+
+def chunk_spans(
+    text: str,
+    max_tokens: int = 300,
+    overlap: int = 50,
+    count_tokens: Optional[TokenCounter] = None,
+    batch_size: int = 2048,
+) -> List[Span]:
+    """Return (start, end) character spans of overlapping chunks of text.
+
+    Sizes are measured with count_tokens, which receives batches of whitespace
+    words and returns their token counts (e.g. from the embedding model's
+    tokenizer). Without it every word counts as one token.
+    """
+    window = _SpanWindow(max_tokens, overlap)
+    spans: List[Span] = []
+    batch: List[Span] = []
+
+    def flush() -> None:
+        counts = _count([text[s:e] for s, e in batch], count_tokens)
+        for (s, e), tokens in zip(batch, counts):
+            span = window.push(s, e, tokens)
+            if span is not None:
+                spans.append(span)
+        batch.clear()
+
+    for match in _WORD.finditer(text):
+        batch.append(match.span())
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    last = window.finish()
+    if last is not None:
+        spans.append(last)
+    return spans
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = 300,
+    overlap: int = 50,
+    count_tokens: Optional[TokenCounter] = None,
+) -> List[str]:
     """Split text into overlapping chunks based on approximate token size."""
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + max_tokens
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        if end >= len(words):
-            break
-        start = end - overlap
-    return chunks
+    return [text[start:end] for start, end in chunk_spans(text, max_tokens, overlap, count_tokens)]
+
+
+def chunk_stream(
+    texts: Iterable[str],
+    max_tokens: int = 300,
+    overlap: int = 50,
+    count_tokens: Optional[TokenCounter] = None,
+    batch_size: int = 2048,
+) -> Iterator[str]:
+    """Chunk a stream of text pieces, yielding the same chunks as chunk_text on their concatenation.
+
+    Only the text of the current window and of words awaiting token counts is
+    buffered, so a page stream can be chunked without joining the whole document.
+    """
+    window = _SpanWindow(max_tokens, overlap)
+    buffer = ""
+    offset = 0  # absolute position of buffer[0]
+    scan = 0  # absolute position up to which words have been extracted
+    batch: List[Span] = []
+
+    def flush() -> List[str]:
+        nonlocal buffer, offset
+        counts = _count([buffer[s - offset:e - offset] for s, e in batch], count_tokens)
+        chunks = []
+        for (s, e), tokens in zip(batch, counts):
+            span = window.push(s, e, tokens)
+            if span is not None:
+                chunks.append(buffer[span[0] - offset:span[1] - offset])
+        batch.clear()
+        # Drop text that no chunk can start in any more
+        keep = window.start if window.start is not None else scan
+        buffer = buffer[keep - offset:]
+        offset = keep
+        return chunks
+
+    for text in texts:
+        buffer += text
+        end = offset + len(buffer)
+        for match in _WORD.finditer(buffer, scan - offset):
+            start, stop = match.start() + offset, match.end() + offset
+            if stop == end:
+                # The word may continue in the next piece
+                break
+            batch.append((start, stop))
+            scan = stop
+        if len(batch) >= batch_size:
+            yield from flush()
 
+    for match in _WORD.finditer(buffer, scan - offset):
+        batch.append((match.start() + offset, match.end() + offset))
+        scan = match.end() + offset
+    yield from flush()
+    last = window.finish()
+    if last is not None:
+        yield buffer[last[0] - offset:last[1] - offset]
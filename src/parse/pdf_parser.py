@@ -1,15 +1,60 @@
 """PDF parsing module for extracting text from PDF files."""
 
-from typing import List
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
 from pypdf import PdfReader
 
 
-def extract_text_from_pdf(path: str) -> str:
+def extract_text_from_pdf(path: str, workers: int = 1) -> str:
     """Extract raw text from a PDF file."""
-    reader = PdfReader(path)
-    pages = []
-    for page in reader.pages:
-        text = page.extract_text() or ""
-        pages.append(text)
+    if workers == 1:
+        pages = iter_pdf_pages(path)
+    else:
+        pages = iter_pdf_pages_parallel(path, workers=workers)
     return "\n".join(pages)
 
+
+def count_pdf_pages(path: str) -> int:
+    """Return the number of pages in a PDF file."""
+    return len(PdfReader(path).pages)
+
+
+def iter_pdf_pages(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the raw text of each page in [start, stop) in page order."""
+    reader = PdfReader(path)
+    for page in reader.pages[start:stop]:
+        yield page.extract_text() or ""
+
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[str]:
+    """Extract a range of pages inside a worker process."""
+    path, start, stop = task
+    return list(iter_pdf_pages(path, start, stop))
+
+
+def iter_pdf_pages_parallel(
+    path: str, workers: Optional[int] = None, pages_per_task: int = 16
+) -> Iterator[str]:
+    """Yield page texts in page order while page ranges are extracted by a process pool."""
+    workers = workers or os.cpu_count() or 1
+    num_pages = count_pdf_pages(path)
+    tasks = [
+        (path, start, min(start + pages_per_task, num_pages))
+        for start in range(0, num_pages, pages_per_task)
+    ]
+    if workers <= 1 or len(tasks) <= 1:
+        yield from iter_pdf_pages(path)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(tasks)))
+    futures = [executor.submit(_extract_page_range, task) for task in tasks]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stop pending ranges if the consumer abandons the generator early
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
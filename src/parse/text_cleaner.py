@@ -1,12 +1,54 @@
 """Text cleaning utilities for processing extracted text."""
 
 import re
+from typing import Iterable, Iterator
+
+# Only whitespace that actually changes is matched: newline runs, lone carriage
+# returns, space/tab runs and lone tabs. Single spaces and newlines are left alone,
+# which keeps the number of replacements low on typical extracted text.
+_WHITESPACE_TO_COLLAPSE = re.compile(r"[\r\n]{2,}|\r|[ \t]{2,}|\t")
+
+
+def _collapse(match: "re.Match[str]") -> str:
+    """Return the single character a whitespace run collapses to."""
+    return "\n" if match.group()[0] in "\r\n" else " "
 
 
 def clean_text(text: str) -> str:
     """Clean raw text from PDFs."""
-    text = text.replace("\r", "\n")
-    text = re.sub(r"\n+", "\n", text)
-    text = re.sub(r"[ \t]+", " ", text)
-    return text.strip()
+    return _WHITESPACE_TO_COLLAPSE.sub(_collapse, text).strip()
+
+
+def iter_clean_text(pieces: Iterable[str]) -> Iterator[str]:
+    """Clean a stream of text pieces without joining them.
+
+    The concatenation of the yielded strings equals clean_text of the concatenated
+    input. Trailing whitespace of each piece is held back and merged with the next
+    one, so whitespace runs spanning piece boundaries collapse correctly.
+    """
+    carry = ""
+    started = False
+    for piece in pieces:
+        text = carry + piece if carry else piece
+        body = text.rstrip()
+        carry = text[len(body):]
+        if not started:
+            body = body.lstrip()
+            if not body:
+                carry = ""
+                continue
+            started = True
+        if body:
+            yield _WHITESPACE_TO_COLLAPSE.sub(_collapse, body)
+
+
+def clean_pages(pages: Iterable[str]) -> Iterator[str]:
+    """Clean page texts as clean_text would clean the pages joined by newlines."""
+
+    def with_separators() -> Iterator[str]:
+        for i, page in enumerate(pages):
+            if i:
+                yield "\n"
+            yield page
 
+    return iter_clean_text(with_separators())
@@ -1,6 +1,7 @@
 """Retrieval module for RAG operations."""
 
+from .cache import LRUCache
+from .reranker import CrossEncoderReranker, Reranker
 from .retriever import Retriever
 
-__all__ = ["Retriever"]
-
+__all__ = ["CrossEncoderReranker", "LRUCache", "Reranker", "Retriever"]
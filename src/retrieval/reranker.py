@@ -0,0 +1,113 @@
+"""Cross-encoder reranking of retrieved chunks under a time budget."""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class Reranker(ABC):
+    """Base class scoring (query, chunk) pairs in batches within a time budget.
+
+    Subclasses implement score_pairs. The per-pair scoring time is tracked across
+    calls, so scoring is abandoned as soon as the remaining pairs are predicted
+    not to fit in the budget, instead of after spending it.
+    """
+
+    def __init__(self, batch_size: int = 32):
+        """Initialize the reranker with the number of pairs scored per model call."""
+        self.batch_size = batch_size
+        self.reranked = 0
+        self.fallbacks = 0
+        self._seconds_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """Return one relevance score per (query, chunk) pair, higher is more relevant."""
+
+    def rerank(
+        self,
+        queries: List[str],
+        candidates: List[List[Tuple[str, float]]],
+        k: int,
+        budget: Optional[float] = None,
+    ) -> Optional[List[List[Tuple[str, float]]]]:
+        """Reorder each query's candidates by relevance score and keep the best k.
+
+        Returns None if scoring all pairs would exceed budget seconds; the caller
+        then keeps the original order.
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        pairs = [(query, text) for query, ranked in zip(queries, candidates) for text, _ in ranked]
+        scores: List[float] = []
+        for start in range(0, len(pairs), self.batch_size):
+            batch = pairs[start:start + self.batch_size]
+            began = time.monotonic()
+            if deadline is not None and self._seconds_per_pair is not None:
+                if began + self._seconds_per_pair * (len(pairs) - start) > deadline:
+                    # Decay the estimate so a one-off slow call (such as model
+                    # warm-up) does not disable reranking for good
+                    with self._lock:
+                        self._seconds_per_pair *= 0.9
+                    return self._fallback()
+            scores.extend(np.asarray(self.score_pairs(batch), dtype="float64").tolist())
+            finished = time.monotonic()
+            self._observe((finished - began) / len(batch))
+            if deadline is not None and finished > deadline:
+                return self._fallback()
+
+        results = []
+        offset = 0
+        for ranked in candidates:
+            scored = [(text, scores[offset + i]) for i, (text, _) in enumerate(ranked)]
+            offset += len(ranked)
+            scored.sort(key=lambda item: item[1], reverse=True)
+            results.append(scored[:k])
+        with self._lock:
+            self.reranked += len(queries)
+        return results
+
+    def warm_up(self) -> None:
+        """Score one pair, so the first rerank is not slowed down by lazy initialization."""
+        self.score_pairs([("warm-up", "warm-up")])
+
+    def stats(self) -> Dict[str, float]:
+        """Return how often reranking completed or fell back to vector order."""
+        return {
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "seconds_per_pair": self._seconds_per_pair,
+        }
+
+    def _observe(self, seconds_per_pair: float) -> None:
+        """Update the moving average of the scoring time per pair."""
+        with self._lock:
+            if self._seconds_per_pair is None:
+                self._seconds_per_pair = seconds_per_pair
+            else:
+                self._seconds_per_pair = 0.8 * self._seconds_per_pair + 0.2 * seconds_per_pair
+
+    def _fallback(self) -> None:
+        """Record a rerank abandoned because of the time budget."""
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+
+class CrossEncoderReranker(Reranker):
+    """Reranker backed by a local sentence-transformers cross-encoder."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32):
+        """Load the cross-encoder model."""
+        from sentence_transformers import CrossEncoder
+
+        super().__init__(batch_size=batch_size)
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+
+    def score_pairs(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        """Score (query, chunk) pairs with the cross-encoder in one batch."""
+        return np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False))
@@ -1,24 +1,186 @@
 """RAG retriever module for querying document chunks."""
 
-from typing import List
+import json
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import numpy as np
 
-from src.embed.embedding_model import EmbeddingModel
-from src.embed.vector_store import FaissVectorStore
+from src.embed.chunk_documents import Where
+from src.retrieval.cache import LRUCache
+from src.retrieval.reranker import Reranker
+
+if TYPE_CHECKING:
+    from src.embed.embedding_model import EmbeddingModel
+    from src.embed.vector_store import FaissVectorStore
+
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+
+def reciprocal_rank_fusion(rankings: List[List[Tuple[int, float]]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked (chunk id, score) lists by summing 1 / (k + rank) per chunk, best first."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, (chunk_id, _) in enumerate(ranking, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
 
 
 class Retriever:
-    """Retriever for finding relevant document chunks."""
+    """Retriever for finding relevant document chunks.
+
+    In "dense" mode chunks are ranked by embedding distance. In "hybrid" mode the
+    top candidates of the dense search and of the store's BM25 keyword index are
+    fused with reciprocal rank fusion, so exact identifiers such as part numbers
+    are found even when their embedding is not close to the query's.
+
+    With a reranker, rerank_candidates chunks are fetched per query and reordered
+    by the reranker, which must finish within rerank_budget seconds per call;
+    otherwise the first-stage order is kept.
+
+    Retrieval can be restricted to named documents and to documents whose
+    metadata matches a filter, as in FaissVectorStore.search.
+
+    Query embeddings and top-k results are cached. Cached results are dropped
+    whenever the vector store version changes, so they never outlive the chunks
+    they were computed from.
+    """
 
-    def __init__(self, embed_model: EmbeddingModel, store: FaissVectorStore):
-        """Initialize retriever with embedding model and vector store."""
+    def __init__(
+        self,
+        embed_model: "EmbeddingModel",
+        store: "FaissVectorStore",
+        cache_size: int = 1024,
+        cache_ttl: Optional[float] = None,
+        mode: str = "dense",
+        candidates: int = 50,
+        rrf_k: int = 60,
+        reranker: Optional[Reranker] = None,
+        rerank_candidates: int = 20,
+        rerank_budget: Optional[float] = None,
+    ):
+        """Initialize retriever with embedding model, vector store, cache limits and ranking mode."""
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        if mode == "hybrid" and store.keywords is None:
+            raise ValueError("Hybrid retrieval needs a vector store with a keyword index")
         self.embed_model = embed_model
         self.store = store
+        self.mode = mode
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget = rerank_budget
+        self.embedding_cache = LRUCache(cache_size, cache_ttl)
+        self.result_cache = LRUCache(cache_size, cache_ttl)
+        self._cached_version = store.version
 
-    def retrieve(self, query: str, k: int = 5) -> List[str]:
+    def retrieve(
+        self,
+        query: str,
+        k: int = 5,
+        rerank_budget: Optional[float] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[str]:
         """Retrieve top-k relevant chunks for a query."""
-        query_emb = self.embed_model.embed([query])
-        results = self.store.search(query_emb, k=k)
-        return [text for text, _ in results]
+        ranked = self.retrieve_batch([query], k=k, rerank_budget=rerank_budget, documents=documents, where=where)[0]
+        return [text for text, _ in ranked]
+
+    def retrieve_batch(
+        self,
+        queries: List[str],
+        k: int = 5,
+        rerank_budget: Optional[float] = None,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """Retrieve top-k chunks for many queries with one embedding call and one index search.
+
+        Returns, for each query, its (text, score) pairs ranked from most to least
+        relevant. In dense mode the score is the squared L2 distance (lower is
+        closer); in hybrid mode it is the fused reciprocal-rank score (higher is better);
+        after reranking it is the reranker's relevance score (higher is better).
+        rerank_budget overrides the retriever's default budget for this call.
+        documents and where restrict the results to chunks of the named
+        documents and of documents whose metadata matches.
+        """
+        version = self.store.version
+        if version != self._cached_version:
+            self.result_cache.clear()
+            self._cached_version = version
+
+        scope = (tuple(documents) if documents is not None else None, json.dumps(where, sort_keys=True))
+        results: List[Optional[List[Tuple[str, float]]]] = [
+            self.result_cache.get((version, query, k, scope)) for query in queries
+        ]
+        missing = list(dict.fromkeys(query for query, ranked in zip(queries, results) if ranked is None))
+        if missing:
+            ranked_lists, reranked = self._search(missing, k, rerank_budget, documents, where)
+            searched = dict(zip(missing, ranked_lists))
+            # Results that fell back to first-stage order are not cached
+            if reranked:
+                for query, ranked in searched.items():
+                    self.result_cache.put((version, query, k, scope), ranked)
+            results = [searched[query] if ranked is None else ranked for query, ranked in zip(queries, results)]
+        return [list(ranked) for ranked in results]
+
+    def _search(
+        self,
+        queries: List[str],
+        k: int,
+        rerank_budget: Optional[float],
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> Tuple[List[List[Tuple[str, float]]], bool]:
+        """Rank chunks for queries that are not cached; also return whether reranking completed."""
+        if self.reranker is None:
+            return self._first_stage(queries, k, documents, where), True
+        candidates = self._first_stage(queries, max(k, self.rerank_candidates), documents, where)
+        budget = rerank_budget if rerank_budget is not None else self.rerank_budget
+        reranked = self.reranker.rerank(queries, candidates, k, budget=budget)
+        if reranked is None:
+            return [ranked[:k] for ranked in candidates], False
+        return reranked, True
+
+    def _first_stage(
+        self,
+        queries: List[str],
+        k: int,
+        documents: Optional[List[str]] = None,
+        where: Optional[Where] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """Rank chunks by embedding distance, or by fused dense and keyword ranks."""
+        if self.mode == "dense":
+            return self.store.search_batch(self.embed_queries(queries), k=k, documents=documents, where=where)
+
+        depth = max(k, self.candidates)
+        dense = self.store.search_ids_batch(self.embed_queries(queries), k=depth, documents=documents, where=where)
+        results = []
+        for query, dense_hits in zip(queries, dense):
+            keyword_hits = self.store.keyword_search(query, k=depth, documents=documents, where=where)
+            fused = reciprocal_rank_fusion([dense_hits, keyword_hits], k=self.rrf_k)[:k]
+            results.append([(self.store.text(chunk_id), score) for chunk_id, score in fused])
+        return results
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries, running the model once for those not in the embedding cache."""
+        vectors = [self.embedding_cache.get(query) for query in queries]
+        missing = list(dict.fromkeys(query for query, vector in zip(queries, vectors) if vector is None))
+        if missing:
+            embedded = dict(zip(missing, np.asarray(self.embed_model.embed(missing), dtype="float32")))
+            for query, vector in embedded.items():
+                self.embedding_cache.put(query, vector)
+            vectors = [embedded[query] if vector is None else vector for query, vector in zip(queries, vectors)]
+        if not vectors:
+            return np.zeros((0, self.store.dimension), dtype="float32")
+        return np.stack(vectors)
+
+    def cache_stats(self) -> dict:
+        """Return hit rates of the query-embedding and result caches."""
+        return {"query_embeddings": self.embedding_cache.stats(), "results": self.result_cache.stats()}
 
+    def rerank_stats(self) -> Optional[dict]:
+        """Return reranker counters, or None without a reranker."""
+        return self.reranker.stats() if self.reranker is not None else None
@@ -1,5 +1,9 @@
 """Streamlit UI for DocRAG system."""
 
+import json
+import time
+from typing import Iterator, Optional, Tuple
+
 import requests
 import streamlit as st
 
@@ -52,13 +56,16 @@ def generate_page() -> None:
                 try:
                     files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
                     response = requests.post(
-                        f"{API_BASE_URL}/index",
+                        f"{API_BASE_URL}/index/jobs",
                         files=files,
                         timeout=120,
                     )
                     response.raise_for_status()
-                    data = response.json()
-                    st.success(f"Document indexed successfully! ({data['chunks_count']} chunks)")
+                    job = wait_for_job(response.json()["job_id"])
+                    if job["status"] == "succeeded":
+                        st.success(f"Document indexed successfully! ({job['result']['chunks_count']} chunks)")
+                    else:
+                        st.error(f"Error indexing document: {job['error']}")
                 except requests.exceptions.ConnectionError:
                     st.error(
                         "**Cannot connect to API server.**\n\n"
@@ -110,104 +117,157 @@ def generate_page() -> None:
             st.error("Cannot generate document: API server is not available.")
             return
 
-        with st.spinner("Generating document... This may take several minutes..."):
+        try:
+            response = requests.post(
+                f"{API_BASE_URL}/generate/stream",
+                json={"query": query},
+                stream=True,
+                # Only the wait between two events is bounded; generation can take minutes in total
+                timeout=(5, 300),
+            )
+            response.raise_for_status()
+
+            st.divider()
+            st.subheader("Generated Document")
+            status = st.empty()
+            status.info("Retrieving context and waiting for the model...")
+            document = st.empty()
+            text = ""
+            for event, data in read_events(response):
+                if event == "context":
+                    status.info(
+                        f"Generating from {data['chunks']} retrieved chunks packed into {data['passages']} "
+                        f"passages ({data['tokens_saved']} duplicated or over-budget words left out)..."
+                    )
+                elif event == "token":
+                    text += data["text"]
+                    document.markdown(text)
+                elif event == "error":
+                    status.empty()
+                    show_generation_error(data["status"], data["detail"])
+                elif event == "done":
+                    status.empty()
+                    document.text_area("Document content", value=data["document"], height=400, disabled=True)
+                    show_validation(data["validation"])
+
+        except requests.exceptions.ConnectionError:
+            st.error(
+                "**Cannot connect to API server.**\n\n"
+                "Please make sure the API is running on http://localhost:8000\n\n"
+                "Start it with:\n"
+                "```bash\n"
+                "uvicorn src.api.app:app --reload\n"
+                "```"
+            )
+        except requests.exceptions.Timeout:
+            st.error(
+                "**Request timed out.**\n\n"
+                "The model stopped producing output. Possible causes:\n"
+                "- Ollama model is still loading\n"
+                "- The model is too slow for your hardware\n"
+                "- The prompt is too long\n\n"
+                "**Solutions:**\n"
+                "- Wait a bit longer and try again\n"
+                "- Use a smaller/faster model (e.g., llama3:8b instead of llama3)\n"
+                "- Try a shorter query\n"
+                "- Check if Ollama is running: `ollama list`"
+            )
+        except requests.exceptions.HTTPError as e:
             try:
-                response = requests.post(
-                    f"{API_BASE_URL}/generate",
-                    json={"query": query},
-                    timeout=300,
-                )
-                response.raise_for_status()
-                data = response.json()
-
-                # Display generated document
-                st.divider()
-                st.subheader("Generated Document")
-                st.text_area(
-                    "Document content",
-                    value=data["document"],
-                    height=400,
-                    disabled=True,
-                )
-
-                # Display validation report
-                st.divider()
-                st.subheader("Validation Report")
-                validation = data["validation"]
-
-                # Summary
-                if validation.get("all_sections_present", False):
-                    st.success("All required sections are present")
-                else:
-                    st.warning("Some required sections are missing")
+                error_detail = e.response.json().get("detail", str(e))
+            except Exception:
+                error_detail = str(e)
+            show_generation_error(e.response.status_code, error_detail)
+        except requests.exceptions.RequestException as e:
+            st.error(f"Error generating document: {e}")
+
+
+def read_events(response: requests.Response) -> Iterator[Tuple[str, dict]]:
+    """Parse a server-sent event stream into (event, data) pairs as events arrive."""
+    event, data = None, []
+    for line in response.iter_lines(decode_unicode=True):
+        if line:
+            field, _, value = line.partition(": ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+        elif event is not None:
+            yield event, json.loads("\n".join(data))
+            event, data = None, []
+
+
+def show_generation_error(status_code: Optional[int], error_detail: str) -> None:
+    """Show a generation error with hints matching its status code."""
+    if status_code == 504:
+        st.error(
+            f"**Generation Timeout**\n\n"
+            f"{error_detail}\n\n"
+            "**Possible solutions:**\n"
+            "- Use a smaller/faster model (e.g., `llama3:8b`)\n"
+            "- Try a shorter query\n"
+            "- Check if Ollama is running: `ollama list`\n"
+            "- Wait a bit and try again"
+        )
+    elif status_code == 429 or (status_code == 503 and "generation queue" in error_detail):
+        st.warning(
+            f"**Server Busy**\n\n"
+            f"{error_detail}\n\n"
+            "Other documents are being generated. Please try again in a moment."
+        )
+    elif status_code == 503:
+        st.error(
+            f"**Ollama Not Found**\n\n"
+            f"{error_detail}\n\n"
+            "**Installation:**\n"
+            "1. Download from https://ollama.ai/\n"
+            "2. Install and add to PATH\n"
+            "3. Pull a model: `ollama pull llama3`\n"
+            "4. Restart the API"
+        )
+    else:
+        st.error(f"Error generating document: {error_detail}")
 
-                # Detailed section status
-                st.write("**Section Status:**")
-                sections = validation.get("sections", {})
-                for section, present in sections.items():
-                    status = "[OK]" if present else "[MISSING]"
-                    st.markdown(f"- {status} **{section}**")
 
-                # Full JSON report
-                with st.expander("View full validation report (JSON)"):
-                    st.json(validation)
-
-            except requests.exceptions.ConnectionError:
-                st.error(
-                    "**Cannot connect to API server.**\n\n"
-                    "Please make sure the API is running on http://localhost:8000\n\n"
-                    "Start it with:\n"
-                    "```bash\n"
-                    "uvicorn src.api.app:app --reload\n"
-                    "```"
-                )
-            except requests.exceptions.Timeout:
-                st.error(
-                    "**Request timed out.**\n\n"
-                    "Generation can take several minutes. Possible causes:\n"
-                    "- Ollama model is still loading\n"
-                    "- The model is too slow for your hardware\n"
-                    "- The prompt is too long\n\n"
-                    "**Solutions:**\n"
-                    "- Wait a bit longer and try again\n"
-                    "- Use a smaller/faster model (e.g., llama3:8b instead of llama3)\n"
-                    "- Try a shorter query\n"
-                    "- Check if Ollama is running: `ollama list`"
-                )
-            except requests.exceptions.HTTPError as e:
-                error_detail = "Unknown error"
-                status_code = None
-                try:
-                    error_data = e.response.json()
-                    error_detail = error_data.get("detail", str(e))
-                    status_code = e.response.status_code
-                except Exception:
-                    error_detail = str(e)
-                
-                if status_code == 504:
-                    st.error(
-                        f"**Generation Timeout**\n\n"
-                        f"{error_detail}\n\n"
-                        "**Possible solutions:**\n"
-                        "- Use a smaller/faster model (e.g., `llama3:8b`)\n"
-                        "- Try a shorter query\n"
-                        "- Check if Ollama is running: `ollama list`\n"
-                        "- Wait a bit and try again"
-                    )
-                elif status_code == 503:
-                    st.error(
-                        f"**Ollama Not Found**\n\n"
-                        f"{error_detail}\n\n"
-                        "**Installation:**\n"
-                        "1. Download from https://ollama.ai/\n"
-                        "2. Install and add to PATH\n"
-                        "3. Pull a model: `ollama pull llama3`\n"
-                        "4. Restart the API"
-                    )
-                else:
-                    st.error(f"Error generating document: {error_detail}")
-            except requests.exceptions.RequestException as e:
-                st.error(f"Error generating document: {e}")
+def show_validation(validation: dict) -> None:
+    """Show a validation report of a generated document."""
+    st.divider()
+    st.subheader("Validation Report")
+
+    # Summary
+    if validation.get("all_sections_present", False):
+        st.success("All required sections are present")
+    else:
+        st.warning("Some required sections are missing")
+
+    # Detailed section status
+    st.write("**Section Status:**")
+    sections = validation.get("sections", {})
+    for section, present in sections.items():
+        status = "[OK]" if present else "[MISSING]"
+        st.markdown(f"- {status} **{section}**")
+
+    # Full JSON report
+    with st.expander("View full validation report (JSON)"):
+        st.json(validation)
+
+
+def wait_for_job(job_id: str, poll_interval: float = 0.5) -> dict:
+    """Poll a background job until it finishes, showing its progress."""
+    status = st.empty()
+    while True:
+        response = requests.get(f"{API_BASE_URL}/jobs/{job_id}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+        progress = job["progress"]
+        status.info(
+            f"Job {job['status']}: {progress.get('pages_parsed', 0)} pages parsed, "
+            f"{progress.get('chunks_embedded', 0)} chunks embedded"
+        )
+        if job["status"] not in ("queued", "running"):
+            status.empty()
+            return job
+        time.sleep(poll_interval)
 
 
 def validate_page() -> None:
@@ -0,0 +1,138 @@
+"""Shared fixtures for unit tests."""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+class FakeEmbeddingModel:
+    """Deterministic stand-in for EmbeddingModel that needs no model download."""
+
+    model_name = "fake-model"
+    max_tokens = 10_000
+
+    def __init__(self, dimension: int = 16):
+        """Initialize the fake model."""
+        self.dimension = dimension
+        self.calls: List[List[str]] = []
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count whitespace words as tokens."""
+        return [len(text.split()) for text in texts]
+
+    def warm_up(self) -> None:
+        """Do nothing; the fake model needs no warm-up."""
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as unit vectors seeded from their hash."""
+        self.calls.append(list(texts))
+        vectors = np.zeros((len(texts), self.dimension), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).standard_normal(self.dimension)
+            vectors[i] = vector / np.linalg.norm(vector)
+        return vectors
+
+
+@pytest.fixture
+def fake_embed_model() -> FakeEmbeddingModel:
+    """Provide a fake embedding model."""
+    return FakeEmbeddingModel()
+
+
+def write_pdf(path: Path, pages: List[str]) -> Path:
+    """Write a PDF with one line of text per page."""
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(str(path))
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+    return path
+
+
+@pytest.fixture
+def make_pdf(tmp_path) -> Callable[[str, List[str]], Path]:
+    """Provide a factory writing PDFs into a temporary directory."""
+    return lambda name, pages: write_pdf(tmp_path / name, pages)
+
+
+class StubOllamaServer:
+    """Local HTTP server answering Ollama's /api/generate like a tiny model would.
+
+    Streaming requests get the response one word per message.
+    """
+
+    def __init__(self):
+        """Start the server on a free port in a background thread."""
+        self.requests: List[Dict[str, Any]] = []
+        self.connections: Set[Tuple[str, int]] = set()
+        self.response = "Generated document."
+        self.status = 200
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.requests.append(body)
+                stub.connections.add(self.client_address)
+                if stub.status == 200 and body.get("stream"):
+                    self.stream(body)
+                    return
+                if stub.status == 200:
+                    payload = {"model": body["model"], "response": stub.response, "done": True}
+                else:
+                    payload = {"error": "model not found"}
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self, body):
+                # Newline-delimited JSON messages, one per word, until the connection closes
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for piece in re.findall(r"\s*\S+", stub.response):
+                    message = {"model": body["model"], "response": piece, "done": False}
+                    self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+                self.wfile.write(json.dumps({"model": body["model"], "response": "", "done": True}).encode("utf-8"))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        """Stop the server."""
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama_stub():
+    """Provide a running stub Ollama server."""
+    stub = StubOllamaServer()
+    yield stub
+    stub.close()
@@ -0,0 +1,364 @@
+"""Unit tests for the API using a fake embedding model."""
+
+import importlib
+import json
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.generation.llm_client import OllamaClient
+from src.generation.scheduler import GenerationScheduler
+
+# src.api re-exports the FastAPI instance as "app", which shadows the module attribute
+api = importlib.import_module("src.api.app")
+
+
+@pytest.fixture
+def pdf_bytes(make_pdf) -> Callable[..., bytes]:
+    """Provide a factory building a small PDF and returning its bytes."""
+
+    def build(num_pages: int = 3, name: str = "upload.pdf") -> bytes:
+        pages = [f"Page {i} requirement REQ-{i:03d} of {name} shall hold." for i in range(num_pages)]
+        return make_pdf(name, pages).read_bytes()
+
+    return build
+
+
+@pytest.fixture
+def client(fake_embed_model, monkeypatch) -> TestClient:
+    """Provide a test client with fresh global components."""
+    monkeypatch.setattr(api, "embed_model", fake_embed_model)
+    monkeypatch.setattr(api, "vector_store", None)
+    monkeypatch.setattr(api, "retriever", None)
+    monkeypatch.setattr(api, "llm_client", OllamaClient())
+    monkeypatch.setattr(api, "response_cache", None)
+    monkeypatch.setattr(api, "llm_scheduler", None)
+    monkeypatch.setattr(api, "indexer", None)
+    monkeypatch.setattr(api, "index_saver", None)
+    monkeypatch.setattr(api, "last_ingest_stats", None)
+    monkeypatch.setattr(api, "INDEX_DIR", None)
+    return TestClient(api.app)
+
+
+def test_index_document(client, pdf_bytes) -> None:
+    """Test indexing a PDF reports chunk count and pipeline statistics."""
+    files = {"file": ("doc.pdf", pdf_bytes(), "application/pdf")}
+    response = client.post("/index", files=files)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["chunks_count"] == 1
+    assert data["pipeline"]["pages"] == 3
+    assert api.vector_store.index.index.ntotal == 1
+
+    again = client.post("/index", files=files).json()
+    assert again["status"] == "unchanged"
+    assert again["chunks_added"] == 0
+    assert api.vector_store.index.index.ntotal == 1
+
+    metrics = client.get("/metrics").json()
+    assert [stage["name"] for stage in metrics["ingest"]["stages"]] == ["extract", "chunk", "embed", "store"]
+
+
+def test_api_import_defers_heavy_packages() -> None:
+    """Test importing the API module loads neither the models' nor the index's libraries."""
+    code = (
+        "import sys, src.api.app; "
+        "print([m for m in ('torch', 'sentence_transformers', 'faiss', 'reportlab') if m in sys.modules])"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_ready_after_background_warm_up(client, monkeypatch) -> None:
+    """Test /ready reports 503 until components are loaded and warmed up in the background."""
+    monkeypatch.setattr(api, "startup_state", {"status": "starting", "error": None, "seconds": None})
+    assert client.get("/ready").status_code == 503
+
+    with TestClient(api.app) as started:
+        assert started.get("/").status_code == 200
+        deadline = time.monotonic() + 30
+        while started.get("/ready").status_code != 200:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+        assert started.get("/ready").json()["status"] == "ready"
+    assert api.vector_store is not None
+
+
+def test_ready_after_failed_start_recovers(client, monkeypatch) -> None:
+    """Test /ready turns 200 once a request initializes the components a failed start could not."""
+    monkeypatch.setattr(api, "startup_state", {"status": "failed", "error": "model download failed", "seconds": None})
+    assert client.get("/ready").status_code == 503
+
+    assert client.post("/retrieve/batch", json={"queries": ["brakes"], "k": 1}).status_code == 200
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["error"] is None
+
+
+def test_index_rejects_non_pdf(client) -> None:
+    """Test non-PDF uploads are rejected."""
+    response = client.post("/index", files={"file": ("notes.txt", b"hello", "text/plain")})
+    assert response.status_code == 400
+
+
+def test_index_batch(client, pdf_bytes) -> None:
+    """Test bulk indexing reports one result per file, applies per-file metadata and skips unchanged files."""
+    files = [
+        ("files", ("a.pdf", pdf_bytes(2, "a.pdf"), "application/pdf")),
+        ("files", ("b.pdf", pdf_bytes(2, "b.pdf"), "application/pdf")),
+    ]
+    metadata = {"metadata": json.dumps({"a.pdf": {"line": "brakes"}})}
+    response = client.post("/index/batch", files=files, data=metadata)
+    assert response.status_code == 200
+    data = response.json()
+    assert [result["status"] for result in data["results"]] == ["indexed", "indexed"]
+    assert data["chunks_added"] == 2
+    assert api.vector_store.index.index.ntotal == 2
+    assert api.vector_store.metadata("a.pdf") == {"line": "brakes"}
+
+    again = client.post("/index/batch", files=files, data={"metadata": json.dumps({"b.pdf": {"line": "engine"}})})
+    assert [result["status"] for result in again.json()["results"]] == ["unchanged", "unchanged"]
+    assert [result["metadata_updated"] for result in again.json()["results"]] == [False, True]
+
+    bad = client.post("/index/batch", files=files, data={"metadata": json.dumps({"c.pdf": {"line": "engine"}})})
+    assert bad.status_code == 400
+
+
+def test_index_removes_uploads_when_the_job_is_not_submitted(client, monkeypatch, tmp_path, pdf_bytes) -> None:
+    """Test uploaded files saved before a failed job submission are removed again."""
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    monkeypatch.setattr(api.tempfile, "tempdir", str(uploads))
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("job queue closed")
+
+    monkeypatch.setattr(api.job_manager, "submit", fail)
+    batch = [("files", ("a.pdf", pdf_bytes(1, "a.pdf"), "application/pdf"))]
+    assert client.post("/index/batch", files=batch).status_code == 500
+    with pytest.raises(RuntimeError):
+        client.post("/index/jobs", files={"file": ("b.pdf", pdf_bytes(1, "b.pdf"), "application/pdf")})
+    assert list(uploads.iterdir()) == []
+
+
+def test_index_job_reports_progress_while_api_stays_responsive(client, fake_embed_model, pdf_bytes) -> None:
+    """Test a queued indexing job returns immediately and reports progress and result."""
+    release = threading.Event()
+    embed = fake_embed_model.embed
+    fake_embed_model.embed = lambda texts: release.wait(10) and embed(texts)
+
+    files = {"file": ("doc.pdf", pdf_bytes(4), "application/pdf")}
+    response = client.post("/index/jobs", files=files)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    # The embedding stage is blocked, yet other endpoints still answer
+    assert client.get("/").status_code == 200
+    assert client.get(f"/jobs/{job_id}").json()["status"] in ("queued", "running")
+
+    release.set()
+    for _ in range(100):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "succeeded"
+    assert job["progress"] == {"pages_parsed": 4, "chunks_embedded": 1}
+    assert job["result"]["chunks_added"] == 1
+
+
+def test_unknown_job(client) -> None:
+    """Test querying an unknown job returns 404."""
+    assert client.get("/jobs/missing").status_code == 404
+
+
+def test_index_survives_restart(client, fake_embed_model, monkeypatch, tmp_path, pdf_bytes) -> None:
+    """Test an indexed document and its later metadata are reloaded from DOCRAG_INDEX_DIR after a restart."""
+    monkeypatch.setattr(api, "INDEX_DIR", str(tmp_path / "index"))
+    files = {"file": ("doc.pdf", pdf_bytes(), "application/pdf")}
+    assert client.post("/index", files=files).json()["status"] == "indexed"
+    relabelled = client.post("/index", files=files, data={"metadata": json.dumps({"line": "brakes"})}).json()
+    assert relabelled["status"] == "unchanged"
+    assert relabelled["metadata_updated"] is True
+
+    # Both changes wait for one scheduled save, which shutdown runs early
+    assert not api.Indexer.is_saved(str(tmp_path / "index"))
+    assert client.get("/metrics").json()["index_saves"]["pending"] is True
+    with client:
+        pass
+    assert api.index_saver.stats()["saves"] == 1
+
+    # Simulate a restart by dropping every component
+    monkeypatch.setattr(api, "vector_store", None)
+    monkeypatch.setattr(api, "retriever", None)
+    monkeypatch.setattr(api, "indexer", None)
+    monkeypatch.setattr(api, "index_saver", None)
+    api.initialize_components()
+    assert len(api.vector_store) == 1
+    assert "REQ-001" in api.retriever.retrieve("REQ-001 requirement", k=1)[0]
+    assert api.vector_store.metadata("doc.pdf") == {"line": "brakes"}
+    again = client.post("/index", files=files, data={"metadata": json.dumps({"line": "brakes"})}).json()
+    assert again["status"] == "unchanged"
+    assert again["metadata_updated"] is False
+
+
+def test_retrieve_batch(client, pdf_bytes) -> None:
+    """Test batched retrieval returns one ranked list per query."""
+    files = {"file": ("doc.pdf", pdf_bytes(), "application/pdf")}
+    client.post("/index", files=files)
+    response = client.post("/retrieve/batch", json={"queries": ["REQ-001", "REQ-002", "other"], "k": 2})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == 3
+    assert all(len(ranked) == 1 for ranked in results)
+    assert set(results[0][0]) == {"text", "score"}
+
+    assert client.post("/retrieve/batch", json={"queries": ["x"], "k": 0}).status_code == 400
+
+
+def test_filtered_retrieval_and_document_removal(client, pdf_bytes) -> None:
+    """Test retrieval restricted by metadata and removal of a document."""
+    for name, line in [("brakes.pdf", "brakes"), ("engine.pdf", "engine")]:
+        files = {"file": (name, pdf_bytes(name=name), "application/pdf")}
+        response = client.post("/index", files=files, data={"metadata": json.dumps({"line": line})})
+        assert response.status_code == 200
+
+    request = {"queries": ["REQ-001"], "k": 5, "where": {"line": "engine"}}
+    results = client.post("/retrieve/batch", json=request).json()["results"]
+    assert len(results[0]) == 1
+    assert "engine.pdf" in results[0][0]["text"]
+
+    files = {"file": ("bad.pdf", pdf_bytes(name="bad.pdf"), "application/pdf")}
+    assert client.post("/index", files=files, data={"metadata": "[1]"}).status_code == 400
+
+    response = client.delete("/documents/engine.pdf")
+    assert response.status_code == 200
+    assert response.json()["status"] == "removed"
+    assert client.post("/retrieve/batch", json=request).json()["results"] == [[]]
+    assert client.delete("/documents/engine.pdf").status_code == 404
+
+
+def _sse_events(body: str) -> list:
+    """Parse a server-sent event stream into (event, data) pairs."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_generate_stream_emits_tokens_then_validation(client, pdf_bytes, monkeypatch, ollama_stub) -> None:
+    """Test /generate/stream sends tokens as server-sent events and validation as the last event."""
+    monkeypatch.setattr(api, "llm_client", OllamaClient(base_url=ollama_stub.url, fallback=False))
+    assert client.post("/generate/stream", json={"query": "brakes"}).status_code == 400
+
+    files = {"file": ("doc.pdf", pdf_bytes(), "application/pdf")}
+    client.post("/index", files=files)
+    ollama_stub.response = "1. Scope\nBrake controller.\n2. Requirements\nREQ-001 applies."
+    response = client.post("/generate/stream", json={"query": "brakes"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _sse_events(response.text)
+    assert events[0][0] == "context"
+    assert (events[0][1]["chunks"], events[0][1]["passages"]) == (1, 1)
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert len(tokens) == 8
+    assert events[-1][0] == "done"
+    assert events[-1][1]["document"] == "".join(tokens) == ollama_stub.response
+    assert events[-1][1]["validation"] == api.validate_document(ollama_stub.response)
+
+    ollama_stub.status = 404
+    events = _sse_events(client.post("/generate/stream", json={"query": "wheels"}).text)
+    assert events[-1][0] == "error"
+    assert events[-1][1]["status"] == 500
+    assert "model not found" in events[-1][1]["detail"]
+
+    ollama_stub.status = 200
+    ollama_stub.response = ""
+    events = _sse_events(client.post("/generate/stream", json={"query": "pumps"}).text)
+    assert events[-1] == ("error", {"status": 500, "detail": "Error generating document: Ollama returned empty output."})
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(api.retriever, "retrieve", fail)
+    for path in ("/generate", "/generate/stream"):
+        response = client.post(path, json={"query": "valves"})
+        assert response.status_code == 500
+        assert "index unavailable" in response.json()["detail"]
+    monkeypatch.delattr(api.retriever, "retrieve")
+
+
+def test_generate_serves_cached_documents(client, pdf_bytes, monkeypatch, ollama_stub) -> None:
+    """Test repeated and, with a distance set, similar generation requests are served from the cache."""
+    monkeypatch.setattr(api, "llm_client", OllamaClient(base_url=ollama_stub.url, fallback=False))
+    client.post("/index", files={"file": ("doc.pdf", pdf_bytes(), "application/pdf")})
+
+    first = client.post("/generate", json={"query": "brakes"}).json()
+    assert first["cached"] is None
+    assert first["context"]["packed_tokens"] == first["context"]["context_tokens"] > 0
+    again = client.post("/generate", json={"query": "brakes"}).json()
+    assert again == {**first, "cached": "exact"}
+    assert len(ollama_stub.requests) == 1
+
+    events = _sse_events(client.post("/generate/stream", json={"query": "brakes"}).text)
+    cached = {"document": first["document"], "validation": first["validation"], "cached": "exact"}
+    assert events[-1] == ("done", cached)
+    assert len(ollama_stub.requests) == 1
+
+    # Only documents cached with their query's embedding can be matched semantically
+    api.response_cache.max_distance = 2.0
+    client.post("/generate", json={"query": "brake system"})
+    assert len(ollama_stub.requests) == 2
+    similar = client.post("/generate", json={"query": "braking"}).json()
+    assert similar["cached"] == "semantic"
+    assert len(ollama_stub.requests) == 2
+    assert client.get("/metrics").json()["response_cache"]["semantic_hits"] == 1
+
+
+def test_generate_counts_context_in_model_tokens(client, fake_embed_model, monkeypatch, ollama_stub, pdf_bytes) -> None:
+    """Test the context budget is counted in tokens of the embedding model's tokenizer, not in words."""
+    monkeypatch.setattr(api, "llm_client", OllamaClient(base_url=ollama_stub.url, fallback=False))
+    client.post("/index", files={"file": ("doc.pdf", pdf_bytes(), "application/pdf")})
+    words = client.post("/generate", json={"query": "brakes"}).json()["context"]["context_tokens"]
+
+    monkeypatch.setattr(fake_embed_model, "count_tokens", lambda texts: [3 * len(text.split()) for text in texts])
+    packing = client.post("/generate", json={"query": "valves"}).json()["context"]
+    assert packing["context_tokens"] == 3 * words
+
+
+def test_generate_rejects_requests_beyond_queue(client, pdf_bytes, monkeypatch, ollama_stub) -> None:
+    """Test generation requests get 429 before retrieval when the LLM queue is full and 503 when their wait runs out."""
+    monkeypatch.setattr(api, "llm_client", OllamaClient(base_url=ollama_stub.url, fallback=False))
+    client.post("/index", files={"file": ("doc.pdf", pdf_bytes(), "application/pdf")})
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(api, "llm_scheduler", scheduler)
+    retrievals = []
+    monkeypatch.setattr(api.retriever, "retrieve", lambda *args, **kwargs: retrievals.append(args))
+
+    busy = scheduler.acquire()
+    for path in ("/generate", "/generate/stream"):
+        response = client.post(path, json={"query": "brakes"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+    assert retrievals == []
+    monkeypatch.delattr(api.retriever, "retrieve")
+
+    scheduler.max_queue, scheduler.max_wait = 1, 0.01
+    assert client.post("/generate", json={"query": "brakes"}).status_code == 503
+
+    busy.release()
+    assert client.post("/generate/stream", json={"query": "brakes"}).status_code == 200
+    stats = client.get("/metrics").json()["llm_scheduler"]
+    assert (stats["rejected"], stats["timed_out"], stats["admitted"], stats["running"]) == (2, 1, 2, 0)
@@ -0,0 +1,145 @@
+"""Unit tests for embedding backends that need no model download."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed import embedding_model
+from src.embed.embedding_model import EmbeddingModel, cosine_deviation, plan_batches
+
+
+class FakeTokenizer:
+    """Tokenizer stand-in splitting texts on whitespace and counting its calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, texts, **kwargs):
+        self.calls += 1
+        return {"input_ids": [text.split() for text in texts]}
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+
+class FakeSentenceTransformer:
+    """Sentence-transformers stand-in whose embedding encodes each text's word count."""
+
+    max_seq_length = 64
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 2
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False):
+        self.batches.append(list(texts))
+        return [[len(text.split()), batch_size] for text in texts]
+
+
+def _init_fake_replica(*args) -> None:
+    """Load a fake model as the replica of a spawned worker process."""
+    embedding_model._load_model = lambda *args: FakeSentenceTransformer()
+    embedding_model._init_replica(*args)
+
+
+def test_unknown_backend_rejected() -> None:
+    """Test an unknown backend is rejected before any model is loaded."""
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        EmbeddingModel(backend="tensorrt")
+
+
+def test_onnx_backends_name_missing_requirements(monkeypatch) -> None:
+    """Test an ONNX backend reports an old sentence-transformers or missing packages by name."""
+    import sentence_transformers
+
+    monkeypatch.setattr(sentence_transformers, "__version__", "2.2.2")
+    with pytest.raises(ImportError, match=r"sentence-transformers>=3\.2 \(installed: 2\.2\.2\)"):
+        embedding_model._load_model("model", "onnx", None, "unused")
+
+    monkeypatch.setattr(sentence_transformers, "__version__", "3.2.1")
+    monkeypatch.setattr(embedding_model.importlib.util, "find_spec", lambda name: None if name == "optimum" else name)
+    with pytest.raises(ImportError, match="'onnx-int8' embedding backend needs optimum:"):
+        embedding_model._load_model("model", "onnx-int8", None, "unused")
+
+
+def test_cosine_deviation(fake_embed_model) -> None:
+    """Test cosine deviation ignores scale and measures the worst direction change."""
+    reference = fake_embed_model.embed(["alpha", "beta", "gamma"])
+    scaled = reference * 3.0
+    assert cosine_deviation(scaled, reference)["max_deviation"] == pytest.approx(0.0, abs=1e-6)
+
+    perturbed = reference.copy()
+    perturbed[1] = reference[2]
+    deviation = cosine_deviation(perturbed, reference)
+    assert deviation["min_cosine"] == pytest.approx(float(reference[1] @ reference[2]), abs=1e-6)
+    assert deviation["max_deviation"] == pytest.approx(1 - deviation["min_cosine"])
+
+    with pytest.raises(ValueError, match="does not match"):
+        cosine_deviation(reference[:, :8], reference)
+
+
+def test_plan_batches_respects_token_budget() -> None:
+    """Test batches are length-sorted, cover every index once and stay within the padded budget."""
+    lengths = [50, 3, 400, 3, 120, 7, 50, 1000, 2]
+    batches = plan_batches(lengths, batch_tokens=200, max_batch_size=3)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    ordered = [lengths[i] for batch in batches for i in batch]
+    assert ordered == sorted(lengths)
+    for batch in batches:
+        assert len(batch) <= 3
+        # Texts longer than the budget still get a batch of their own
+        assert len(batch) == 1 or len(batch) * max(lengths[i] for i in batch) <= 200
+    assert plan_batches([], 200, 3) == []
+
+
+def test_encode_buckets_by_length_and_keeps_order(monkeypatch) -> None:
+    """Test embeddings come back in input order while batches group texts of similar length."""
+    fake = FakeSentenceTransformer()
+    monkeypatch.setattr(embedding_model, "_load_model", lambda *args: fake)
+    model = EmbeddingModel(batch_tokens=40, max_batch_size=8)
+
+    texts = [" ".join(["word"] * n) for n in (30, 2, 10, 2, 90, 5, 10)]
+    embeddings = model.embed(texts)
+
+    # Word counts above max_tokens are truncated for batching but not by the fake model
+    assert embeddings[:, 0].tolist() == [30, 2, 10, 2, 90, 5, 10]
+    sizes = [[len(text.split()) for text in batch] for batch in fake.batches]
+    assert sizes == [[2, 2, 5, 10], [10], [30], [90]]
+    assert embeddings.dtype == np.float32
+
+
+def test_count_tokens_uses_its_own_tokenizer(monkeypatch) -> None:
+    """Test token counting leaves the tokenizer the model encodes with untouched."""
+    fake = FakeSentenceTransformer()
+    monkeypatch.setattr(embedding_model, "_load_model", lambda *args: fake)
+    model = EmbeddingModel()
+
+    assert model.count_tokens(["two words", "one"]) == [2, 1]
+    assert fake.tokenizer.calls == 0
+
+
+def test_encode_on_replica_processes_keeps_order(monkeypatch) -> None:
+    """Test large jobs are encoded by the worker replicas and come back in input order."""
+    fake = FakeSentenceTransformer()
+    monkeypatch.setattr(embedding_model, "_load_model", lambda *args: fake)
+    monkeypatch.setattr(embedding_model, "_init_replica", _init_fake_replica)
+    model = EmbeddingModel(batch_tokens=40, max_batch_size=8, processes=2, parallel_min_texts=4)
+    try:
+        counts = [30, 2, 10, 2, 90, 5, 10]
+        embeddings = model.embed([" ".join(["word"] * n) for n in counts])
+        assert embeddings[:, 0].tolist() == counts
+        assert fake.batches == []
+
+        # Jobs below parallel_min_texts stay in this process
+        assert model.embed(["a b", "c"])[:, 0].tolist() == [2, 1]
+        assert len(fake.batches) == 1
+    finally:
+        model.close()
@@ -0,0 +1,71 @@
+"""Unit tests for the persistent embedding cache."""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.embedding_cache import EmbeddingCache
+from src.embed.embedding_model import embed_with_cache
+
+
+def test_embed_with_cache_only_encodes_misses(tmp_path, fake_embed_model) -> None:
+    """Test cached texts skip the model and results keep input order."""
+    cache = EmbeddingCache(str(tmp_path), "fake-model", 16)
+    first = embed_with_cache(cache, ["a", "b"], fake_embed_model.embed)
+    second = embed_with_cache(cache, ["b", "c", "a", "c"], fake_embed_model.embed)
+
+    assert fake_embed_model.calls == [["a", "b"], ["c"]]
+    np.testing.assert_allclose(second[0], first[1])
+    np.testing.assert_allclose(second[2], first[0])
+    np.testing.assert_allclose(second[1], second[3])
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 4
+    assert stats["entries"] == 3
+
+
+def test_cache_persists_across_instances(tmp_path, fake_embed_model) -> None:
+    """Test vectors written by one cache instance are served by the next."""
+    cache = EmbeddingCache(str(tmp_path), "fake-model", 16)
+    expected = embed_with_cache(cache, ["alpha", "beta"], fake_embed_model.embed)
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), "fake-model", 16, memory_entries=0)
+    vectors = reopened.get_many([EmbeddingCache.key("alpha"), EmbeddingCache.key("beta")])
+    np.testing.assert_allclose(np.stack(vectors), expected)
+    assert reopened.stats()["hits"] == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path) -> None:
+    """Test the least recently used entry is evicted when the cache is full."""
+    cache = EmbeddingCache(str(tmp_path), "fake-model", 4, max_entries=2, memory_entries=0)
+    keys = [EmbeddingCache.key(t) for t in ["a", "b", "c"]]
+    cache.put_many(keys[:2], np.ones((2, 4)))
+    cache.get_many([keys[0]])
+    cache.put_many(keys[2:], np.full((1, 4), 3.0))
+
+    assert len(cache) == 2
+    a, b, c = cache.get_many(keys)
+    assert b is None
+    np.testing.assert_allclose(a, np.ones(4))
+    np.testing.assert_allclose(c, np.full(4, 3.0))
+
+
+def test_cache_grows_beyond_initial_capacity(tmp_path) -> None:
+    """Test the memory-mapped files grow as entries are added."""
+    cache = EmbeddingCache(str(tmp_path), "fake-model", 4, memory_entries=0)
+    keys = [EmbeddingCache.key(str(i)) for i in range(3000)]
+    cache.put_many(keys, np.arange(3000 * 4, dtype="float32").reshape(3000, 4))
+    assert len(cache) == 3000
+    np.testing.assert_allclose(cache.get_many([keys[2999]])[0], [11996, 11997, 11998, 11999])
+
+
+def test_cache_rejects_other_dimension(tmp_path) -> None:
+    """Test reopening a cache with a different dimension fails."""
+    EmbeddingCache(str(tmp_path), "fake-model", 4)
+    with pytest.raises(ValueError):
+        EmbeddingCache(str(tmp_path), "fake-model", 8)
@@ -0,0 +1,334 @@
+"""Unit tests for the Ollama client against a local stub server."""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.generation import llm_client, response_cache
+from src.generation.llm_client import OllamaClient
+from src.generation.prompt_builder import pack_contexts
+from src.generation.response_cache import ResponseCache
+from src.generation.scheduler import GenerationScheduler, QueueFullError, QueueTimeoutError
+from src.parse.chunker import chunk_text
+
+
+def test_http_client_reuses_connection(ollama_stub) -> None:
+    """Test the HTTP backend sends keep_alive and options and reuses one pooled connection."""
+    client = OllamaClient(
+        "llama3", base_url=ollama_stub.url, keep_alive="10m", options={"num_ctx": 4096}, fallback=False
+    )
+    outputs = [client.generate(f"prompt {i}") for i in range(5)]
+    client.close()
+
+    assert outputs == ["Generated document."] * 5
+    assert ollama_stub.requests[0] == {
+        "model": "llama3",
+        "prompt": "prompt 0",
+        "stream": False,
+        "keep_alive": "10m",
+        "options": {"num_ctx": 4096},
+    }
+    assert len(ollama_stub.connections) == 1
+
+
+def test_http_client_errors(ollama_stub) -> None:
+    """Test server errors and empty output raise RuntimeError."""
+    client = OllamaClient(base_url=ollama_stub.url, fallback=False)
+    ollama_stub.status = 404
+    with pytest.raises(RuntimeError, match="model not found"):
+        client.generate("prompt")
+
+    ollama_stub.status = 200
+    ollama_stub.response = "  "
+    with pytest.raises(RuntimeError, match="empty output"):
+        client.generate("prompt")
+
+
+def test_unreachable_server_falls_back_to_cli(monkeypatch, ollama_stub) -> None:
+    """Test an unreachable server raises ConnectionError, or runs the CLI when fallback is set."""
+    url = ollama_stub.url
+    ollama_stub.close()
+
+    with pytest.raises(ConnectionError, match="Cannot reach Ollama"):
+        OllamaClient(base_url=url, fallback=False).generate("prompt")
+
+    calls = []
+
+    def fake_run(command, **kwargs):
+        calls.append((command, kwargs["input"]))
+        return subprocess.CompletedProcess(command, 0, stdout=b"From the CLI.", stderr=b"")
+
+    monkeypatch.setattr(llm_client.subprocess, "run", fake_run)
+    assert OllamaClient("llama3", base_url=url).generate("prompt") == "From the CLI."
+    assert calls == [(["ollama", "run", "llama3"], b"prompt")]
+
+
+def test_unknown_ollama_backend_rejected() -> None:
+    """Test an unknown backend is rejected."""
+    with pytest.raises(ValueError, match="Unknown Ollama backend"):
+        OllamaClient(backend="grpc")
+
+
+def test_http_stream_yields_pieces(ollama_stub) -> None:
+    """Test streaming over HTTP yields the response piece by piece."""
+    ollama_stub.response = "Scope of the brake controller."
+    client = OllamaClient(base_url=ollama_stub.url, fallback=False)
+    pieces = list(client.generate_stream("prompt"))
+
+    assert pieces == ["Scope", " of", " the", " brake", " controller."]
+    assert ollama_stub.requests[-1]["stream"] is True
+
+
+def test_http_stream_reports_timeouts_dropped_connections_and_empty_output(ollama_stub, monkeypatch) -> None:
+    """Test a stalled stream times out, a dropped one is unavailable and an empty one fails like generate."""
+    client = OllamaClient(base_url=ollama_stub.url, fallback=False)
+    ollama_stub.response = ""
+    with pytest.raises(RuntimeError, match="empty output"):
+        list(client.generate_stream("prompt"))
+
+    class BrokenResponse:
+        def __init__(self, error):
+            self.error = error
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            return False
+
+        def iter_lines(self):
+            yield b'{"response": "Scope", "done": false}'
+            raise requests.ConnectionError(self.error)
+
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: BrokenResponse(ReadTimeoutError(None, None, "read")))
+    with pytest.raises(TimeoutError):
+        list(client.generate_stream("prompt"))
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: BrokenResponse(ProtocolError("reset")))
+    with pytest.raises(ConnectionError, match="Lost connection"):
+        list(client.generate_stream("prompt"))
+
+
+def test_cli_stream_yields_output(tmp_path, monkeypatch) -> None:
+    """Test the CLI backend streams the output of `ollama run` and reports failures."""
+    script = tmp_path / "ollama"
+    script.write_text('#!/bin/sh\n[ "$2" = "missing" ] && { echo "model not found" >&2; exit 1; }\ncat\n')
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+
+    assert "".join(OllamaClient(backend="cli").generate_stream("échoed prompt")) == "échoed prompt"
+    with pytest.raises(RuntimeError, match="model not found"):
+        list(OllamaClient("missing", backend="cli").generate_stream("prompt"))
+
+
+def test_response_cache_exact_and_semantic() -> None:
+    """Test exact hits need the same model, query and chunks, and semantic hits a close query over the same chunks."""
+    cache = ResponseCache(max_entries=2, max_distance=0.1)
+    contexts = ["chunk a", "chunk b"]
+    cache.put("llama3", "brake spec", contexts, "doc", {"all_sections_present": True}, np.array([1.0, 0.0]))
+
+    assert cache.get("llama3", "brake spec", contexts)["match"] == "exact"
+    assert cache.get("llama3", "brake spec", ["chunk a"]) is None
+    assert cache.get("mistral", "brake spec", contexts) is None
+
+    close, far = np.array([0.99, 0.05]), np.array([0.5, 0.5])
+    assert cache.get("llama3", "braking spec", contexts, close) == {
+        "document": "doc",
+        "validation": {"all_sections_present": True},
+        "match": "semantic",
+    }
+    assert cache.get("llama3", "wheel spec", contexts, far) is None
+    assert cache.get("llama3", "braking spec", ["chunk a"], close) is None
+
+    cache.put("llama3", "second", contexts, "doc 2", {})
+    cache.put("llama3", "third", contexts, "doc 3", {})
+    assert cache.get("llama3", "brake spec", contexts) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert len(cache) == 2
+
+
+def test_response_cache_persists_and_expires(tmp_path, monkeypatch) -> None:
+    """Test the cache is reloaded from disk and entries expire after the time-to-live."""
+    path = str(tmp_path / "responses.json")
+    cache = ResponseCache(path=path, ttl_seconds=60)
+    cache.put("llama3", "brake spec", ["chunk"], "doc", {})
+
+    reloaded = ResponseCache(path=path, ttl_seconds=60)
+    assert reloaded.get("llama3", "brake spec", ["chunk"])["document"] == "doc"
+
+    now = time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 61)
+    assert reloaded.get("llama3", "brake spec", ["chunk"]) is None
+    assert ResponseCache(path=path, ttl_seconds=60).get("llama3", "brake spec", ["chunk"]) is None
+
+
+def test_scheduler_bounds_concurrency_and_serves_by_priority() -> None:
+    """Test queued requests run one at a time by descending priority, then arrival order."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=3)
+    first = scheduler.acquire(timeout=10)
+    assert 9 < first.remaining <= 10
+    order = []
+
+    def request(name: str, priority: int) -> None:
+        with scheduler.acquire(priority, timeout=10):
+            order.append(name)
+
+    threads = []
+    for name, priority in [("low", 0), ("high", 5), ("low again", 0)]:
+        threads.append(threading.Thread(target=request, args=(name, priority)))
+        threads[-1].start()
+        while scheduler.stats()["queued"] < len(threads):
+            time.sleep(0.001)
+
+    with pytest.raises(QueueFullError) as rejected:
+        scheduler.acquire()
+    assert rejected.value.retry_after >= 1
+
+    first.release()
+    first.release()
+    for thread in threads:
+        thread.join()
+    assert order == ["high", "low", "low again"]
+    stats = scheduler.stats()
+    assert (stats["admitted"], stats["rejected"], stats["running"], stats["queued"]) == (4, 1, 0, 0)
+    assert stats["wait_seconds"]["max"] > 0
+
+
+def test_scheduler_drops_requests_past_their_deadline() -> None:
+    """Test a request whose timeout passes in the queue is dropped without blocking those behind it."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2, max_wait=0.05)
+    slot = scheduler.acquire()
+    with pytest.raises(QueueTimeoutError):
+        scheduler.acquire(timeout=10)
+    assert scheduler.stats()["timed_out"] == 1
+    slot.release()
+    assert scheduler.acquire(timeout=10).remaining == pytest.approx(10, abs=0.1)
+
+
+def test_scheduler_does_not_start_requests_past_their_deadline() -> None:
+    """Test a request reached by the queue only after its deadline times out instead of getting no time to run."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2)
+    busy = scheduler.acquire()
+    errors = []
+
+    def request() -> None:
+        try:
+            scheduler.acquire(timeout=0.05)
+        except QueueTimeoutError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    while scheduler.stats()["queued"] < 1:
+        time.sleep(0.001)
+    # Holding the condition keeps the waiter from noticing its own deadline before the slot frees up
+    with scheduler._condition:
+        time.sleep(0.1)
+        busy.release()
+    thread.join()
+
+    assert len(errors) == 1
+    stats = scheduler.stats()
+    assert (stats["admitted"], stats["timed_out"], stats["running"], stats["queued"]) == (1, 1, 0, 0)
+    with pytest.raises(QueueTimeoutError):
+        scheduler.acquire(timeout=0)
+
+
+def test_scheduler_async_waiters_share_the_queue_with_threads() -> None:
+    """Test requests awaiting a slot are served by priority with blocking ones, and drop out on timeout or cancel."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=2)
+    order = []
+
+    def blocking() -> None:
+        with scheduler.acquire(timeout=10):
+            order.append("thread")
+
+    async def main() -> None:
+        first = await scheduler.acquire_async(timeout=10)
+        thread = threading.Thread(target=blocking)
+        thread.start()
+        while scheduler.stats()["queued"] < 1:
+            await asyncio.sleep(0.001)
+        urgent = asyncio.ensure_future(scheduler.acquire_async(5, timeout=10))
+        await asyncio.sleep(0.01)
+        assert scheduler.stats()["queued"] == 2
+        with pytest.raises(QueueFullError):
+            scheduler.check_capacity()
+
+        first.release()
+        with await urgent as slot:
+            order.append("urgent")
+            assert 9 < slot.remaining < 10
+            await asyncio.get_running_loop().run_in_executor(None, thread.join, 0.05)
+            assert order == ["urgent"]
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+
+        held = await scheduler.acquire_async()
+        with pytest.raises(QueueTimeoutError):
+            await scheduler.acquire_async(timeout=0.01)
+        cancelled = asyncio.ensure_future(scheduler.acquire_async())
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        held.release()
+
+    asyncio.run(main())
+    assert order == ["urgent", "thread"]
+    stats = scheduler.stats()
+    assert (stats["admitted"], stats["rejected"], stats["timed_out"], stats["running"], stats["queued"]) == (4, 1, 1, 0, 0)
+
+
+def test_pack_contexts_merges_overlapping_chunks() -> None:
+    """Test neighbouring chunks are merged back into the source text and duplicates dropped."""
+    text = "\n".join(f"REQ-{i:03d} The controller shall hold line {i}." for i in range(200))
+    chunks = chunk_text(text, max_tokens=300, overlap=50)
+    assert len(chunks) >= 4
+
+    passages, stats = pack_contexts([chunks[2], chunks[0], chunks[1], chunks[0]])
+    end = text.index(chunks[2]) + len(chunks[2])
+    assert passages == [text[:end]]
+    assert stats["context_tokens"] == 1200
+    assert stats["packed_tokens"] == 800
+    assert stats["tokens_saved"] == 400
+    assert stats["passages"] == 1
+
+    # Disjoint chunks stay separate, in relevance order, even though the first
+    # one ends with a short phrase the second one starts with
+    passages, _ = pack_contexts([chunks[3], chunks[0]])
+    assert passages == [chunks[3], chunks[0]]
+
+
+def test_pack_contexts_fills_budget_by_relevance() -> None:
+    """Test chunks that do not fit the budget are dropped and an oversized first chunk is cut."""
+    text = " ".join(f"w{i}" for i in range(1000))
+    chunks = chunk_text(text, max_tokens=300, overlap=50)
+
+    passages, stats = pack_contexts([chunks[2], chunks[0], chunks[1]], max_tokens=600)
+    assert passages == [chunks[2], chunks[0]]
+    assert (stats["chunks_dropped"], stats["packed_tokens"], stats["tokens_saved"]) == (1, 600, 300)
+
+    # Merging only adds the chunk's new words to the budget
+    passages, stats = pack_contexts([chunks[0], chunks[1]], max_tokens=550)
+    assert passages == [" ".join(f"w{i}" for i in range(550))]
+
+    passages, stats = pack_contexts([chunks[0]], max_tokens=100)
+    assert passages == [" ".join(f"w{i}" for i in range(100))]
+    assert pack_contexts([], max_tokens=100) == ([], {
+        "chunks": 0,
+        "passages": 0,
+        "chunks_dropped": 0,
+        "context_tokens": 0,
+        "packed_tokens": 0,
+        "tokens_saved": 0,
+    })
@@ -0,0 +1,484 @@
+"""Unit tests for FAISS index and vector store."""
+
+import os
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.bm25_index import BM25Index, tokenize
+from src.embed.chunk_texts import BLOB_FILE, ChunkTexts
+from src.embed.faiss_index import FAISSIndex
+from src.embed.raw_vectors import VECTORS_FILE
+from src.embed.sharded_store import ShardedVectorStore
+from src.embed.vector_store import FaissVectorStore
+
+
+def _vectors(n: int, dimension: int = 8, seed: int = 0) -> np.ndarray:
+    """Build random float32 vectors."""
+    return np.random.default_rng(seed).standard_normal((n, dimension)).astype("float32")
+
+
+def test_add_returns_sequential_ids() -> None:
+    """Test ids are assigned sequentially across adds."""
+    index = FAISSIndex(8)
+    assert index.add(_vectors(3), ["a", "b", "c"]) == [0, 1, 2]
+    assert index.add(_vectors(2, seed=1), ["d", "e"]) == [3, 4]
+
+
+def test_remove_keeps_other_ids_stable() -> None:
+    """Test removing chunks does not shift the remaining ones."""
+    vectors = _vectors(4)
+    store = FaissVectorStore(8)
+    store.add(vectors, ["a", "b", "c", "d"])
+    assert store.remove([1]) == 1
+    assert store.index.index.ntotal == 3
+    assert store.search(vectors[2], k=1)[0][0] == "c"
+    assert "b" not in [text for text, _ in store.search(vectors[1], k=4)]
+
+
+def test_search_with_fewer_vectors_than_k() -> None:
+    """Test search returns only existing results when k exceeds the index size."""
+    index = FAISSIndex(8)
+    index.add(_vectors(2), ["a", "b"])
+    assert len(index.search(_vectors(1, seed=5), k=5)) == 2
+
+
+def test_ivf_index_stages_vectors_until_trained() -> None:
+    """Test an IVF index serves exact results until it has enough vectors to train."""
+    vectors = _vectors(200)
+    index = FAISSIndex(8, factory="IVF4,Flat", train_size=100)
+    index.add(vectors[:50], [str(i) for i in range(50)])
+    assert not index.is_trained
+    assert index.search(vectors[10], k=1)[0][0] == "10"
+
+    index.add(vectors[50:], [str(i) for i in range(50, 200)])
+    assert index.is_trained
+    assert index.ntotal == 200
+    assert index.search(vectors[150], k=1, nprobe=4)[0][0] == "150"
+
+
+def test_ivf_remove_keeps_other_ids_stable() -> None:
+    """Test removal from a trained IVF index leaves the remaining ids intact."""
+    vectors = _vectors(200)
+    index = FAISSIndex(8, factory="IVF4,Flat", train_size=100, nprobe=4)
+    index.add(vectors, [str(i) for i in range(200)])
+    assert index.remove([3, 7]) == 2
+    assert index.ntotal == 198
+    index.add(_vectors(1, seed=9), ["new"])
+    assert index.search(vectors[120], k=1)[0][0] == "120"
+    assert "3" not in [text for text, _ in index.search(vectors[3], k=5)]
+
+
+def test_hnsw_search_with_ef_search() -> None:
+    """Test HNSW search accepts a per-query efSearch."""
+    vectors = _vectors(100)
+    index = FAISSIndex(8, factory="HNSW16")
+    index.add(vectors, [str(i) for i in range(100)])
+    assert index.search(vectors[42], k=1, ef_search=64)[0][0] == "42"
+
+
+def test_rebuild_migrates_flat_index() -> None:
+    """Test migrating a flat index to IVF keeps ids and texts."""
+    vectors = _vectors(300)
+    store = FaissVectorStore(8)
+    store.add(vectors, [str(i) for i in range(300)])
+    store.remove([5])
+    store.index.rebuild("IVF4,Flat", train_size=200)
+    assert store.index.is_trained
+    assert len(store) == 299
+    assert store.search(vectors[77], k=1, nprobe=4)[0][0] == "77"
+    assert store.add(_vectors(1, seed=3), ["next"]) == [300]
+    assert "5" not in [text for text, _ in store.search(vectors[5], k=5, nprobe=4)]
+
+
+def test_save_and_load_round_trip(tmp_path) -> None:
+    """Test a saved index reloads with its texts, removals and next ids."""
+    vectors = _vectors(4)
+    store = FaissVectorStore(8)
+    store.add(vectors, ["alpha", "béta", "", "delta"])
+    store.remove([1])
+    store.save(str(tmp_path / "index"))
+
+    loaded = FaissVectorStore(8)
+    loaded.load(str(tmp_path / "index"))
+    assert len(loaded) == 3
+    assert loaded.search(vectors[3], k=1)[0][0] == "delta"
+    assert loaded.search(vectors[2], k=1)[0][0] == ""
+    assert loaded.index.texts[1] is None
+    assert loaded.add(_vectors(1, seed=4), ["echo"]) == [4]
+
+    # Saving over the directory the texts are mapped from keeps them readable
+    loaded.remove([0])
+    loaded.save(str(tmp_path / "index"))
+    assert loaded.search(vectors[3], k=1)[0][0] == "delta"
+    reloaded = FaissVectorStore(8)
+    reloaded.load(str(tmp_path / "index"))
+    assert [reloaded.index.texts[i] for i in range(5)] == [None, None, "", "delta", "echo"]
+
+
+def test_chunk_texts_save_appends_to_the_loaded_blob(tmp_path) -> None:
+    """Test saving loaded texts links their blob into the new directory and appends only new texts."""
+    first, second = tmp_path / "first", tmp_path / "second"
+    first.mkdir()
+    second.mkdir()
+    ChunkTexts(["alpha", "béta"]).save(str(first))
+
+    texts = ChunkTexts.load(str(first))
+    texts[0] = None
+    texts.extend(["gamma", None])
+    texts.save(str(second))
+    assert (first / BLOB_FILE).samefile(second / BLOB_FILE)
+    assert (second / BLOB_FILE).read_bytes() == "alphabétagamma".encode("utf-8")
+
+    reloaded = ChunkTexts.load(str(second))
+    assert [reloaded[i] for i in range(4)] == [None, "béta", "gamma", None]
+    # The first directory still reads as saved, up to its own count
+    before = ChunkTexts.load(str(first), 2)
+    assert [before[i] for i in range(len(before))] == ["alpha", "béta"]
+
+
+def test_load_keeps_index_type_and_staging(tmp_path) -> None:
+    """Test an untrained IVF index reloads with its staged vectors and settings."""
+    vectors = _vectors(50)
+    index = FAISSIndex(8, factory="IVF4,Flat", train_size=100, nprobe=2)
+    index.add(vectors, [str(i) for i in range(50)])
+    index.save(str(tmp_path / "ivf"))
+
+    loaded = FAISSIndex(8)
+    loaded.load(str(tmp_path / "ivf"))
+    assert loaded.factory == "IVF4,Flat"
+    assert loaded.nprobe == 2
+    assert not loaded.is_trained
+    loaded.add(_vectors(60, seed=2), [str(i) for i in range(50, 110)])
+    assert loaded.is_trained
+    assert loaded.search(vectors[20], k=1, nprobe=4)[0][0] == "20"
+
+
+def test_load_rejects_other_dimension(tmp_path) -> None:
+    """Test loading an index saved with another dimension fails."""
+    index = FAISSIndex(8)
+    index.save(str(tmp_path / "index"))
+    with pytest.raises(ValueError):
+        FAISSIndex(16).load(str(tmp_path / "index"))
+
+
+def test_tokenize_keeps_identifiers_and_parts() -> None:
+    """Test identifiers are kept whole and also split into their parts."""
+    assert tokenize("See REQ-0042, rated 12.5V.") == ["see", "req-0042", "req", "0042", "rated", "12.5v", "12", "5v"]
+
+
+def test_bm25_ranks_exact_terms_and_skips_removed() -> None:
+    """Test BM25 ranks chunks containing rare query terms first and ignores removed chunks."""
+    index = BM25Index()
+    index.add(
+        [0, 1, 2, 3],
+        [
+            "the pump shall deliver pressure",
+            "the valve REQ-0042 shall close within 2 s",
+            "the valve shall open",
+            "REQ-0042 is verified by the acceptance test procedure described below",
+        ],
+    )
+    hits = index.search("REQ-0042 valve", k=3)
+    assert [chunk_id for chunk_id, _ in hits][:2] == [1, 3]
+    assert hits[0][1] > hits[1][1] > hits[2][1] > 0
+    assert index.search("unknown", k=3) == []
+
+    index.remove([1])
+    assert len(index) == 3
+    assert [chunk_id for chunk_id, _ in index.search("REQ-0042", k=3)] == [3]
+
+
+def test_bm25_save_and_load(tmp_path) -> None:
+    """Test a loaded BM25 index ranks like the original and accepts new chunks."""
+    texts = ["alpha beta", "beta gamma", "gamma delta", "delta epsilon", "epsilon zeta", "zeta eta"]
+    index = BM25Index()
+    index.add(list(range(6)), texts)
+    index.remove([0])
+    index.save(str(tmp_path / "bm25"))
+
+    loaded = BM25Index.load(str(tmp_path / "bm25"))
+    assert len(loaded) == 5
+    for query in ["beta", "gamma delta", "zeta alpha"]:
+        assert [i for i, _ in loaded.search(query, k=3)] == [i for i, _ in index.search(query, k=3)]
+    loaded.add([6], ["beta"])
+    assert [chunk_id for chunk_id, _ in loaded.search("beta", k=3)] == [6, 1]
+    with pytest.raises(ValueError):
+        loaded.add([2], ["reused id"])
+
+
+def test_bm25_common_terms_only_score_candidates() -> None:
+    """Test terms found in most chunks do not pull in chunks matching nothing else."""
+    index = BM25Index()
+    index.add(list(range(10)), [f"requirement REQ-{i:04d} shall hold" for i in range(10)])
+    hits = index.search("REQ-0007", k=5)
+    assert [chunk_id for chunk_id, _ in hits] == [7]
+    # A query made only of common terms still matches
+    assert len(index.search("shall", k=5)) == 5
+
+
+def test_bm25_searches_while_another_thread_adds() -> None:
+    """Test no view of the postings outlives a search while chunks are added concurrently."""
+    index = BM25Index()
+    index.add(list(range(2000)), [f"shall brake REQ-{i:04d} pump {i % 7}" for i in range(2000)])
+    errors = []
+
+    def search() -> None:
+        try:
+            for _ in range(200):
+                index.search("brake pump 3 REQ-0042", k=50)
+        except Exception as e:
+            errors.append(e)
+
+    def add() -> None:
+        try:
+            for chunk_id in range(2000, 6000):
+                index.add([chunk_id], [f"brake pump {chunk_id % 7}"])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=search) for _ in range(3)] + [threading.Thread(target=add)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(index) == 6000
+
+
+def test_store_rebuilds_missing_keyword_index_on_load(tmp_path) -> None:
+    """Test loading a store saved without its keyword index rebuilds it from chunk texts."""
+    store = FaissVectorStore(8)
+    store.add(_vectors(3), ["pump P-100", "valve V-200", "sensor S-300"])
+    store.remove([0])
+    store.save(str(tmp_path / "index"))
+    shutil.rmtree(tmp_path / "index" / "bm25")
+
+    loaded = FaissVectorStore(8)
+    loaded.load(str(tmp_path / "index"))
+    assert loaded.keyword_search("V-200", k=2)[0][0] == 1
+    assert loaded.keyword_search("P-100", k=2) == []
+
+
+def test_quantized_index_with_rescore_returns_exact_distances(tmp_path) -> None:
+    """Test rescoring reorders compressed-index candidates by exact distance."""
+    vectors = _vectors(2000, dimension=16)
+    queries = _vectors(20, dimension=16, seed=7)
+    exact = FAISSIndex(16)
+    exact.add(vectors, [str(i) for i in range(2000)])
+    index = FAISSIndex(16, factory="SQ4", train_size=1000, rescore=8)
+    index.add(vectors, [str(i) for i in range(2000)])
+    assert index.is_trained
+
+    expected = exact.search_ids_batch(queries, k=5)
+    found = index.search_ids_batch(queries, k=5)
+    recall = np.mean([len({i for i, _ in a} & {i for i, _ in b}) / 5 for a, b in zip(expected, found)])
+    assert recall >= 0.9
+    for query, ranked in zip(queries, found):
+        for chunk_id, distance in ranked:
+            assert distance == pytest.approx(float(((vectors[chunk_id] - query) ** 2).sum()), rel=1e-4)
+
+    # Reloaded indexes keep rescoring, and new vectors are appended to the saved file
+    index.save(str(tmp_path / "sq4"))
+    loaded = FAISSIndex(16)
+    loaded.load(str(tmp_path / "sq4"))
+    assert loaded.search_ids_batch(queries, k=5) == found
+    loaded.add(queries[:1], ["query"])
+    assert loaded.search(queries[0], k=1) == [("query", 0.0)]
+
+    # Later saves link the saved vectors file and only write the vectors added since
+    loaded.save(str(tmp_path / "sq4-2"))
+    saved = tmp_path / "sq4-2" / VECTORS_FILE
+    assert os.path.samefile(saved, tmp_path / "sq4" / VECTORS_FILE)
+    shutil.rmtree(tmp_path / "sq4")
+    reloaded = FAISSIndex(16)
+    reloaded.load(str(tmp_path / "sq4-2"))
+    assert reloaded.search(queries[0], k=1) == [("query", 0.0)]
+    np.testing.assert_array_equal(reloaded.raw.get(np.arange(2001)), np.vstack([vectors, queries[:1]]))
+
+
+def test_rebuild_with_rescore_uses_exact_vectors() -> None:
+    """Test migrating from a compressed index keeps the exact vectors."""
+    vectors = _vectors(1200)
+    index = FAISSIndex(8, factory="SQ8", rescore=2)
+    index.add(vectors, [str(i) for i in range(1200)])
+    index.rebuild("Flat")
+    assert index.search(vectors[17], k=1) == [("17", 0.0)]
+
+
+def _catalog_store(factory: str = "Flat") -> FaissVectorStore:
+    """Build a store of 300 chunks spread over three documents of two product lines."""
+    store = FaissVectorStore(8, factory=factory)
+    store.set_metadata("brakes.pdf", {"line": "brakes"})
+    store.set_metadata("abs.pdf", {"line": "brakes"})
+    store.set_metadata("engine.pdf", {"line": "engine"})
+    names = ["brakes.pdf", "abs.pdf", "engine.pdf"]
+    store.add(_vectors(300), [str(i) for i in range(300)], documents=[names[i % 3] for i in range(300)])
+    return store
+
+
+@pytest.mark.parametrize("factory", ["Flat", "HNSW16", "IVF4,Flat"])
+def test_filtered_search_returns_only_matching_documents(factory) -> None:
+    """Test document and metadata filters restrict results without losing k."""
+    store = _catalog_store(factory)
+    query = _vectors(1, seed=7)[0]
+    by_line = store.search_ids_batch(query[None], k=10, where={"line": "engine"})[0]
+    assert len(by_line) == 10
+    assert all(chunk_id % 3 == 2 for chunk_id, _ in by_line)
+
+    by_name = store.search_ids_batch(query[None], k=10, documents=["abs.pdf"])[0]
+    assert len(by_name) == 10
+    assert all(chunk_id % 3 == 1 for chunk_id, _ in by_name)
+
+    both = store.search_ids_batch(query[None], k=5, where={"line": ["brakes", "engine"]})[0]
+    assert [chunk_id for chunk_id, _ in both] == [chunk_id for chunk_id, _ in store.search_ids_batch(query[None], 5)[0]]
+    assert store.search_ids_batch(query[None], k=5, where={"line": "steering"})[0] == []
+
+
+@pytest.mark.parametrize("factory", ["Flat", "HNSW16"])
+def test_remove_document(factory, tmp_path) -> None:
+    """Test removing a document drops its chunks, including from index types without removal."""
+    vectors = _vectors(300)
+    store = _catalog_store(factory)
+    assert store.remove_document("abs.pdf") == 100
+    assert len(store) == 200
+    assert store.index.documents.matching() == [0, 2]
+    assert "1" not in [text for text, _ in store.search(vectors[1], k=10)]
+    assert store.search(vectors[3], k=1)[0][0] == "3"
+    assert all(chunk_id % 3 != 1 for chunk_id, _ in store.keyword_search("4 7 10", k=10))
+
+    store.save(str(tmp_path / "index"))
+    restored = FaissVectorStore(8)
+    restored.load(str(tmp_path / "index"))
+    assert len(restored) == 200
+    assert "1" not in [text for text, _ in restored.search(vectors[1], k=10)]
+    assert all(chunk_id % 3 == 0 for chunk_id, _ in restored.search_ids_batch(vectors[:1], 5, where={"line": "brakes"})[0])
+
+    restored.rebuild("Flat")
+    assert restored.index.index.ntotal == 200
+
+
+@pytest.mark.parametrize("sharded", [False, True])
+def test_store_searches_while_another_thread_indexes(sharded) -> None:
+    """Test filtered, dense and keyword searches stay consistent while chunks are added and removed."""
+    store = ShardedVectorStore(8, shards=2) if sharded else FaissVectorStore(8)
+    store.set_metadata("engine.pdf", {"line": "engine"})
+    store.add(_vectors(50), [f"engine {i}" for i in range(50)], documents=["engine.pdf"] * 50)
+    queries = _vectors(4, seed=3)
+    stop = threading.Event()
+    errors = []
+
+    def index() -> None:
+        try:
+            for round_ in range(30):
+                store.set_metadata("brakes.pdf", {"line": "brakes", "round": round_})
+                store.add(_vectors(20, seed=round_), [f"brakes {i}" for i in range(20)], documents=["brakes.pdf"] * 20)
+                store.remove_document("brakes.pdf")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    def search() -> None:
+        try:
+            while not stop.is_set():
+                for ranked in store.search_batch(queries, k=5, where={"line": "engine"}):
+                    assert len(ranked) == 5 and all(text.startswith("engine") for text, _ in ranked)
+                for chunk_id, _ in store.keyword_search("engine", k=5, documents=["engine.pdf"]):
+                    assert store.text(chunk_id).startswith("engine")
+                store.search_batch(queries, k=10)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=index)] + [threading.Thread(target=search) for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(store) == 50
+    finally:
+        if sharded:
+            store.close()
+
+
+def test_sharded_store_reports_metadata_of_documents_missing_from_shard_zero(tmp_path) -> None:
+    """Test a document whose chunks all live on other shards than the first still reports its metadata."""
+    store = ShardedVectorStore(8, shards=3)
+    try:
+        store.add(_vectors(3), ["a", "b1", "b2"], documents=["a.pdf", "b.pdf", "b.pdf"])
+        assert store.metadata("b.pdf") == {}
+        assert store.metadata("missing.pdf") is None
+        store.save(str(tmp_path / "sharded"))
+        restored = ShardedVectorStore(8, shards=3)
+        restored.load(str(tmp_path / "sharded"))
+        try:
+            assert restored.metadata("b.pdf") == {}
+            restored.set_metadata("b.pdf", {"line": "brakes"})
+            assert restored.metadata("b.pdf") == {"line": "brakes"}
+            filtered = restored.search_ids_batch(_vectors(1), k=3, where={"line": "brakes"})[0]
+            assert sorted(idx for idx, _ in filtered) == [1, 2]
+        finally:
+            restored.close()
+    finally:
+        store.close()
+
+@pytest.mark.parametrize("mode", ["thread", "process"])
+def test_sharded_store_matches_single_store(mode, tmp_path) -> None:
+    """Test a sharded store returns the same ids, distances and texts as one index."""
+    vectors = _vectors(301)
+    texts = [f"chunk {i} REQ-{i:03d}" for i in range(301)]
+    documents = [f"doc{i % 4}.pdf" for i in range(301)]
+    single = FaissVectorStore(8)
+    sharded = ShardedVectorStore(8, shards=3, mode=mode)
+    try:
+        for store in (single, sharded):
+            store.add(vectors[:100], texts[:100], documents=documents[:100])
+            store.add(vectors[100:], texts[100:], documents=documents[100:])
+            store.set_metadata("doc1.pdf", {"line": "brakes"})
+            store.remove([5, 6, 7])
+        assert len(sharded) == len(single) == 298
+
+        queries = _vectors(4, seed=3)
+        expected = single.search_ids_batch(queries, k=10)
+        got = sharded.search_ids_batch(queries, k=10)
+        assert [[idx for idx, _ in ranked] for ranked in got] == [[idx for idx, _ in ranked] for ranked in expected]
+        assert sharded.search_batch(queries, k=3) == single.search_batch(queries, k=3)
+        assert sharded.text(100) == texts[100]
+        assert sharded.keyword_search("REQ-042", k=1) == single.keyword_search("REQ-042", k=1)
+        filtered = sharded.search_ids_batch(queries, k=5, where={"line": "brakes"})
+        assert all(idx % 4 == 1 for ranked in filtered for idx, _ in ranked)
+
+        assert sharded.remove_document("doc1.pdf") == single.remove_document("doc1.pdf")
+        sharded.save(str(tmp_path / "sharded"))
+        restored = ShardedVectorStore(8, shards=3)
+        restored.load(str(tmp_path / "sharded"))
+        assert len(restored) == len(single)
+        assert restored.add(_vectors(1, seed=9), ["next"]) == [301]
+        assert restored.search_ids_batch(queries, k=5)[1] == single.search_ids_batch(queries, k=5)[1]
+        with pytest.raises(ValueError):
+            ShardedVectorStore(8, shards=2).load(str(tmp_path / "sharded"))
+    finally:
+        sharded.close()
+
+
+def test_sharded_add_rejects_mismatched_input_before_writing() -> None:
+    """Test a sharded add with more texts than embeddings leaves every shard untouched."""
+    store = ShardedVectorStore(8, shards=3)
+    try:
+        store.add(_vectors(4), [f"chunk {i}" for i in range(4)])
+        with pytest.raises(ValueError):
+            store.add(_vectors(2, seed=1), ["a", "b", "c"])
+        assert len(store) == 4
+        assert store.add(_vectors(3, seed=2), ["x", "y", "z"]) == [4, 5, 6]
+        assert [store.text(i) for i in range(4, 7)] == ["x", "y", "z"]
+        assert store.search_ids_batch(_vectors(3, seed=2), k=1)[2][0][0] == 6
+    finally:
+        store.close()
@@ -0,0 +1,312 @@
+"""Unit tests for ingest module."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.vector_store import FaissVectorStore
+from src.ingest.indexer import Indexer
+from src.ingest.jobs import JobManager
+from src.ingest.pipeline import IngestPipeline
+from src.ingest.saver import DebouncedSaver
+from src.parse.chunker import chunk_stream, chunk_text
+from src.parse.text_cleaner import clean_pages, clean_text
+
+
+def _pages(num_pages: int, words_per_page: int = 37) -> list:
+    """Build synthetic page texts."""
+    return [
+        "\n".join(f"p{p}w{w}" for w in range(words_per_page)) for p in range(num_pages)
+    ]
+
+
+def test_chunk_stream_matches_chunk_text() -> None:
+    """Test streaming chunking yields the same chunks as chunking the joined text."""
+    pages = _pages(20)
+    expected = chunk_text(clean_text("\n".join(pages)), max_tokens=100, overlap=20)
+    assert list(chunk_stream(clean_pages(pages), max_tokens=100, overlap=20)) == expected
+
+
+def test_chunk_stream_exact_multiple() -> None:
+    """Test no trailing overlap-only chunk is emitted when words fill the last window exactly."""
+    text = " ".join(f"w{i}" for i in range(180))
+    assert list(chunk_stream([text], max_tokens=100, overlap=20)) == chunk_text(text, 100, 20)
+    assert list(chunk_stream([], max_tokens=100, overlap=20)) == []
+
+
+def test_pipeline_ingests_all_chunks(fake_embed_model) -> None:
+    """Test the pipeline stores every chunk in order with matching embeddings."""
+    pages = _pages(30)
+    stored = []
+    pipeline = IngestPipeline(
+        fake_embed_model,
+        lambda emb, texts: stored.append((emb, texts)),
+        max_tokens=50,
+        overlap=10,
+        batch_size=4,
+        queue_size=2,
+    )
+    stats = pipeline.run(iter(pages))
+
+    texts = [text for _, batch in stored for text in batch]
+    assert texts == chunk_text(clean_text("\n".join(pages)), max_tokens=50, overlap=10)
+    assert all(emb.shape == (len(batch), 16) for emb, batch in stored)
+    assert stats["pages"] == 30
+    assert stats["chunks"] == len(texts)
+    names = [stage["name"] for stage in stats["stages"]]
+    assert names == ["extract", "chunk", "embed", "store"]
+    for stage in stats["stages"][1:]:
+        assert stage["max_queue_depth"] <= stage["queue_capacity"]
+
+
+def test_pipeline_propagates_errors(fake_embed_model) -> None:
+    """Test a failing stage aborts the run and re-raises in the caller."""
+
+    def failing_sink(embeddings, texts):
+        raise ValueError("store unavailable")
+
+    pipeline = IngestPipeline(
+        fake_embed_model, failing_sink, max_tokens=20, overlap=5, batch_size=2, queue_size=1
+    )
+    with pytest.raises(ValueError, match="store unavailable"):
+        pipeline.run(iter(_pages(50)))
+
+
+def test_indexer_skips_unchanged_document(fake_embed_model) -> None:
+    """Test re-indexing identical content embeds nothing."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=50, overlap=10)
+    pages = _pages(10)
+    first = indexer.index_pages("spec.pdf", pages)
+    assert first["status"] == "indexed"
+    assert first["chunks_added"] == first["chunks_count"] > 0
+
+    calls = len(fake_embed_model.calls)
+    second = indexer.index_pages("spec.pdf", pages)
+    assert second["status"] == "unchanged"
+    assert second["chunks_added"] == 0
+    assert len(fake_embed_model.calls) == calls
+    assert store.index.index.ntotal == first["chunks_count"]
+    assert second["metadata_updated"] is False
+
+    relabelled = indexer.index_pages("spec.pdf", pages, metadata={"line": "brakes"})
+    assert relabelled["status"] == "unchanged"
+    assert relabelled["metadata_updated"] is True
+    assert store.metadata("spec.pdf") == {"line": "brakes"}
+    assert indexer.index_pages("spec.pdf", pages, metadata={"line": "brakes"})["metadata_updated"] is False
+
+
+def test_indexer_save_and_load(fake_embed_model, tmp_path) -> None:
+    """Test a reloaded indexer keeps its chunks and still skips unchanged documents."""
+    pages = _pages(10)
+    indexer = Indexer(fake_embed_model, FaissVectorStore(16), max_tokens=50, overlap=10)
+    first = indexer.index_pages("spec.pdf", pages)
+    assert not Indexer.is_saved(str(tmp_path))
+    indexer.save(str(tmp_path))
+    assert Indexer.is_saved(str(tmp_path))
+
+    restored = Indexer(fake_embed_model, FaissVectorStore(16), max_tokens=50, overlap=10)
+    restored.load(str(tmp_path))
+    assert len(restored.store) == first["chunks_count"]
+    assert restored.index_pages("spec.pdf", pages)["status"] == "unchanged"
+
+
+def test_indexer_save_commits_store_and_registry_together(fake_embed_model, tmp_path, monkeypatch) -> None:
+    """Test a save that fails part-way leaves the previous save loadable, and saves link texts forward."""
+    indexer = Indexer(fake_embed_model, FaissVectorStore(16), max_tokens=50, overlap=10)
+    first = indexer.index_pages("a.pdf", _pages(10))
+    indexer.save(str(tmp_path))
+    indexer.index_pages("b.pdf", [f"brake {i}" for i in range(10)])
+
+    def fail(path: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(indexer.registry, "save", fail)
+    with pytest.raises(OSError):
+        indexer.save(str(tmp_path))
+    restored = Indexer(fake_embed_model, FaissVectorStore(16), max_tokens=50, overlap=10)
+    restored.load(str(tmp_path))
+    assert restored.registry.get("b.pdf") is None
+    assert len(restored.store) == first["chunks_count"]
+
+    monkeypatch.undo()
+    indexer.save(str(tmp_path))
+    assert [path.name for path in tmp_path.iterdir() if path.is_dir()] == ["generation-3"]
+    restored.load(str(tmp_path))
+    assert restored.registry.get("b.pdf") is not None
+    assert len(restored.store) == len(indexer.store)
+    assert any("brake 3" in text for text, _ in restored.store.search_batch(fake_embed_model.embed(["brake 3"]), k=3)[0])
+
+
+def test_indexer_removes_and_filters_documents(fake_embed_model) -> None:
+    """Test documents can be searched by metadata and removed as a whole."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=50, overlap=10)
+    indexer.index_pages("brakes.pdf", [f"brake caliper {i}" for i in range(5)], metadata={"line": "brakes"})
+    indexer.index_pages("engine.pdf", [f"engine piston {i}" for i in range(5)], metadata={"line": "engine"})
+    query = fake_embed_model.embed(["brake caliper 1"])
+
+    results = store.search_batch(query, k=5, where={"line": "engine"})[0]
+    assert results and all("engine" in text for text, _ in results)
+
+    result = indexer.remove_document("brakes.pdf")
+    assert result["status"] == "removed"
+    assert result["chunks_removed"] > 0
+    assert indexer.registry.get("brakes.pdf") is None
+    assert all("brake" not in text for text, _ in store.search_batch(query, k=5)[0])
+    assert indexer.remove_document("brakes.pdf") is None
+
+
+def test_indexer_updates_only_changed_chunks(fake_embed_model) -> None:
+    """Test a revised document embeds new chunks and retires stale ones."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=37, overlap=0)
+    pages = _pages(10)
+    indexer.index_pages("spec.pdf", pages)
+
+    revised = pages[:-1] + ["\n".join(f"revised{w}" for w in range(37))]
+    result = indexer.index_pages("spec.pdf", revised)
+    assert result["status"] == "updated"
+    assert result["chunks_added"] == 1
+    assert result["chunks_removed"] == 1
+    assert store.index.index.ntotal == 10
+    new_chunk = revised[-1]
+    results = store.search(fake_embed_model.embed([new_chunk])[0], k=1)
+    assert [text for text, _ in results] == [new_chunk]
+
+
+def test_indexer_rolls_back_on_failure(fake_embed_model) -> None:
+    """Test chunks added before a failure are removed again."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=20, overlap=0, batch_size=2)
+
+    def pages():
+        yield from _pages(5)
+        raise RuntimeError("corrupt page")
+
+    with pytest.raises(RuntimeError):
+        indexer.index_pages("broken.pdf", pages(), sha256="abc")
+    assert store.index.index.ntotal == 0
+    assert indexer.registry.get("broken.pdf") is None
+
+
+def test_indexer_rolls_back_when_registry_update_fails(fake_embed_model, monkeypatch) -> None:
+    """Test new chunks are removed again when recording the document fails."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=20, overlap=0, batch_size=2)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(indexer.registry, "set", fail)
+    with pytest.raises(OSError):
+        indexer.index_pages("doc.pdf", _pages(3), sha256="abc")
+    assert store.index.index.ntotal == 0
+    assert indexer.registry.get("doc.pdf") is None
+
+
+def test_indexer_keeps_metadata_when_indexing_fails(fake_embed_model, make_pdf, monkeypatch) -> None:
+    """Test new metadata is not applied to a document whose content failed to index."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=20, overlap=0)
+    indexer.index_pages("spec.pdf", _pages(2), metadata={"line": "brakes"})
+
+    def fail(texts):
+        raise RuntimeError("embedder crashed")
+
+    monkeypatch.setattr(fake_embed_model, "embed", fail)
+    with pytest.raises(RuntimeError):
+        indexer.index_pages("spec.pdf", _pages(3), metadata={"line": "engine"})
+    assert store.metadata("spec.pdf") == {"line": "brakes"}
+
+    path = make_pdf("spec.pdf", ["brake caliper", "hydraulic pump"])
+    with pytest.raises(RuntimeError):
+        indexer.index_files([str(path)], metadata=[{"line": "engine"}])
+    assert store.metadata("spec.pdf") == {"line": "brakes"}
+
+
+def test_index_files_pools_chunks_into_one_write(fake_embed_model, make_pdf, monkeypatch) -> None:
+    """Test bulk indexing embeds shared chunks once and adds everything in one write."""
+    store = FaissVectorStore(16)
+    indexer = Indexer(fake_embed_model, store, max_tokens=4, overlap=0)
+    a = make_pdf("a.pdf", ["alpha beta gamma delta", "shared words in both files"])
+    b = make_pdf("b.pdf", ["epsilon zeta eta theta", "shared words in both files"])
+    broken = make_pdf("broken.pdf", [])
+    broken.write_bytes(b"not a pdf")
+
+    writes = []
+    original_add = store.add
+    monkeypatch.setattr(
+        store, "add", lambda emb, texts, **kwargs: writes.append(len(texts)) or original_add(emb, texts, **kwargs)
+    )
+    results = indexer.index_files([str(a), str(b), str(broken)], batch_size=3)
+
+    assert [r["status"] for r in results] == ["indexed", "indexed", "failed"]
+    assert results[2]["error"]
+    assert writes == [sum(r["chunks_added"] for r in results)]
+    embedded = [text for call in fake_embed_model.calls for text in call]
+    assert len(embedded) == len(set(embedded))
+    assert store.index.index.ntotal == results[0]["chunks_count"] + results[1]["chunks_count"]
+    assert len(store.index.documents.chunks_of("b.pdf")) == results[1]["chunks_count"]
+
+    # Re-indexing is a no-op for unchanged files
+    again = indexer.index_files([str(a), str(b)])
+    assert [r["status"] for r in again] == ["unchanged", "unchanged"]
+
+
+def test_job_manager_runs_jobs_and_records_failures() -> None:
+    """Test jobs report progress, results and errors."""
+    manager = JobManager(max_workers=1, max_finished=1)
+
+    def work(job):
+        job.advance("pages_parsed", 3)
+        return {"ok": True}
+
+    job = manager.submit(work, name="doc.pdf")
+    assert job.future.result(timeout=5) == {"ok": True}
+    state = manager.get(job.id).to_dict()
+    assert state["status"] == "succeeded"
+    assert state["progress"] == {"pages_parsed": 3}
+
+    def fail(job):
+        raise ValueError("bad pdf")
+
+    failed = manager.submit(fail)
+    with pytest.raises(ValueError):
+        failed.future.result(timeout=5)
+    assert manager.get(failed.id).to_dict()["error"] == "bad pdf"
+    # Only the most recent finished job is retained
+    assert manager.get(job.id) is None
+    manager.shutdown()
+
+
+def test_debounced_saver_writes_a_burst_of_changes_once() -> None:
+    """Test changes reported within the interval are saved together, and a failed save stays pending."""
+    saves = []
+    saver = DebouncedSaver(lambda: saves.append(time.monotonic()), interval=0.05)
+    for _ in range(5):
+        saver.mark_dirty()
+    assert saves == []
+    deadline = time.monotonic() + 5
+    while not saves:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert saver.stats()["saves"] == 1
+    assert saver.stats()["pending"] is False
+
+    def fail():
+        raise OSError("disk full")
+
+    saver.save = fail
+    saver.interval = 0
+    with pytest.raises(OSError):
+        saver.mark_dirty()
+    assert saver.stats()["pending"] is True
+    assert saver.stats()["last_error"] == "disk full"
+    saver.save = lambda: saves.append(time.monotonic())
+    saver.close()
+    assert len(saves) == 2
@@ -1,12 +1,20 @@
 """Unit tests for parsing module."""
 
+import random
+import re
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.parse.chunker import chunk_text
-from src.parse.text_cleaner import clean_text
+from src.parse.chunker import chunk_spans, chunk_stream, chunk_text
+from src.parse.pdf_parser import extract_text_from_pdf, iter_pdf_pages, iter_pdf_pages_parallel
+from src.parse.text_cleaner import clean_pages, clean_text, iter_clean_text
+
+
+def _numbered_pages(num_pages: int) -> list:
+    """Build page texts that contain their own page number."""
+    return [f"Page {i} content" for i in range(num_pages)]
 
 
 def test_clean_text() -> None:
@@ -21,6 +29,46 @@ def test_clean_text() -> None:
     assert cleaned.endswith("spaces.")
 
 
+def _reference_clean_text(text: str) -> str:
+    """Three-pass cleaner that clean_text must stay identical to."""
+    text = text.replace("\r", "\n")
+    text = re.sub(r"\n+", "\n", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    return text.strip()
+
+
+def _random_text(rng: random.Random, length: int) -> str:
+    """Build text dense in whitespace edge cases."""
+    alphabet = ["a", "b", "REQ-1", " ", "  ", "\t", "\r", "\n", "\r\n", "\x0b", "\u00a0", "\f"]
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def test_clean_text_matches_reference() -> None:
+    """Test the single-pass cleaner is identical to the three-pass cleaner."""
+    rng = random.Random(0)
+    for _ in range(500):
+        text = _random_text(rng, rng.randint(0, 60))
+        assert clean_text(text) == _reference_clean_text(text)
+
+
+def test_iter_clean_text_matches_clean_text() -> None:
+    """Test streaming cleaning over arbitrary splits equals cleaning the whole text."""
+    rng = random.Random(1)
+    for _ in range(500):
+        text = _random_text(rng, rng.randint(0, 80))
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 6)))
+        pieces = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        assert "".join(iter_clean_text(pieces)) == clean_text(text)
+
+
+def test_clean_pages_matches_joined_pages() -> None:
+    """Test cleaning pages equals cleaning the newline-joined document."""
+    rng = random.Random(2)
+    for _ in range(200):
+        pages = [_random_text(rng, rng.randint(0, 20)) for _ in range(rng.randint(0, 5))]
+        assert "".join(clean_pages(pages)) == clean_text("\n".join(pages))
+
+
 def test_chunk_text() -> None:
     """Test text chunking functionality."""
     text = " ".join([f"word{i}" for i in range(1000)])
@@ -37,6 +85,45 @@ def test_chunk_text() -> None:
         assert len(set(first_chunk_words) & set(second_chunk_words)) > 0
 
 
+def _char_tokens(words: list) -> list:
+    """Count one token per three characters, like a subword tokenizer would roughly."""
+    return [len(word) // 3 + 1 for word in words]
+
+
+def test_chunk_spans_respect_token_budget() -> None:
+    """Test chunk spans fit the token budget and overlap in token units."""
+    rng = random.Random(3)
+    text = " ".join("x" * rng.randint(1, 12) for _ in range(2000))
+    spans = chunk_spans(text, max_tokens=64, overlap=16, count_tokens=_char_tokens, batch_size=100)
+
+    assert spans[0][0] == 0
+    assert spans[-1][1] == len(text)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert start < next_start < end
+        assert sum(_char_tokens(text[next_start:end].split())) <= 16
+    for start, end in spans:
+        assert sum(_char_tokens(text[start:end].split())) <= 64
+
+
+def test_chunk_text_keeps_source_text() -> None:
+    """Test chunks are slices of the source text."""
+    text = "line one\nline two\nline three"
+    assert chunk_text(text, max_tokens=4, overlap=1) == ["line one\nline two", "two\nline three"]
+
+
+def test_chunk_stream_matches_chunk_text_on_any_split() -> None:
+    """Test streaming chunking over arbitrary splits equals chunking the joined text."""
+    rng = random.Random(4)
+    for _ in range(200):
+        text = "".join(rng.choice(["ab", "cde", "f", " ", "\n", "  "]) for _ in range(rng.randint(0, 300)))
+        cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 8)))
+        pieces = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+        for counter in (None, _char_tokens):
+            expected = chunk_text(text, max_tokens=10, overlap=3, count_tokens=counter)
+            streamed = chunk_stream(pieces, max_tokens=10, overlap=3, count_tokens=counter, batch_size=7)
+            assert list(streamed) == expected
+
+
 def test_chunk_text_empty() -> None:
     """Test chunking with empty text."""
     chunks = chunk_text("", max_tokens=100, overlap=20)
@@ -50,3 +137,20 @@ def test_chunk_text_short() -> None:
     assert len(chunks) == 1
     assert chunks[0] == text
 
+
+def test_iter_pdf_pages(make_pdf) -> None:
+    """Test page-level PDF extraction yields pages in order."""
+    pdf_path = make_pdf("doc.pdf", _numbered_pages(5))
+    pages = list(iter_pdf_pages(str(pdf_path)))
+    assert len(pages) == 5
+    assert all(f"Page {i} content" in page for i, page in enumerate(pages))
+    assert list(iter_pdf_pages(str(pdf_path), start=2, stop=4)) == pages[2:4]
+
+
+def test_iter_pdf_pages_parallel_preserves_order(make_pdf) -> None:
+    """Test parallel extraction returns the same pages as serial extraction."""
+    pdf_path = make_pdf("doc.pdf", _numbered_pages(12))
+    serial = list(iter_pdf_pages(str(pdf_path)))
+    parallel = list(iter_pdf_pages_parallel(str(pdf_path), workers=2, pages_per_task=5))
+    assert parallel == serial
+    assert extract_text_from_pdf(str(pdf_path), workers=2) == "\n".join(serial)
@@ -0,0 +1,166 @@
+"""Unit tests for the retriever using a fake embedding model."""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embed.vector_store import FaissVectorStore
+from src.retrieval.cache import LRUCache
+from src.retrieval.reranker import Reranker
+from src.retrieval.retriever import Retriever, reciprocal_rank_fusion
+
+TEXTS = [f"requirement {i} covers subsystem {i * 7}" for i in range(20)]
+
+
+def _retriever(fake_embed_model) -> Retriever:
+    """Build a retriever over TEXTS."""
+    store = FaissVectorStore(fake_embed_model.dimension)
+    store.add(fake_embed_model.embed(TEXTS), TEXTS)
+    return Retriever(fake_embed_model, store)
+
+
+def test_retrieve_batch_matches_single_queries(fake_embed_model) -> None:
+    """Test batched retrieval returns the same rankings as one query at a time."""
+    retriever = _retriever(fake_embed_model)
+    queries = [TEXTS[3], TEXTS[11], "unrelated query"]
+    calls = len(fake_embed_model.calls)
+    results = retriever.retrieve_batch(queries, k=4)
+    assert len(fake_embed_model.calls) == calls + 1
+
+    assert len(results) == 3
+    for query, ranked in zip(queries, results):
+        assert [text for text, _ in ranked] == retriever.retrieve(query, k=4)
+        scores = [score for _, score in ranked]
+        assert scores == sorted(scores)
+    assert results[0][0] == (TEXTS[3], results[0][0][1])
+    assert results[0][0][1] < 1e-5
+
+
+def test_retrieve_batch_empty(fake_embed_model) -> None:
+    """Test batched retrieval of no queries returns no results."""
+    assert _retriever(fake_embed_model).retrieve_batch([], k=3) == []
+
+
+def test_repeated_queries_are_served_from_cache(fake_embed_model) -> None:
+    """Test a repeated query neither re-embeds nor re-searches."""
+    retriever = _retriever(fake_embed_model)
+    first = retriever.retrieve_batch([TEXTS[2], TEXTS[2]], k=3)
+    calls = len(fake_embed_model.calls)
+    assert fake_embed_model.calls[-1] == [TEXTS[2]]
+
+    assert retriever.retrieve_batch([TEXTS[2]], k=3) == first[:1]
+    assert len(fake_embed_model.calls) == calls
+    stats = retriever.cache_stats()
+    assert stats["results"]["hits"] == 1
+    assert stats["results"]["hit_rate"] == 1 / 3
+
+
+def test_result_cache_invalidated_when_store_changes(fake_embed_model) -> None:
+    """Test cached results are dropped after the store is modified."""
+    retriever = _retriever(fake_embed_model)
+    query = "new requirement"
+    assert retriever.retrieve(query, k=1) != [query]
+
+    retriever.store.add(fake_embed_model.embed([query]), [query])
+    calls = len(fake_embed_model.calls)
+    assert retriever.retrieve(query, k=1) == [query]
+    # The query embedding is still reused
+    assert len(fake_embed_model.calls) == calls
+
+    retriever.store.remove([len(TEXTS)])
+    assert retriever.retrieve(query, k=1) != [query]
+
+
+def test_lru_cache_evicts_and_expires(monkeypatch) -> None:
+    """Test the cache evicts least recently used entries and expires old ones."""
+    now = [0.0]
+    monkeypatch.setattr("src.retrieval.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(max_entries=2, ttl_seconds=10)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    now[0] = 11.0
+    assert cache.get("c") is None
+    assert len(cache) == 1
+
+
+def test_hybrid_mode_finds_exact_identifiers(fake_embed_model) -> None:
+    """Test hybrid retrieval finds a chunk holding the queried identifier that dense search misses."""
+    store = FaissVectorStore(fake_embed_model.dimension)
+    texts = TEXTS + ["the relief valve is specified in REQ-0815"]
+    store.add(fake_embed_model.embed(texts), texts)
+    query = "relief valve REQ-0815"
+
+    dense = Retriever(fake_embed_model, store)
+    assert texts[-1] not in dense.retrieve(query, k=3)
+    hybrid = Retriever(fake_embed_model, store, mode="hybrid", candidates=5)
+    ranked = hybrid.retrieve_batch([query], k=3)[0]
+    assert texts[-1] in [text for text, _ in ranked][:2]
+    assert ranked[0][1] >= ranked[1][1] >= ranked[2][1]
+
+
+def test_reciprocal_rank_fusion() -> None:
+    """Test chunks ranked well by both lists come first."""
+    fused = reciprocal_rank_fusion([[(1, 0.1), (2, 0.2), (3, 0.3)], [(3, 9.0), (1, 5.0)]], k=60)
+    assert [chunk_id for chunk_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == 1 / 61 + 1 / 62
+
+
+def test_unknown_mode_rejected(fake_embed_model) -> None:
+    """Test an unknown retrieval mode is rejected."""
+    with pytest.raises(ValueError):
+        Retriever(fake_embed_model, FaissVectorStore(fake_embed_model.dimension), mode="sparse")
+
+
+class OverlapReranker(Reranker):
+    """Reranker scoring pairs by shared words, optionally slowly."""
+
+    def __init__(self, delay: float = 0.0, batch_size: int = 4):
+        super().__init__(batch_size=batch_size)
+        self.delay = delay
+        self.batches = []
+
+    def score_pairs(self, pairs):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return np.array([len(set(query.split()) & set(text.split())) for query, text in pairs], dtype="float32")
+
+
+def test_rerank_reorders_overfetched_candidates(fake_embed_model) -> None:
+    """Test the reranker scores over-fetched candidates in batches and keeps the best k."""
+    reranker = OverlapReranker(batch_size=100)
+    retriever = Retriever(fake_embed_model, _retriever(fake_embed_model).store, reranker=reranker, rerank_candidates=20)
+    queries = ["requirement 13 covers subsystem 91", "requirement 4 covers subsystem 28"]
+    results = retriever.retrieve_batch(queries, k=2)
+    assert reranker.batches == [40]
+    assert results[0][0] == (TEXTS[13], 5.0)
+    assert results[1][0] == (TEXTS[4], 5.0)
+    assert len(results[0]) == 2
+    assert reranker.stats()["reranked"] == 2
+
+
+def test_rerank_falls_back_to_vector_order_over_budget(fake_embed_model) -> None:
+    """Test reranking that would exceed the time budget keeps the first-stage order uncached."""
+    store = _retriever(fake_embed_model).store
+    reranker = OverlapReranker(delay=0.02, batch_size=4)
+    retriever = Retriever(fake_embed_model, store, reranker=reranker, rerank_candidates=20, rerank_budget=0.03)
+    query = "requirement 13 covers subsystem 91"
+
+    expected = [text for text, _ in store.search(fake_embed_model.embed([query]), k=3)]
+    assert retriever.retrieve(query, k=3) == expected
+    assert reranker.stats()["fallbacks"] == 1
+    # The observed scoring speed now rules out the next attempt before any batch runs
+    batches = len(reranker.batches)
+    assert retriever.retrieve(query, k=3) == expected
+    assert len(reranker.batches) == batches
+    # Without a budget for this call the rerank completes
+    assert retriever.retrieve(query, k=3, rerank_budget=10.0)[0] == TEXTS[13]